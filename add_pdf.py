@@ -1,10 +1,14 @@
 import os
 import argparse
-from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 # Import both PDF and Text loaders
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from quantized_index import load_vectorstore
+from partitioned_index import write_partitions
+from build_profile import BuildProfiler
+from answer_cache import invalidate_answer_cache
+from precompute_answers import refresh_precomputed_answers
 
 # --- Configuration ---
 VECTORSTORE_PATH = "data/vectorstore"
@@ -18,10 +22,11 @@ def load_embeddings():
         model_kwargs={'device': 'cpu'}
     )
 
-def load_documents(file_path):
+def load_documents(file_path, profiler=None):
     """
     Loads and splits a file (PDF or TXT) into chunks.
     """
+    profiler = profiler or BuildProfiler("add_pdf")
     if not os.path.exists(file_path):
         print(f"❌ Error: File not found at {file_path}")
         return None
@@ -38,7 +43,9 @@ def load_documents(file_path):
         print("This script only supports .pdf and .txt files.")
         return None
     
-    documents = loader.load()
+    with profiler.stage(f"load:{os.path.splitext(file_path)[1].lower()[1:]}") as counts:
+        documents = loader.load()
+        counts["items"] += len(documents)
     
     # --- The rest is the same ---
     print(f"Splitting {len(documents)} document(s) into chunks...")
@@ -46,53 +53,78 @@ def load_documents(file_path):
         chunk_size=1000,
         chunk_overlap=150
     )
-    chunks = text_splitter.split_documents(documents)
+    with profiler.stage("split") as counts:
+        chunks = text_splitter.split_documents(documents)
+        counts["items"] += len(chunks)
     print(f"✅ Created {len(chunks)} text chunks from the file.")
     return chunks
 
-def update_vectorstore_with_file(file_path):
+def update_vectorstore_with_file(file_path, profile=False, flamegraph=False):
     """Loads existing store, adds new file chunks, and saves."""
-    
     # 1. Check if vector store exists
     if not os.path.exists(VECTORSTORE_PATH):
         print(f"❌ Error: No existing vector store found at {VECTORSTORE_PATH}.")
         print("Please run your main embedding script first to create it.")
         return
 
-    # 2. Load embeddings and new file
-    embeddings = load_embeddings()
-    new_chunks = load_documents(file_path)
-    
-    if not new_chunks:
-        return
-
-    # 3. Load existing vector store
-    print(f"📂 Loading existing vector store from {VECTORSTORE_PATH}...")
+    profiler = BuildProfiler("add_pdf", enabled=profile, flamegraph=flamegraph)
     try:
-        vectorstore = FAISS.load_local(
-            VECTORSTORE_PATH,
-            embeddings,
-            allow_dangerous_deserialization=True
-        )
-    except Exception as e:
-        print(f"❌ Error loading vector store: {e}")
-        return
+        # 2. Load embeddings and new file
+        with profiler.stage("model_load"):
+            embeddings = load_embeddings()
+        new_chunks = load_documents(file_path, profiler)
 
-    # 4. Add new documents to the store
-    print(f"➕ Adding {len(new_chunks)} new chunks to the vector store...")
-    vectorstore.add_documents(new_chunks)
+        if not new_chunks:
+            profiler.finish(file=file_path, chunks=0)
+            return
 
-    # 5. Save the updated vector store
-    print(f"💾 Saving updated vector store back to {VECTORSTORE_PATH}...")
-    vectorstore.save_local(VECTORSTORE_PATH)
-    
-    print(f"\n✅ Successfully added {file_path} to the vector store!")
+        # 3. Load existing vector store
+        print(f"📂 Loading existing vector store from {VECTORSTORE_PATH}...")
+        try:
+            with profiler.stage("load_index"):
+                vectorstore = load_vectorstore(VECTORSTORE_PATH, embeddings)
+        except Exception as e:
+            print(f"❌ Error loading vector store: {e}")
+            profiler.finish(file=file_path, error=str(e))
+            return
+
+        # 4. Add new documents to the store
+        print(f"➕ Adding {len(new_chunks)} new chunks to the vector store...")
+        texts = [c.page_content for c in new_chunks]
+        with profiler.stage("embed") as counts:
+            vectors = embeddings.embed_documents(texts)
+            counts["items"] += len(texts)
+        with profiler.stage("index_add") as counts:
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=[c.metadata for c in new_chunks])
+            counts["items"] += len(texts)
+
+        # 5. Save the updated vector store
+        print(f"💾 Saving updated vector store back to {VECTORSTORE_PATH}...")
+        with profiler.stage("save") as counts:
+            vectorstore.save_local(VECTORSTORE_PATH)
+            counts["items"] += vectorstore.index.ntotal
+        with profiler.stage("partitions") as counts:
+            write_partitions(vectorstore, VECTORSTORE_PATH)
+            counts["items"] += vectorstore.index.ntotal
+        invalidate_answer_cache(VECTORSTORE_PATH)
+
+        print(f"\n✅ Successfully added {file_path} to the vector store!")
+        profiler.finish(file=file_path, chunks=len(new_chunks))
+        return vectorstore
+    finally:
+        # No-op when a report was written above; stops the sampler and py-spy on errors / Ctrl-C
+        profiler.finish(file=file_path, error="interrupted")
 
 # --- Main execution ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Add a PDF or TXT file to the FAISS vector store.")
     parser.add_argument("file_path", type=str, help="The file path of the .pdf or .txt file to add.")
+    parser.add_argument("--profile", action="store_true", help="Write a per-stage time/CPU/memory report to data/profiles/")
+    parser.add_argument("--flamegraph", action="store_true", help="With --profile, also record a py-spy flame graph")
+    parser.add_argument("--no-precompute", action="store_true",
+                        help="Don't refresh the precomputed answers for top questions afterwards")
     
     args = parser.parse_args()
     
-    update_vectorstore_with_file(args.file_path)
\ No newline at end of file
+    if update_vectorstore_with_file(args.file_path, profile=args.profile, flamegraph=args.flamegraph) and not args.no_precompute:
+        refresh_precomputed_answers(VECTORSTORE_PATH)
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+admission.py
+Admission control for the /chat endpoint.
+- AdmissionController: bounded worker pool (concurrency limit) plus a bounded wait
+  queue; requests beyond that are rejected up front instead of piling onto the LLM
+- RateLimiter: token bucket per client
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised by AdmissionController.submit when the queue is full"""
+
+
+def normalize_question(text):
+    """Case/punctuation/whitespace-insensitive key for a question"""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+class AdmissionController:
+    """At most max_concurrent jobs run; at most max_queue more wait; the rest are refused"""
+
+    def __init__(self, max_concurrent=4, max_queue=16):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="chat")
+        self.lock = threading.Lock()
+        self.in_flight = 0  # running + queued
+        self.stats = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if self.in_flight >= self.max_concurrent + self.max_queue:
+                self.stats["rejected"] += 1
+                raise Overloaded()
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.in_flight -= 1
+
+    def timed_out(self, future):
+        """Deadline passed: drop the job if it is still queued (a running LLM call can't be interrupted)"""
+        future.cancel()
+        with self.lock:
+            self.stats["timed_out"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                **self.stats,
+            }
+
+
+class RateLimiter:
+    """Token bucket per client: `rate` requests per minute with bursts up to `burst`"""
+
+    def __init__(self, rate=20, burst=5, max_clients=10000):
+        self.per_second = rate / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()  # client -> (tokens, last refill)
+        self.lock = threading.Lock()
+
+    def allow(self, client):
+        """Returns (allowed, seconds until the next token)"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[client] = (tokens, now)
+            # Least recently seen clients go first; they would have a full bucket anyway
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        retry_after = 0 if allowed else (1 - tokens) / self.per_second
+        return allowed, retry_after
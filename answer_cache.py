@@ -0,0 +1,150 @@
+"""
+answer_cache.py
+Disk-backed answer cache shared by every app.py process (SQLite, WAL mode).
+- Key: normalized question + cache version (index version + prompt/model fingerprint)
+- Value: answer text and sources
+- Size-bounded: least recently used rows are evicted past MAX_ENTRIES
+- Publishing a new index (embeddings.py, add_pdf.py, Scrapy) purges rows of older
+  versions of that index folder; running servers keep hitting rows for the index they
+  have loaded, and other tenants' indexes (tenants.py) are left alone
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from admission import normalize_question
+
+CACHE_PATH = "data/answer_cache.sqlite"
+MAX_ENTRIES = 5000
+MAX_AGE_S = 7 * 24 * 3600
+
+
+def index_folder_tag(vectorstore_dir):
+    """Same for every cwd the build scripts run from (the Scrapy pipeline uses ../data/...)"""
+    return hashlib.sha1(os.path.realpath(vectorstore_dir).encode()).hexdigest()[:6]
+
+
+def index_version(vectorstore_dir):
+    """<folder tag>.<hash>; the hash changes whenever index.faiss is rewritten, by any of the build scripts"""
+    path = os.path.join(vectorstore_dir, "index.faiss")
+    if not os.path.exists(path):
+        return f"{index_folder_tag(vectorstore_dir)}.none"
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+    return f"{index_folder_tag(vectorstore_dir)}.{digest}"
+
+
+class AnswerCache:
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, max_age=MAX_AGE_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.local = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "errors": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.connection() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    question TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    index_version TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    sources TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_hit REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (question, version)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS answers_last_hit ON answers (last_hit)")
+
+    def connection(self):
+        """One connection per thread; WAL lets several server processes read while one writes"""
+        if not hasattr(self.local, "db"):
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return self.local.db
+
+    def get(self, question, version):
+        """Cached {"response", "sources"} or None; never raises"""
+        key = normalize_question(question)
+        try:
+            with self.connection() as db:
+                row = db.execute(
+                    "SELECT response, sources, created FROM answers WHERE question = ? AND version = ?",
+                    (key, version)
+                ).fetchone()
+                if row is None or time.time() - row[2] > self.max_age:
+                    self.stats["misses"] += 1
+                    return None
+                db.execute(
+                    "UPDATE answers SET hits = hits + 1, last_hit = ? WHERE question = ? AND version = ?",
+                    (time.time(), key, version)
+                )
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Answer cache read failed: {e}")
+            return None
+        self.stats["hits"] += 1
+        return {"response": row[0], "sources": json.loads(row[1])}
+
+    def put(self, question, version, index_version, payload):
+        key = normalize_question(question)
+        now = time.time()
+        try:
+            with self.connection() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO answers (question, version, index_version, response, sources, created, last_hit) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, version, index_version, payload["response"], json.dumps(payload.get("sources", [])), now, now)
+                )
+                self.evict(db)
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Answer cache write failed: {e}")
+
+    def evict(self, db):
+        """Keep at most max_entries rows, dropping the least recently used (10% slack)"""
+        count = db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        db.execute(
+            "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY last_hit LIMIT ?)",
+            (excess,)
+        )
+
+    def purge_stale(self, current_index_version):
+        """Drop answers computed against older versions of the same index folder; returns rows removed"""
+        folder_tag = current_index_version.split(".", 1)[0]
+        with self.connection() as db:
+            removed = db.execute(
+                "DELETE FROM answers WHERE index_version != ? AND index_version LIKE ?",
+                (current_index_version, f"{folder_tag}.%")
+            ).rowcount
+            db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.max_age,))
+        return removed
+
+    def snapshot(self):
+        try:
+            count = self.connection().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        except sqlite3.Error:
+            count = None
+        return {"entries": count, "max_entries": self.max_entries, **self.stats}
+
+
+def invalidate_answer_cache(vectorstore_dir, path=CACHE_PATH):
+    """Called after publishing an index: answers from previous indexes can no longer be served"""
+    if not os.path.exists(path):
+        return
+    try:
+        removed = AnswerCache(path).purge_stale(index_version(vectorstore_dir))
+        print(f"🧹 Answer cache: dropped {removed} answers from older indexes")
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not invalidate answer cache: {e}")
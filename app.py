@@ -1,57 +1,69 @@
 from flask_cors import CORS
+import hashlib
+import hmac
+import json
+import math
 import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify, send_from_directory
+from werkzeug.utils import secure_filename
 # ------------------------
 # LangChain imports (0.3.7)
 # ------------------------
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+import quantized_index
+import partitioned_index
+from admission import AdmissionController, Overloaded, RateLimiter
+from answer_cache import AnswerCache, index_version
+from precompute_answers import PrecomputedAnswers
+from sessions import SessionStore, follow_up_context, is_follow_up, tag_chunk_ids
+from downloader import MAX_FILE_SIZE
+from ingest import INGEST_EXTS, IngestQueue, QueueFull
+from tenants import TenantManager, TenantUnavailable, UnknownTenant, load_tenant_config
 load_dotenv()
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
+app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE  # /admin/ingest uploads
 CORS(app)
 
-vectorstore = None
-qa_chain = None
+embeddings = None
+llm = None
+tenants = None  # per-tenant index, QA chain and precomputed answers (tenants.py)
+answer_cache = None
+ingest = None
 
-def initialize_chatbot():
-    global vectorstore, qa_chain
-
-    print("🚀 Initializing Nirma University Chatbot...")
+VECTORSTORE_PATH = "data/vectorstore"  # default tenant's index when there is no tenants.json
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+RETRIEVAL_K = 8
+LLM_MODEL = "gpt-4o-mini"
+QUERY_LOG_PATH = "data/query_log.jsonl"  # input for precompute_answers.py
+QUERY_LOG_MAX_BYTES = int(float(os.environ.get("QUERY_LOG_MAX_MB", 20)) * 1024 * 1024)  # then rotated to .1
 
-    # Embeddings
-    print("📦 Loading embeddings...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"}
-    )
-
-    # Load vectorstore
-    print("📂 Loading vector store...")
-    vectorstore_path = "data/vectorstore"
-    if not os.path.exists(vectorstore_path):
-        print("❌ Vector store not found! Please run embeddings.py first.")
-        return False
+# Admission control for /chat (see admission.py); override via environment
+MAX_CONCURRENT_LLM = int(os.environ.get("CHAT_MAX_CONCURRENT", 4))    # LLM calls running at once
+MAX_QUEUED = int(os.environ.get("CHAT_MAX_QUEUED", 16))               # waiting behind them
+REQUEST_DEADLINE_S = float(os.environ.get("CHAT_DEADLINE_S", 25))     # queue wait + answer
+RATE_LIMIT_PER_MIN = int(os.environ.get("CHAT_RATE_PER_MIN", 20))     # per client
+RATE_LIMIT_BURST = int(os.environ.get("CHAT_RATE_BURST", 5))
+RETRY_AFTER_S = 10
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "0") == "1"
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # /admin/* is disabled unless set
 
-    vectorstore = FAISS.load_local(
-        vectorstore_path,
-        embeddings,
-        allow_dangerous_deserialization=True
-    )
+admission = AdmissionController(MAX_CONCURRENT_LLM, MAX_QUEUED)
+rate_limiter = RateLimiter(RATE_LIMIT_PER_MIN, RATE_LIMIT_BURST)
+query_log_lock = threading.Lock()
+sessions = SessionStore()
 
-    # Initialize LLM (Ollama local model)
-    llm = ChatOpenAI(
-    model_name="gpt-4o-mini",  # or "gpt-4" / "gpt-3.5-turbo" if you prefer
-    temperature=0.3,
-    openai_api_key=os.environ.get("OPENAI_API_KEY")
-)
-
-    # Prompt template
-    template = """You are a helpful AI assistant for Nirma University. 
+# Prompt template
+PROMPT_TEMPLATE = """You are a helpful AI assistant for Nirma University. 
 Use the following context from the university's website to answer the question.
 If you don't know the answer based on the context, say "I don't have that information in my knowledge base. Please contact the university directly at admissions@nirmauni.ac.in or call +91-2717-241911."
 
@@ -63,24 +75,113 @@ Provide a clear, concise, and friendly answer. If relevant, include specific det
 
 Answer:"""
 
+def load_embeddings():
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": "cpu"}
+    )
+
+def load_vectorstore(path, embeddings, partitioned=True):
+    # Section partitions with query routing when they match the index, else the global index
+    store = partitioned_index.load_partitioned(path, embeddings) if partitioned else None
+    if store is None:
+        # Picks plain or scalar-quantized FAISS from the index metadata
+        store = quantized_index.load_vectorstore(path, embeddings)
+    # Retrieved chunks carry their docstore id, so sessions can refer back to them
+    tag_chunk_ids(store)
+    return store
+
+def build_qa_chain(vectorstore, llm, k=RETRIEVAL_K, search_type="similarity"):
+    """Retrieval + prompt path shared by the server and the offline evaluation harness"""
     PROMPT = PromptTemplate(
-        template=template,
+        template=PROMPT_TEMPLATE,
         input_variables=["context", "question"]
     )
-
-    # Create QA chain
-    print("🔗 Creating QA chain...")
-    qa_chain = RetrievalQA.from_chain_type(
+    return RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
         retriever=vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 8}
+            search_type=search_type,
+            search_kwargs={"k": k}
         ),
         return_source_documents=True,
         chain_type_kwargs={"prompt": PROMPT}
     )
 
+def load_llm():
+    return ChatOpenAI(
+        model_name=LLM_MODEL,  # or "gpt-4" / "gpt-3.5-turbo" if you prefer
+        temperature=0.3,
+        openai_api_key=os.environ.get("OPENAI_API_KEY"),
+        request_timeout=REQUEST_DEADLINE_S,  # don't let a slow call hold a worker past the deadline
+        max_retries=1
+    )
+
+def answer_cache_version(index_ver):
+    """Cached answers are valid for one index + prompt + model combination"""
+    fingerprint = hashlib.sha1(f"{PROMPT_TEMPLATE}|{LLM_MODEL}|{RETRIEVAL_K}".encode()).hexdigest()[:8]
+    return f"{index_ver}-{fingerprint}"
+
+def load_tenant(tenant):
+    """Everything one tenant's requests need; called on first use and after an ingest update"""
+    if not os.path.exists(tenant.path):
+        raise FileNotFoundError(f"Vector store not found at {tenant.path}")
+    version = index_version(tenant.path)
+    store = load_vectorstore(tenant.path, embeddings)
+    cache_version = answer_cache_version(version)
+    return {
+        "vectorstore": store,
+        "qa_chain": build_qa_chain(store, llm),
+        "index_version": version,
+        "cache_version": cache_version,
+        # Offline answers for the top questions (precompute_answers.py), if built for this index
+        "precomputed": PrecomputedAnswers.load(cache_version, embeddings, tenant.precomputed_path),
+    }
+
+def reload_precomputed(tenant_id):
+    """Pick up answers precompute_answers.py just wrote for a tenant's current index"""
+    tenant = tenants.get(tenant_id)
+    if tenant.loaded:
+        tenant.precomputed = PrecomputedAnswers.load(tenant.cache_version, embeddings, tenant.precomputed_path)
+
+def initialize_chatbot():
+    global embeddings, llm, tenants, answer_cache, ingest
+
+    print("🚀 Initializing Nirma University Chatbot...")
+
+    # Embeddings (shared by every tenant)
+    print("📦 Loading embeddings...")
+    embeddings = load_embeddings()
+
+    # Initialize LLM (Ollama local model)
+    llm = load_llm()
+
+    # Tenants load their index on first use; the default one is loaded now
+    tenant_config, default_tenant = load_tenant_config(default_dir=VECTORSTORE_PATH)
+    tenants = TenantManager(tenant_config, default_tenant, load_tenant)
+    print(f"🏫 {len(tenant_config)} tenant(s), default {default_tenant}, "
+          f"index memory budget {tenants.budget_mb:.0f} MB")
+
+    print("📂 Loading vector store...")
+    if not os.path.exists(tenants.get().path):
+        print("❌ Vector store not found! Please run embeddings.py first.")
+        return False
+
+    # Answers shared with the other server processes through SQLite
+    answer_cache = AnswerCache()
+
+    print("🔗 Creating QA chain...")
+    try:
+        tenants.ensure_loaded(tenants.get())
+    except TenantUnavailable:
+        return False
+
+    # Uploads/URLs from /admin/ingest, embedded with the model loaded above
+    ingest = IngestQueue(embeddings, tenants.get().path, on_publish=tenants.reload,
+                         on_precomputed=reload_precomputed,
+                         busy=lambda: admission.snapshot()["in_flight"] >= MAX_CONCURRENT_LLM)
+    ingest.start()
+
     print("✅ Chatbot initialized successfully!\n")
     return True
 
@@ -96,44 +197,250 @@ def home():
     return jsonify({"status": "running", "message": "Nirma University Chatbot API", "version": "1.0"})
 
 
+def answer_question(tenant, user_message, session=None, follow_up=False):
+    """Runs on an admission worker thread: retrieval + LLM; returns (payload, chunk ids used)"""
+    vectorstore, qa_chain = tenant.vectorstore, tenant.qa_chain
+    if follow_up:
+        # Previous context (plus a top-up search) instead of a context-free search
+        docs, reused = follow_up_context(vectorstore, session, user_message, RETRIEVAL_K)
+        sessions.note_follow_up(reused)
+        answer = qa_chain.combine_documents_chain.invoke({
+            "input_documents": docs,
+            "question": session.condensed_question(user_message),
+        })["output_text"]
+    else:
+        result = qa_chain.invoke({"query": user_message})
+        answer = result["result"]
+        docs = result.get("source_documents", [])
+    sources = [doc.metadata.get("source", "Unknown") for doc in docs]
+    print(f"📤 Response: {answer[:100]}...")
+    return {"response": answer, "sources": sources[:3]}, [doc.id for doc in docs if doc.id]
+
+def log_query(user_message, tenant_id):
+    """Append the question (no client data) to the log precompute_answers.py mines"""
+    line = json.dumps({"ts": round(time.time()), "question": user_message, "tenant": tenant_id}, ensure_ascii=False)
+    try:
+        with query_log_lock:
+            os.makedirs(os.path.dirname(QUERY_LOG_PATH), exist_ok=True)
+            with open(QUERY_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                size = f.tell()
+            # Keep one previous file: precompute_answers.py reads both, disk use stays bounded
+            if size > QUERY_LOG_MAX_BYTES:
+                os.replace(QUERY_LOG_PATH, QUERY_LOG_PATH + ".1")
+    except OSError as e:
+        print(f"⚠️ Could not log query: {e}")
+
+def request_tenant(data=None):
+    """Tenant id from the JSON body, the X-Tenant header or ?tenant=; None means the default tenant"""
+    return (data or {}).get("tenant") or request.headers.get("X-Tenant") or request.args.get("tenant")
+
+def client_key():
+    if TRUST_PROXY_HEADERS and request.headers.get("X-Forwarded-For"):
+        return request.headers["X-Forwarded-For"].split(",")[0].strip()
+    return request.remote_addr or "unknown"
+
+def quick_answer_key(user_message):
+    """Quick answer a question is only about: a keyword hit and no words beyond keywords/filler"""
+    tokens = re.findall(r"[a-z]+(?:-[a-z]+)*", user_message.lower())
+    keys = [key for key, keywords in QUICK_ANSWER_KEYWORDS.items()
+            if any(partitioned_index.keyword_matches(t, keywords) for t in tokens)]
+    if not keys:
+        return None
+    known = [k for keywords in QUICK_ANSWER_KEYWORDS.values() for k in keywords]
+    if all(t in QUICK_ANSWER_FILLER or partitioned_index.keyword_matches(t, known) for t in tokens):
+        return keys[0]
+    return None  # e.g. "where is the fee receipt": about something else
+
+def fallback_answer(user_message):
+    """Cheap answer for a shed request: a matching quick answer"""
+    key = quick_answer_key(user_message)
+    if key:
+        return {"response": QUICK_ANSWERS[key], "sources": []}, "quick_answer"
+    return None, None
+
+def shed(user_message, status, retry_after, reason):
+    """Degrade instead of failing: cached/quick answer if we have one, else 429/503 + Retry-After"""
+    payload, source = fallback_answer(user_message)
+    if payload:
+        print(f"🛟 {reason}: served {source}")
+        return jsonify({**payload, "status": "success", "degraded": source})
+    print(f"🚦 {reason}: {status}")
+    response = jsonify({"error": "The assistant is busy right now, please try again shortly.", "reason": reason})
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
 @app.route('/chat', methods=['POST'])
 def chat():
+    data = request.get_json(silent=True)
+    if not data or "message" not in data:
+        return jsonify({"error": "No message provided"}), 400
+
+    user_message = str(data["message"]).strip()
+    if not user_message:
+        return jsonify({"error": "Empty message"}), 400
+
+    tenant_id = request_tenant(data)
     try:
-        data = request.get_json()
-        if not data or "message" not in data:
-            return jsonify({"error": "No message provided"}), 400
+        with tenants.use(tenant_id) as tenant:
+            started = time.time()
+            response, kind = chat_for_tenant(tenant, data, user_message)
+            tenants.record(tenant, kind, time.time() - started)
+            return response
+    except UnknownTenant:
+        return jsonify({"error": f"Unknown tenant: {tenant_id}"}), 404
+    except TenantUnavailable:
+        response = jsonify({"error": "This assistant's knowledge base is unavailable right now."})
+        response.headers["Retry-After"] = str(RETRY_AFTER_S)
+        return response, 503
 
-        user_message = data["message"].strip()
-        if not user_message:
-            return jsonify({"error": "Empty message"}), 400
+def chat_for_tenant(tenant, data, user_message):
+    """Answer /chat from one tenant's index; returns (response, how it was answered)"""
+    print(f"📥 Query [{tenant.id}]: {user_message}")
+    log_query(user_message, tenant.id)
+    session = sessions.get_or_create(data.get("session_id"), tenant.id)
+    follow_up = is_follow_up(user_message, session)
+    precomputed, cache_version = tenant.precomputed, tenant.cache_version
 
-        # Get response from QA chain
-        print(f"📥 Query: {user_message}")
-        result = qa_chain.invoke({"query": user_message})
+    # Follow-ups depend on the conversation, so only standalone questions use the shared answers
+    if not follow_up:
+        # Top questions were answered offline for this index
+        answer = precomputed.lookup(user_message) if precomputed else None
+        if answer:
+            print("📌 Served precomputed answer")
+            sessions.record(session, user_message, answer["response"], [])
+            return jsonify({**answer, "status": "success", "precomputed": True, "session_id": session.id}), "precomputed"
 
-        answer = result["result"]
-        sources = [doc.metadata.get("source", "Unknown") for doc in result.get("source_documents", [])]
+        # Popular questions are answered from the shared cache without touching the LLM
+        cached = answer_cache.get(user_message, cache_version) if answer_cache else None
+        if cached:
+            print("⚡ Served from answer cache")
+            sessions.record(session, user_message, cached["response"], [])
+            return jsonify({**cached, "status": "success", "cached": True, "session_id": session.id}), "cached"
 
-        print(f"📤 Response: {answer[:100]}...")
-        return jsonify({"response": answer, "sources": sources[:3], "status": "success"})
+    allowed, retry_after = rate_limiter.allow(client_key())
+    if not allowed:
+        return shed(user_message, 429, retry_after, "rate_limited"), "shed"
+
+    try:
+        future = admission.submit(answer_question, tenant, user_message, session, follow_up)
+    except Overloaded:
+        return shed(user_message, 503, RETRY_AFTER_S, "overloaded"), "shed"
 
+    try:
+        # The deadline covers time spent queued and answering
+        payload, chunk_ids = future.result(timeout=REQUEST_DEADLINE_S)
+    except FutureTimeout:
+        admission.timed_out(future)
+        return shed(user_message, 503, RETRY_AFTER_S, "deadline_exceeded"), "shed"
     except Exception as e:
         print(f"❌ Error: {e}")
-        return jsonify({"error": "An error occurred processing your request", "details": str(e)}), 500
+        return (jsonify({"error": "An error occurred processing your request"}), 500), "error"
+
+    sessions.record(session, user_message, payload["response"], chunk_ids)
+    if answer_cache and not follow_up:
+        answer_cache.put(user_message, cache_version, tenant.index_version, payload)
+    response = jsonify({**payload, "status": "success", "session_id": session.id, "follow_up": follow_up})
+    return response, "follow_up" if follow_up else "llm"
 
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({
         "status": "healthy",
-        "vectorstore_loaded": vectorstore is not None,
-        "qa_chain_ready": qa_chain is not None
+        "vectorstore_loaded": bool(tenants and tenants.get().loaded),
+        "tenants": tenants.snapshot() if tenants else None,
+        "admission": admission.snapshot(),
+        "answer_cache": answer_cache.snapshot() if answer_cache else None,
+        "precomputed": {t.id: t.precomputed.snapshot() for t in tenants.tenants.values() if t.precomputed}
+                       if tenants else None,
+        "sessions": sessions.snapshot(),
+        "ingest": ingest.snapshot() if ingest else None,
+        "qa_chain_ready": bool(tenants and tenants.get().qa_chain is not None)
     })
 
+def admin_denied():
+    """None if the request carries the admin token, else an error response"""
+    token = request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+    if ingest is None:
+        return jsonify({"error": "Chatbot not initialized"}), 503
+    return None
+
+@app.route('/admin/ingest', methods=['POST'])
+def admin_ingest():
+    """Queue uploaded files (multipart "file") and/or URLs ("url", form or JSON); returns the jobs"""
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    data = request.get_json(silent=True) or {}
+    try:
+        tenant = tenants.get(request_tenant(data) or request.form.get("tenant"))
+    except UnknownTenant:
+        return jsonify({"error": "Unknown tenant"}), 404
+    urls = request.form.getlist("url") + data.get("urls", []) + ([data["url"]] if data.get("url") else [])
+    uploads = request.files.getlist("file")
+    if not urls and not uploads:
+        return jsonify({"error": "No file or url provided"}), 400
+
+    jobs = []
+    try:
+        for upload in uploads:
+            name = secure_filename(upload.filename or "")
+            if not name.lower().endswith(INGEST_EXTS):
+                return jsonify({"error": f"Unsupported file type: {upload.filename}",
+                                "supported": list(INGEST_EXTS), "jobs": jobs}), 400
+            path = os.path.join(ingest.upload_dir, f"{uuid.uuid4().hex[:12]}_{name}")
+            upload.save(path)
+            jobs.append(ingest.submit("file", name, name=upload.filename, path=path,
+                                      tenant=tenant.id, vectorstore_dir=tenant.path))
+        for url in urls:
+            if not str(url).startswith(("http://", "https://")):
+                return jsonify({"error": f"Not an http(s) URL: {url}", "jobs": jobs}), 400
+            jobs.append(ingest.submit("url", url, tenant=tenant.id, vectorstore_dir=tenant.path))
+    except QueueFull:
+        response = jsonify({"error": "Ingest queue is full, try again later", "jobs": jobs})
+        response.headers["Retry-After"] = str(RETRY_AFTER_S * 6)
+        return response, 503
+    print(f"🗃️  Queued {len(jobs)} ingest job(s) for tenant {tenant.id}")
+    return jsonify({"jobs": jobs, "status": "queued"}), 202
+
+@app.route('/admin/ingest', methods=['GET'])
+def admin_ingest_jobs():
+    denied = admin_denied()
+    if denied:
+        return denied
+    return jsonify({"jobs": ingest.list_jobs(), "queue": ingest.snapshot()})
+
+@app.route('/admin/ingest/<job_id>', methods=['GET'])
+def admin_ingest_job(job_id):
+    denied = admin_denied()
+    if denied:
+        return denied
+    job = ingest.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
 QUICK_ANSWERS = {
     "contact": "You can contact Nirma University at:\n📧 Email: info@nirmauni.ac.in\n📞 Phone: +91-2717-241911\n📍 Address: Sarkhej-Gandhinagar Highway, Ahmedabad - 382481, Gujarat, India",
     "location": "Nirma University is located at Sarkhej-Gandhinagar Highway, Ahmedabad - 382481, Gujarat, India.",
 }
 
+# Used to answer /chat without the LLM while shedding load: whole words (see
+# partitioned_index.keyword_matches), and only for questions made of these plus QUICK_ANSWER_FILLER
+QUICK_ANSWER_KEYWORDS = {
+    "contact": ("contact", "phone", "telephone", "email", "e-mail", "mail", "call"),
+    "location": ("location", "address", "where", "located", "reach", "direction"),
+}
+QUICK_ANSWER_FILLER = {
+    "what", "whats", "s", "is", "are", "the", "a", "an", "of", "for", "to", "in", "at", "and", "or",
+    "how", "can", "could", "do", "does", "i", "we", "me", "my", "you", "your", "its", "please", "tell",
+    "give", "get", "find", "share", "number", "id", "details", "info", "information",
+    "nirma", "university", "nu", "campus", "college",
+}
+
 @app.route('/quick-answer/<key>', methods=['GET'])
 def quick_answer(key):
     if key in QUICK_ANSWERS:
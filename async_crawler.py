@@ -0,0 +1,247 @@
+"""
+async_crawler.py
+Concurrent crawl engine for www.nirmauni.ac.in built on asyncio + aiohttp.
+- One pooled HTTP client (keep-alive connections are reused across pages)
+- Global and per-host concurrency limits
+- Adaptive per-host delay driven by response latency and 429 responses
+- Honors robots.txt rules and Crawl-delay
+- Revalidates against the HTTP cache (http_cache.py) on recrawls
+- Uses the persistent frontier (frontier.py), so interrupted crawls resume
+- Writes the same output as scraper.py: data/corpus shards + data/raw/changes.json
+- Reports throughput, latency, retries and errors via crawl_metrics.py
+"""
+
+import argparse
+import asyncio
+import time
+import urllib.robotparser
+from urllib.parse import urlparse
+
+import aiohttp
+
+from crawl_metrics import CrawlMetrics
+from scraper import GONE_STATUSES, HEADERS, NirmaWebsiteScraper
+
+
+# ---------------- CONFIG -----------------
+START_URL = "https://www.nirmauni.ac.in"
+GLOBAL_CONCURRENCY = 16     # requests in flight across all hosts
+PER_HOST_CONCURRENCY = 4    # requests in flight per host
+TIMEOUT = 20
+MIN_DELAY = 0.25            # floor for the per-host delay (seconds)
+MAX_DELAY = 30.0            # ceiling for the per-host delay (seconds)
+TARGET_CONCURRENCY = 2.0    # average parallel requests we aim for per host
+MAX_RETRIES = 3             # retries for 429 / 5xx before giving up on a URL
+# -----------------------------------------
+
+
+class HostThrottle:
+    """Per-host politeness: concurrency slot + adaptive delay between requests"""
+
+    def __init__(self, concurrency, crawl_delay=None):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.min_delay = max(MIN_DELAY, crawl_delay or 0)
+        self.delay = self.min_delay
+        self.next_request_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        """Sleep until this host may receive its next request"""
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_request_at - now
+            self.next_request_at = max(now, self.next_request_at) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_latency(self, latency, status):
+        """AutoThrottle-style update: aim for latency / TARGET_CONCURRENCY"""
+        target = latency / TARGET_CONCURRENCY
+        new_delay = (self.delay + target) / 2.0
+        # Errors are usually fast; never let them speed the crawl up
+        if status >= 500 and new_delay < self.delay:
+            return
+        self.delay = min(MAX_DELAY, max(self.min_delay, new_delay))
+
+    def back_off(self, retry_after=None):
+        """Slow down after a 429, respecting Retry-After when present"""
+        self.delay = min(MAX_DELAY, max(self.delay * 2, retry_after or 0, self.min_delay))
+        self.next_request_at = time.monotonic() + (retry_after or self.delay)
+
+
+class AsyncCrawler:
+    def __init__(self, scraper=None, concurrency=GLOBAL_CONCURRENCY, per_host=PER_HOST_CONCURRENCY):
+        self.metrics = scraper.metrics if scraper else CrawlMetrics("async_crawler")
+        self.scraper = scraper or NirmaWebsiteScraper(metrics=self.metrics)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.hosts = {}
+        self.robots = {}
+        self.pages_scraped = 0
+        self.in_flight = 0
+
+    async def get_robots(self, session, host, scheme):
+        """Fetch and cache robots.txt for a host"""
+        if host not in self.robots:
+            rp = urllib.robotparser.RobotFileParser()
+            try:
+                async with session.get(f"{scheme}://{host}/robots.txt", ssl=False) as resp:
+                    if resp.status == 200:
+                        rp.parse((await resp.text(errors="ignore")).splitlines())
+                    else:
+                        rp.allow_all = True
+            except Exception as e:
+                print(f"⚠️ Could not read robots.txt for {host}: {e}")
+                rp.allow_all = True
+            self.robots[host] = rp
+        return self.robots[host]
+
+    async def get_host(self, session, url):
+        """Return (throttle, robots parser) for the URL's host"""
+        parsed = urlparse(url)
+        rp = await self.get_robots(session, parsed.netloc, parsed.scheme or "https")
+        if parsed.netloc not in self.hosts:
+            crawl_delay = rp.crawl_delay(HEADERS["User-Agent"]) or rp.crawl_delay("*")
+            if crawl_delay:
+                print(f"🐢 {parsed.netloc} asks for Crawl-delay: {crawl_delay}s")
+            self.hosts[parsed.netloc] = HostThrottle(self.per_host, crawl_delay)
+        return self.hosts[parsed.netloc], rp
+
+    async def fetch(self, session, url):
+        """Download one page politely; returns HTML bytes or None"""
+        throttle, rp = await self.get_host(session, url)
+        if not rp.can_fetch(HEADERS["User-Agent"], url):
+            print(f"[SKIP] Blocked by robots.txt: {url}")
+            return None
+
+        cache = self.scraper.http_cache
+        for attempt in range(MAX_RETRIES + 1):
+            async with throttle.semaphore:
+                await throttle.wait_turn()
+                started = time.monotonic()
+                try:
+                    async with session.get(url, ssl=False, headers=cache.conditional_headers(url)) as resp:
+                        body = await resp.read()
+                        status = resp.status
+                        content_type = resp.headers.get("Content-Type", "text/html")
+                        retry_after = resp.headers.get("Retry-After")
+                        headers = resp.headers
+                except Exception as e:
+                    print(f"❌ Error requesting {url}: {e}")
+                    self.metrics.record_fetch(None, time.monotonic() - started)
+                    self.metrics.record_error(type(e).__name__)
+                    if attempt < MAX_RETRIES:
+                        self.metrics.record_retry(type(e).__name__)
+                    throttle.back_off()
+                    continue
+                latency = time.monotonic() - started
+                throttle.record_latency(latency, status)
+                self.metrics.gauge(f"delay_s:{urlparse(url).netloc}", round(throttle.delay, 3))
+                self.metrics.record_fetch(status, latency, len(body))
+
+            if status == 429 or status >= 500:
+                wait = float(retry_after) if retry_after and retry_after.isdigit() else None
+                if status == 429:
+                    throttle.back_off(wait)
+                if attempt < MAX_RETRIES:
+                    self.metrics.record_retry(status)
+                print(f"🔁 {status} for {url} (attempt {attempt + 1}/{MAX_RETRIES + 1}), delay now {throttle.delay:.2f}s")
+                continue
+            if status == 304:
+                cache.touch(url)
+                self.scraper.unchanged_urls.add(url)
+                return cache.cached_body(url)
+            if status in GONE_STATUSES:
+                self.scraper.gone_urls.add(url)
+                return None
+            if status != 200 or "html" not in content_type.lower():
+                return None
+            if not cache.store(url, headers, body):
+                self.scraper.unchanged_urls.add(url)
+            return body
+        return None
+
+    async def worker(self, session, frontier, max_pages, max_depth):
+        loop = asyncio.get_running_loop()
+        while self.pages_scraped < max_pages:
+            entry = frontier.pop()
+            if entry is None:
+                # Other workers may still add links; stop once nobody is busy
+                if self.in_flight == 0:
+                    return
+                await asyncio.sleep(0.05)
+                continue
+
+            url, depth = entry
+            self.in_flight += 1
+            try:
+                self.scraper.visited_urls.add(url)
+                print(f"Scraping: {url}")
+                html = await self.fetch(session, url)
+                if not html:
+                    continue
+
+                # Parsing is CPU-bound; keep it off the event loop
+                data, links = await loop.run_in_executor(None, self.scraper.parse_page, url, html)
+                if data and self.pages_scraped < max_pages:
+                    self.scraper.scraped_data.append(data)
+                    self.pages_scraped += 1
+                    self.scraper.save_page(data, self.pages_scraped)
+                    print(f"Progress: {self.pages_scraped}/{max_pages} pages scraped ({len(frontier)} queued)")
+
+                if depth < max_depth:
+                    for link in links:
+                        frontier.add(link, depth + 1)
+            except Exception as e:
+                print(f"Error scraping {url}: {e}")
+            finally:
+                frontier.mark_done(url, self.pages_scraped)
+                self.in_flight -= 1
+                self.metrics.gauge("frontier", len(frontier))
+                self.metrics.gauge("in_flight", self.in_flight)
+
+    async def run(self, start_url, max_pages, max_depth, resume=True):
+        frontier = self.scraper.open_frontier(start_url, resume=resume)
+        self.pages_scraped = frontier.pages_scraped
+        self.in_flight = 0
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            await asyncio.gather(*[
+                self.worker(session, frontier, max_pages, max_depth)
+                for _ in range(self.concurrency)
+            ])
+        frontier.finish()
+        frontier.close()
+
+    def crawl(self, start_url=START_URL, max_pages=1000, max_depth=5, resume=True):
+        """Crawl concurrently and save results in the scraper.py formats"""
+        started = time.time()
+        self.metrics.start()
+        try:
+            asyncio.run(self.run(start_url, max_pages, max_depth, resume=resume))
+            elapsed = time.time() - started
+            print(f"\n✅ Async crawl complete! Total pages: {self.pages_scraped} in {elapsed:.0f}s")
+            self.scraper.downloader.close()
+            self.scraper.save_data()
+            self.scraper.record_sitemap_state()
+        finally:
+            self.metrics.close()  # summary + final snapshot even on errors / Ctrl-C
+        return self.scraper.scraped_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent crawler for the Nirma University website.")
+    parser.add_argument("--start-url", default=START_URL)
+    parser.add_argument("--max-pages", type=int, default=5000)
+    parser.add_argument("--max-depth", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=GLOBAL_CONCURRENCY, help="Requests in flight across all hosts")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY, help="Requests in flight per host")
+    parser.add_argument("--fresh", action="store_true", help="Ignore any interrupted crawl state and start over")
+    args = parser.parse_args()
+
+    print("🕷️  Starting Nirma University async crawler...\n")
+    crawler = AsyncCrawler(concurrency=args.concurrency, per_host=args.per_host)
+    crawler.crawl(args.start_url, max_pages=args.max_pages, max_depth=args.max_depth, resume=not args.fresh)
+    print(f"\n✨ Check '{crawler.scraper.data_dir}/' for results.")
@@ -0,0 +1,171 @@
+"""
+answer_quality.py
+End-to-end answer quality regression gate for performance changes.
+
+Runs the real app.py retrieval + prompt path (build_qa_chain) for every question
+in benchmarks/golden_questions.json against a deterministic local stand-in LLM,
+and scores each configuration on:
+- source recall: share of expected source URLs the retriever returned
+- fact recall:   share of expected key facts that reached the prompt context
+Prints a speed-vs-quality table and exits non-zero when a configuration loses
+more than --max-drop recall against the baseline.
+
+Usage (from the repository root):
+    python -m benchmarks.answer_quality
+    python -m benchmarks.answer_quality --config "k4:k=4" --config "mmr:k=8,search_type=mmr"
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+from langchain_core.language_models.llms import LLM
+
+import app
+from benchmarks.retrieval_benchmark import GOLDEN_FILE, RESULTS_DIR, latency_stats, load_golden, source_matches
+
+DEFAULT_CONFIGS = [
+    "baseline:k=8,routing=off",
+    "routed:k=8",
+    "k5:k=5",
+    "k3:k=3",
+    "mmr:k=8,search_type=mmr",
+]
+
+
+class StandInLLM(LLM):
+    """Deterministic local LLM: records every prompt and answers with the best-matching context sentences"""
+
+    prompts: list = []
+
+    @property
+    def _llm_type(self):
+        return "stand-in"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(prompt)
+        context, question = split_prompt(prompt)
+        words = set(re.findall(r"\w+", question.lower()))
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", context) if s.strip()]
+        if not sentences:
+            return "I don't have that information in my knowledge base."
+        ranked = sorted(sentences, key=lambda s: -len(words & set(re.findall(r"\w+", s.lower()))))
+        return " ".join(ranked[:2])
+
+
+def split_prompt(prompt):
+    """Pull the {context} and {question} back out of app.PROMPT_TEMPLATE"""
+    _, _, rest = prompt.partition("Context: ")
+    context, _, rest = rest.partition("\n\nQuestion: ")
+    question = rest.split("\n\n", 1)[0]
+    return context, question
+
+
+def parse_config(spec):
+    """'name:k=4,search_type=mmr,index=data/vectorstore_sq8,routing=off' -> dict"""
+    name, _, params = spec.partition(":")
+    config = {"name": name, "k": app.RETRIEVAL_K, "search_type": "similarity", "index": app.VECTORSTORE_PATH,
+              "routing": "on"}
+    for pair in filter(None, params.split(",")):
+        key, _, value = pair.partition("=")
+        config[key.strip()] = int(value) if key.strip() == "k" else value.strip()
+    return config
+
+
+def evaluate(config, golden, embeddings, vectorstores):
+    key = (config["index"], config["routing"])
+    if key not in vectorstores:
+        started = time.perf_counter()
+        vectorstores[key] = app.load_vectorstore(config["index"], embeddings, partitioned=config["routing"] != "off")
+        print(f"📂 Loaded {config['index']} (routing {config['routing']}) in {time.perf_counter() - started:.2f}s")
+    llm = StandInLLM()
+    chain = app.build_qa_chain(vectorstores[key], llm, k=config["k"], search_type=config["search_type"])
+
+    timings, source_scores, fact_scores, per_question = [], [], [], []
+    for item in golden:
+        started = time.perf_counter()
+        result = chain.invoke({"query": item["question"]})
+        timings.append(time.perf_counter() - started)
+
+        sources = [doc.metadata.get("source", "") for doc in result.get("source_documents", [])]
+        found_sources = set()
+        for s in sources:
+            found_sources.update(source_matches(s, item["sources"]))
+        context, _ = split_prompt(llm.prompts[-1])
+        found_facts = [f for f in item.get("facts", []) if f.lower() in context.lower()]
+
+        source_scores.append(len(found_sources) / len(item["sources"]) if item["sources"] else 1.0)
+        fact_scores.append(len(found_facts) / len(item["facts"]) if item.get("facts") else 1.0)
+        per_question.append({
+            "question": item["question"],
+            "sources_found": sorted(found_sources),
+            "facts_found": found_facts,
+            "context_chars": len(context),
+        })
+
+    return {
+        **config,
+        "latency": latency_stats(timings),
+        "source_recall": round(float(np.mean(source_scores)), 4),
+        "fact_recall": round(float(np.mean(fact_scores)), 4),
+        "mean_context_chars": int(np.mean([q["context_chars"] for q in per_question])),
+        "questions": per_question,
+    }
+
+
+def print_table(results, baseline, max_drop):
+    header = f"{'config':<14}{'index':<28}{'k':>3} {'search':<11}{'p50 ms':>9}{'p95 ms':>9}{'ctx chars':>10}{'sources':>9}{'facts':>8}{'Δfacts':>8}  status"
+    print("\n" + header)
+    print("-" * len(header))
+    failures = []
+    for r in results:
+        d_src = r["source_recall"] - baseline["source_recall"]
+        d_fact = r["fact_recall"] - baseline["fact_recall"]
+        ok = d_src >= -max_drop and d_fact >= -max_drop
+        if not ok:
+            failures.append(r["name"])
+        print(f"{r['name']:<14}{r['index'][-27:]:<28}{r['k']:>3} {r['search_type']:<11}"
+              f"{r['latency']['p50_ms']:>9.1f}{r['latency']['p95_ms']:>9.1f}{r['mean_context_chars']:>10}"
+              f"{r['source_recall']:>9.3f}{r['fact_recall']:>8.3f}{d_fact:>+8.3f}  {'✅' if ok else '❌ REGRESSION'}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed-vs-quality regression gate for the retrieval + prompt path.")
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--config", action="append", default=None,
+                        help="name:key=value,... with keys k, search_type, index, routing (repeatable)")
+    parser.add_argument("--baseline", default=None, help="Config name to compare against (default: first)")
+    parser.add_argument("--max-drop", type=float, default=0.05, help="Allowed recall drop vs baseline")
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    configs = [parse_config(c) for c in (args.config or DEFAULT_CONFIGS)]
+    print(f"🧪 {len(golden)} golden questions x {len(configs)} configurations")
+
+    embeddings = app.load_embeddings()
+    vectorstores = {}
+    results = [evaluate(c, golden, embeddings, vectorstores) for c in configs]
+
+    baseline = next((r for r in results if r["name"] == args.baseline), results[0])
+    failures = print_table(results, baseline, args.max_drop)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"answer_quality_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"baseline": baseline["name"], "max_drop": args.max_drop, "results": results}, f, indent=2)
+    print(f"\n💾 Report written to {output}")
+
+    if failures:
+        print(f"❌ Quality regression in: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ No configuration dropped more than the allowed recall.")
+
+
+if __name__ == "__main__":
+    main()
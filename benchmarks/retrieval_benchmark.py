@@ -0,0 +1,326 @@
+"""
+retrieval_benchmark.py
+Offline benchmark for embeddings + FAISS retrieval on a fixed corpus snapshot.
+Reports (as JSON, one file per run) :
+- embedding throughput for index builds (chunks/s) and single-query latency
+- FAISS search latency percentiles at several corpus sizes (real + synthetic scale-ups)
+- index build time and peak memory per index type
+- recall@k / MRR against the labeled questions in benchmarks/golden_questions.json
+
+Usage (from the repository root):
+    python -m benchmarks.retrieval_benchmark --chunk-sizes 500,800,1200 --k 1,3,5,8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import threading
+import time
+
+import faiss
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain.docstore.document import Document
+
+from build_profile import rss_mb
+from corpus import CORPUS_DIR, load_index, iter_records
+
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), "golden_questions.json")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+# ---------------- measurement helpers -----------------
+
+class PeakMemory:
+    """Samples RSS in a background thread; FAISS allocations are invisible to tracemalloc"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_mb = self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, rss_mb())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, rss_mb())
+
+    @property
+    def delta_mb(self):
+        return round(self.peak_mb - self.start_mb, 1)
+
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "runs": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+# ---------------- corpus / golden set -----------------
+
+def corpus_fingerprint(corpus_dir):
+    """Identifies the snapshot so runs are only compared on the same data"""
+    index = load_index(corpus_dir)
+    return hashlib.sha1(json.dumps(index["shards"], sort_keys=True).encode()).hexdigest()[:12]
+
+
+def load_corpus(corpus_dir, limit=None):
+    documents = []
+    for record in iter_records(corpus_dir):
+        documents.append(Document(page_content=record["content"],
+                                  metadata={"source": record["url"], "title": record.get("title", "")}))
+        if limit and len(documents) >= limit:
+            break
+    return documents
+
+
+def load_golden(path=GOLDEN_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def source_matches(source, patterns):
+    """Expected sources are URL substrings (e.g. "admission"), matched case-insensitively"""
+    source = (source or "").lower()
+    return [p for p in patterns if p.lower() in source]
+
+
+# ---------------- benchmarks -----------------
+
+def split_documents(documents, chunk_size, chunk_overlap):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    return splitter.split_documents(documents)
+
+
+def bench_build_embedding(embeddings, texts):
+    started = time.perf_counter()
+    with PeakMemory() as mem:
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+    elapsed = time.perf_counter() - started
+    return vectors, {
+        "chunks": len(texts),
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(len(texts) / elapsed, 1) if elapsed else None,
+        "peak_rss_delta_mb": mem.delta_mb,
+    }
+
+
+def bench_query_embedding(embeddings, questions, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        for q in questions:
+            started = time.perf_counter()
+            embeddings.embed_query(q)
+            timings.append(time.perf_counter() - started)
+    stats = latency_stats(timings)
+    stats["queries_per_s"] = round(1000.0 / stats["mean_ms"], 1) if stats["mean_ms"] else None
+    return stats
+
+
+def build_index(vectors, index_type):
+    """Build a FAISS index; returns (index, stats)"""
+    n, d = vectors.shape
+    started = time.perf_counter()
+    with PeakMemory() as mem:
+        if index_type == "flat":
+            index = faiss.IndexFlatL2(d)  # what FAISS.from_documents uses
+        elif index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(d, 32)
+        elif index_type == "ivf":
+            nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+            quantizer = faiss.IndexFlatL2(d)
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+            index.train(vectors)
+            index.nprobe = max(1, nlist // 16)
+        else:
+            raise ValueError(f"Unknown index type: {index_type}")
+        index.add(vectors)
+    return index, {
+        "index_type": index_type,
+        "vectors": n,
+        "build_s": round(time.perf_counter() - started, 3),
+        "peak_rss_delta_mb": mem.delta_mb,
+    }
+
+
+def bench_search(index, queries, k, runs):
+    timings = []
+    for i in range(runs):
+        q = queries[i % len(queries)][None, :]
+        started = time.perf_counter()
+        index.search(q, k)
+        timings.append(time.perf_counter() - started)
+    return latency_stats(timings)
+
+
+def evaluate_recall(index, chunk_sources, query_vectors, golden, ks):
+    """recall@k = share of a question's expected sources found in the top k chunks"""
+    max_k = max(ks)
+    _, ids = index.search(query_vectors, max_k)
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+    for row, item in zip(ids, golden):
+        sources = [chunk_sources[i] for i in row if i >= 0]
+        for k in ks:
+            found = set()
+            for s in sources[:k]:
+                found.update(source_matches(s, item["sources"]))
+            recalls[k].append(len(found) / len(item["sources"]))
+        rank = next((r for r, s in enumerate(sources, 1) if source_matches(s, item["sources"])), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    result = {f"recall@{k}": round(float(np.mean(v)), 4) for k, v in recalls.items()}
+    result["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+    return result
+
+
+def synthetic_vectors(vectors, n, seed=0):
+    """Scale the real corpus up to n vectors: resample + small noise, keep the norm profile"""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), size=n)]
+    noise = rng.normal(0, 0.02, size=picked.shape).astype("float32")
+    scaled = picked + noise
+    norms = np.linalg.norm(picked, axis=1, keepdims=True)
+    scaled *= norms / np.maximum(np.linalg.norm(scaled, axis=1, keepdims=True), 1e-12)
+    return scaled.astype("float32")
+
+
+# ---------------- main -----------------
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def run(args):
+    documents = load_corpus(args.corpus, args.limit_docs)
+    if not documents:
+        raise SystemExit(f"❌ No corpus records in {args.corpus}. Run a crawler first.")
+    golden = load_golden(args.golden)
+    questions = [g["question"] for g in golden]
+    print(f"📚 {len(documents)} documents, {len(golden)} labeled questions")
+
+    with PeakMemory() as mem:
+        embeddings = HuggingFaceEmbeddings(
+            model_name=args.model,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"batch_size": args.batch_size}
+        )
+        embeddings.embed_query("warm up")
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "corpus_dir": args.corpus,
+            "corpus_fingerprint": corpus_fingerprint(args.corpus),
+            "documents": len(documents),
+            "golden_questions": len(golden),
+            "model": args.model,
+            "batch_size": args.batch_size,
+            "faiss_version": faiss.__version__,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": _torch_threads(),
+        },
+        "model_load": {"peak_rss_delta_mb": mem.delta_mb},
+        "query_embedding": bench_query_embedding(embeddings, questions),
+        "configs": [],
+        "scale": [],
+    }
+    print(f"🔎 Query embedding p50 {report['query_embedding']['p50_ms']} ms")
+
+    query_vectors = np.asarray(embeddings.embed_documents(questions), dtype="float32")
+    scale_vectors = None
+    for chunk_size in args.chunk_sizes:
+        chunks = split_documents(documents, chunk_size, args.chunk_overlap)
+        texts = [c.page_content for c in chunks]
+        sources = [c.metadata.get("source") for c in chunks]
+        vectors, embed_stats = bench_build_embedding(embeddings, texts)
+        print(f"✂️  chunk_size={chunk_size}: {len(texts)} chunks, {embed_stats['chunks_per_s']} chunks/s")
+        if scale_vectors is None or chunk_size == 800:
+            scale_vectors = vectors
+
+        for index_type in args.index_types:
+            index, build_stats = build_index(vectors, index_type)
+            entry = {
+                "chunk_size": chunk_size,
+                "chunk_overlap": args.chunk_overlap,
+                "embedding": embed_stats,
+                "build": build_stats,
+                "search": {f"k={k}": bench_search(index, query_vectors, k, args.search_runs) for k in args.k},
+                "quality": evaluate_recall(index, sources, query_vectors, golden, args.k),
+            }
+            report["configs"].append(entry)
+            print(f"   {index_type}: build {build_stats['build_s']}s, "
+                  f"recall@{max(args.k)} {entry['quality'][f'recall@{max(args.k)}']}")
+
+    for n in args.scales:
+        vectors = synthetic_vectors(scale_vectors, n)
+        queries = synthetic_vectors(scale_vectors, 256, seed=1)
+        for index_type in args.index_types:
+            index, build_stats = build_index(vectors, index_type)
+            search = {f"k={k}": bench_search(index, queries, k, args.search_runs) for k in args.k}
+            report["scale"].append({"synthetic": True, "build": build_stats, "search": search})
+            print(f"📈 {n} vectors / {index_type}: build {build_stats['build_s']}s, "
+                  f"p95 {search[f'k={max(args.k)}']['p95_ms']} ms")
+            del index
+
+    return report
+
+
+def _torch_threads():
+    try:
+        import torch
+        return torch.get_num_threads()
+    except ImportError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput, FAISS latency and retrieval recall.")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Corpus snapshot directory")
+    parser.add_argument("--golden", default=GOLDEN_FILE, help="Labeled question -> source set")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--batch-size", type=int, default=32, help="Embedding batch size")
+    parser.add_argument("--chunk-sizes", type=parse_ints, default=[800])
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--k", type=parse_ints, default=[1, 3, 5, 8])
+    parser.add_argument("--index-types", type=lambda v: v.split(","), default=["flat"], help="flat,hnsw,ivf")
+    parser.add_argument("--scales", type=parse_ints, default=[10000, 100000], help="Synthetic corpus sizes")
+    parser.add_argument("--search-runs", type=int, default=500)
+    parser.add_argument("--limit-docs", type=int, default=None)
+    parser.add_argument("--output", default=None, help="JSON output path (default benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"retrieval_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+build_profile.py
+Opt-in profiling for the index build scripts (embeddings.py, add_pdf.py).
+- Per stage (load per file type, split, embed, index add, save...): wall time,
+  CPU time, peak RSS, item counts and throughput
+- Written as a JSON report to data/profiles/
+- Optional flame graph recorded by the py-spy sampling profiler, if installed
+"""
+
+import json
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILES_DIR = "data/profiles"
+SAMPLE_INTERVAL = 0.05  # seconds between RSS samples
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def document_kind(doc):
+    """File type a loaded document came from, for per-type load stages"""
+    source = str(doc.metadata.get("source", "")).lower()
+    for ext in (".pdf", ".pptx", ".docx", ".txt"):
+        if source.endswith(ext):
+            return ext[1:]
+    if "page" in doc.metadata:
+        return "pdf"
+    return "page"  # crawled web page (corpus / all_data.json)
+
+
+class BuildProfiler:
+    """Collects per-stage timings; every method is a no-op unless enabled"""
+
+    def __init__(self, name, enabled=False, flamegraph=False, profiles_dir=PROFILES_DIR):
+        self.name = name
+        self.enabled = enabled
+        self.stages = {}
+        self.current = None
+        self.spy = None
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        self.report_path = os.path.join(profiles_dir, f"{name}_{stamp}.json")
+        self.flamegraph_path = os.path.join(profiles_dir, f"{name}_{stamp}.svg") if flamegraph else None
+        if not enabled:
+            return
+        os.makedirs(profiles_dir, exist_ok=True)
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.peak_rss_mb = rss_mb()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        if self.flamegraph_path:
+            self.start_flamegraph()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self._note_rss()
+
+    def _note_rss(self):
+        mb = rss_mb()
+        self.peak_rss_mb = max(self.peak_rss_mb, mb)
+        if self.current is not None:
+            self.current["peak_rss_mb"] = max(self.current["peak_rss_mb"], mb)
+
+    def start_flamegraph(self):
+        if shutil.which("py-spy") is None:
+            print("⚠️ py-spy not installed (pip install py-spy), skipping flame graph")
+            self.flamegraph_path = None
+            return
+        # Sample this process and the embedding workers from outside; SIGINT makes py-spy write the SVG
+        self.spy = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--subprocesses", "--rate", "100",
+             "--output", self.flamegraph_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        print(f"🔥 Recording flame graph to {self.flamegraph_path}")
+
+    def _stage_record(self, name):
+        if name not in self.stages:
+            self.stages[name] = {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "items": 0, "peak_rss_mb": 0.0}
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name):
+        """Time one stage run; the caller may add counts via counts["items"] += n"""
+        counts = {"items": 0}
+        if not self.enabled:
+            yield counts
+            return
+        record = self._stage_record(name)
+        previous, self.current = self.current, record
+        self._note_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield counts
+        finally:
+            record["calls"] += 1
+            record["wall_s"] += time.perf_counter() - wall
+            record["cpu_s"] += time.process_time() - cpu
+            record["items"] += counts["items"]
+            self._note_rss()
+            self.current = previous
+
+    def iter_stage(self, iterable, stage_name):
+        """Yield from iterable, charging the time of each next() to stage_name(item)"""
+        iterator = iter(iterable)
+        if not self.enabled:
+            yield from iterator
+            return
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            record = self._stage_record(stage_name(item))
+            record["calls"] += 1
+            record["items"] += 1
+            record["wall_s"] += time.perf_counter() - wall
+            record["cpu_s"] += time.process_time() - cpu
+            mb = rss_mb()
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], mb)
+            self.peak_rss_mb = max(self.peak_rss_mb, mb)
+            yield item
+
+    def finish(self, **extra):
+        """Write the JSON report (and stop the flame graph recorder); returns the report"""
+        if not self.enabled:
+            return None
+        self.enabled = False
+        self._stop.set()
+        self._sampler.join()
+        if self.spy is not None:
+            self.spy.send_signal(signal.SIGINT)
+            try:
+                self.spy.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.spy.kill()
+                self.flamegraph_path = None
+
+        children = os.times()
+        stages = {}
+        for name, record in self.stages.items():
+            wall = record["wall_s"]
+            stages[name] = {
+                "calls": record["calls"],
+                "wall_s": round(wall, 3),
+                "cpu_s": round(record["cpu_s"], 3),
+                "peak_rss_mb": round(record["peak_rss_mb"], 1),
+                "items": record["items"],
+                "items_per_s": round(record["items"] / wall, 1) if wall > 0 and record["items"] else None,
+            }
+        report = {
+            "name": self.name,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "wall_s": round(time.perf_counter() - self.started, 3),
+            "cpu_s": round(time.process_time() - self.started_cpu, 3),
+            # Finished child processes, e.g. the embedding worker pool
+            "children_cpu_s": round(children.children_user + children.children_system, 3),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "stages": stages,
+            "flamegraph": self.flamegraph_path,
+            **extra,
+        }
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        self.print_summary(report)
+        return report
+
+    def print_summary(self, report):
+        print(f"\n⏱️  Profile: {report['wall_s']:.1f}s wall, {report['cpu_s']:.1f}s CPU, "
+              f"peak RSS {report['peak_rss_mb']:.0f} MB")
+        print(f"{'stage':<16}{'calls':>7}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'items':>9}{'items/s':>10}")
+        for name, s in sorted(report["stages"].items(), key=lambda x: -x[1]["wall_s"]):
+            rate = f"{s['items_per_s']:.1f}" if s["items_per_s"] is not None else "-"
+            print(f"{name:<16}{s['calls']:>7}{s['wall_s']:>9.2f}{s['cpu_s']:>9.2f}"
+                  f"{s['peak_rss_mb']:>9.0f}{s['items']:>9}{rate:>10}")
+        print(f"📝 Profile report saved to {self.report_path}")
+        if report["flamegraph"]:
+            print(f"🔥 Flame graph saved to {report['flamegraph']}")
@@ -0,0 +1,193 @@
+"""
+corpus.py
+Shared on-disk corpus format for every crawler (scraper.py, async_crawler.py,
+crawl.py and the Scrapy project).
+- Append-only, zstd-compressed JSONL shards: data/corpus/shard-00000.jsonl.zst
+- index.json lists the shards in write order with record counts
+- One record per page: {"url", "title", "content", "crawler", "fetched_at"}
+- Readers stream records; when a URL was recrawled the newest record wins (found with a
+  first pass that keeps only URL -> (shard, line), so no shard is held in memory)
+- A page that disappeared gets a tombstone record ({"url", "removed": true}) that hides it
+"""
+
+import io
+import json
+import os
+import time
+
+import zstandard as zstd
+
+CORPUS_DIR = "data/corpus"
+INDEX_FILE = "index.json"
+SHARD_MAX_RECORDS = 5000
+FLUSH_EVERY = 50  # records per zstd frame; a crash loses at most one frame
+URL_PREFIX = '{"url": '             # CorpusWriter always writes the URL first...
+TOMBSTONE_SUFFIX = '"removed": true}'  # ...and the tombstone flag last
+
+_decoder = json.JSONDecoder()
+
+
+def load_index(corpus_dir=CORPUS_DIR):
+    path = os.path.join(corpus_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {"version": 1, "shards": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def corpus_exists(corpus_dir=CORPUS_DIR):
+    return bool(load_index(corpus_dir)["shards"])
+
+
+class CorpusWriter:
+    """Appends records to fresh shards; existing shards are never rewritten"""
+
+    def __init__(self, corpus_dir=CORPUS_DIR, crawler="scraper", level=3, shard_max_records=SHARD_MAX_RECORDS):
+        self.corpus_dir = corpus_dir
+        self.crawler = crawler
+        self.shard_max_records = shard_max_records
+        self.compressor = zstd.ZstdCompressor(level=level)
+        os.makedirs(corpus_dir, exist_ok=True)
+        self.file = None
+        self.writer = None
+        self.shard = None
+        self.unflushed = 0
+        self.records = 0
+
+    def _open_shard(self):
+        index = load_index(self.corpus_dir)
+        number = max([int(s["file"][6:11]) for s in index["shards"]] + [-1]) + 1
+        name = f"shard-{number:05d}.jsonl.zst"
+        self.file = open(os.path.join(self.corpus_dir, name), "wb")
+        self.writer = self.compressor.stream_writer(self.file, closefd=False)
+        self.shard = {"file": name, "records": 0, "crawler": self.crawler, "created": time.time()}
+        self._update_index()
+
+    def _update_index(self):
+        """Re-read and rewrite the small index so concurrent writers keep each other's shards"""
+        index = load_index(self.corpus_dir)
+        index["shards"] = [s for s in index["shards"] if s["file"] != self.shard["file"]] + [self.shard]
+        index["shards"].sort(key=lambda s: s["file"])
+        tmp_path = os.path.join(self.corpus_dir, f".{INDEX_FILE}.{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.corpus_dir, INDEX_FILE))
+
+    def write(self, url, title, content, **extra):
+        if self.writer is None or self.shard["records"] >= self.shard_max_records:
+            self._close_shard()
+            self._open_shard()
+        record = {"url": url, "title": title, "content": content,
+                  "crawler": self.crawler, "fetched_at": time.time(), **extra}
+        self.writer.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.shard["records"] += 1
+        self.records += 1
+        self.unflushed += 1
+        if self.unflushed >= FLUSH_EVERY:
+            self.flush()
+
+    def remove(self, url):
+        """Tombstone a page that is gone from the site"""
+        self.write(url, "", "", removed=True)
+
+    def flush(self):
+        """End the current zstd frame so everything written so far is readable"""
+        if self.writer is None or not self.unflushed:
+            return
+        self.writer.flush(zstd.FLUSH_FRAME)
+        self.file.flush()
+        self.unflushed = 0
+        self._update_index()
+
+    def _close_shard(self):
+        if self.writer is None:
+            return
+        self.flush()
+        self.writer.close()
+        self.file.close()
+        self.writer = None
+
+    def close(self):
+        self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_lines(path):
+    """Stream the non-empty JSON lines of one shard (handles several concatenated frames)"""
+    with open(path, "rb") as f:
+        reader = zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        for line in io.TextIOWrapper(reader, encoding="utf-8"):
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_shard(path):
+    """Stream records from one shard"""
+    for line in iter_lines(path):
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue  # torn last line after a crash
+
+
+def record_key(line):
+    """(url, is tombstone) of one JSON line without decoding the page text; None for a torn line"""
+    if not line.endswith("}"):
+        return None
+    try:
+        if line.startswith(URL_PREFIX):
+            url, _ = _decoder.raw_decode(line, len(URL_PREFIX))
+            return url, line.endswith(TOMBSTONE_SUFFIX)
+        record = json.loads(line)
+        return record["url"], bool(record.get("removed"))
+    except (ValueError, KeyError):
+        return None
+
+
+def shard_paths(corpus_dir=CORPUS_DIR):
+    """Existing shard files, oldest first"""
+    paths = [os.path.join(corpus_dir, shard["file"]) for shard in load_index(corpus_dir)["shards"]]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def latest_positions(paths):
+    """{url: (shard number, line number, is tombstone)} of each URL's newest record"""
+    latest = {}
+    for shard_no, path in enumerate(paths):
+        for line_no, line in enumerate(iter_lines(path)):
+            key = record_key(line)
+            if key is not None:
+                latest[key[0]] = (shard_no, line_no, key[1])
+    return latest
+
+
+def corpus_urls(corpus_dir=CORPUS_DIR):
+    """URLs with a live (not tombstoned) record in the corpus"""
+    return {url for url, (_, _, removed) in latest_positions(shard_paths(corpus_dir)).items() if not removed}
+
+
+def iter_records(corpus_dir=CORPUS_DIR, latest_only=True):
+    """Yield corpus records newest shard first; with latest_only, only each URL's newest record"""
+    paths = shard_paths(corpus_dir)
+    if not latest_only:
+        for path in reversed(paths):
+            yield from iter_shard(path)
+        return
+
+    keep = {}  # shard number -> line numbers to yield
+    for url, (shard_no, line_no, removed) in latest_positions(paths).items():
+        if not removed:
+            keep.setdefault(shard_no, set()).add(line_no)
+    for shard_no in reversed(range(len(paths))):
+        lines = keep.pop(shard_no, None)
+        if not lines:
+            continue
+        for line_no, line in enumerate(iter_lines(paths[shard_no])):
+            if line_no in lines:
+                yield json.loads(line)
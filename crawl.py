@@ -7,15 +7,24 @@ More complete text + URL extractor for www.nirmauni.ac.in
 - Saves two .txt files:
     * all_texts.txt  (page-by-page full text)
     * all_urls.txt   (every unique discovered URL)
+- Appends every page to the shared corpus (data/corpus, see corpus.py)
+- Pages are written as they are crawled; PARSER = "lxml" does text, title
+  and links in a single tree walk (PARSER = "bs4" keeps the old parser)
+- Fetch latency, throughput, parse/write times and errors go to data/crawl_metrics/
 """
 
 import time
 import requests
 from bs4 import BeautifulSoup, Comment
+import lxml.html
+from lxml import etree
 from urllib.parse import urljoin, urlparse, urldefrag
 from collections import deque
 import urllib.robotparser
 import urllib3
+from http_cache import HttpCache
+from corpus import CorpusWriter
+from crawl_metrics import CrawlMetrics
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
@@ -26,10 +35,13 @@ HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; GPTSiteCrawler/1.0)"}
 TIMEOUT = 15
 DELAY = 0.5
 MAX_PAGES = 2000  # increase as needed
+PARSER = "lxml"   # "lxml" (fast, single pass) or "bs4" (BeautifulSoup html.parser)
 OUTPUT_TEXT_FILE = "nirmauni_all_texts.txt"
 OUTPUT_URLS_FILE = "nirmauni_urls.txt"
 # -----------------------------------------
 
+metrics = CrawlMetrics("crawl")
+
 def normalize_url(base, link):
     try:
         abs_url = urljoin(base, link)
@@ -53,6 +65,55 @@ def visible_text(soup):
     lines = [line.strip() for line in text.splitlines() if line.strip()]
     return "\n".join(lines)
 
+SKIP_TAGS = {"script", "style", "noscript", "header", "footer", "meta", "link", "svg", "iframe"}
+
+def parse_lxml(html, base):
+    """One iterwalk over the lxml tree -> (title, visible text, links); same rules as the bs4 path"""
+    try:
+        try:
+            root = lxml.html.fromstring(html)
+        except ValueError:
+            # str input with an XML encoding declaration
+            root = lxml.html.fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+    except etree.ParserError:
+        # Whitespace- or comment-only body ("Document is empty"); bs4 gives an empty page too
+        return "", "", set()
+
+    title, parts, links = "", [], set()
+    skip = 0  # >0 while inside a SKIP_TAGS subtree
+    for event, el in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        tag = el.tag.lower() if isinstance(el.tag, str) else None  # None for comments / PIs
+        if event in ("comment", "pi"):
+            # Leaf nodes: drop their content, keep the text that follows them
+            if skip == 0 and el.tail:
+                parts.append(el.tail)
+        elif event == "start":
+            if tag in SKIP_TAGS:
+                skip += 1
+            elif skip == 0 and tag is not None:
+                if tag == "title" and not title and el.text:
+                    title = el.text.strip()
+                elif tag == "a" and el.get("href"):
+                    href = normalize_url(base, el.get("href"))
+                    if href:
+                        links.add(href)
+                if el.text:
+                    parts.append(el.text)
+        else:
+            if tag in SKIP_TAGS:
+                skip -= 1
+            if skip == 0 and el.tail:
+                parts.append(el.tail)
+
+    lines = [line.strip() for line in "\n".join(parts).splitlines() if line.strip()]
+    return title, "\n".join(lines), links
+
+def parse_bs4(html, base):
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.string.strip() if soup.title and soup.title.string else ""
+    text = visible_text(soup)
+    return title, text, extract_links(soup, base)
+
 def extract_links(soup, base):
     links = set()
     for tag in soup.find_all("a", href=True):
@@ -61,15 +122,28 @@ def extract_links(soup, base):
             links.add(href)
     return links
 
-def fetch(url):
+def fetch(url, http_cache):
+    started = time.monotonic()
     try:
-        r = requests.get(url, headers=HEADERS, timeout=TIMEOUT, verify=False)
+        r = requests.get(url, headers={**HEADERS, **http_cache.conditional_headers(url)}, timeout=TIMEOUT, verify=False)
+        metrics.record_fetch(r.status_code, time.monotonic() - started, len(r.content))
+        if r.status_code == 304:
+            http_cache.touch(url)
+            print(f"[304] Unchanged: {url}")
+            body = http_cache.cached_body(url)
+            return body.decode("utf-8", errors="replace") if body else None
         r.raise_for_status()
         if "html" not in r.headers.get("Content-Type", "").lower():
             return None
+        http_cache.store(url, r.headers, r.content)
         return r.text
+    except requests.HTTPError as e:
+        print(f"[WARN] {url} -> {e}")
+        return None
     except Exception as e:
         print(f"[WARN] {url} -> {e}")
+        metrics.record_fetch(None, time.monotonic() - started)
+        metrics.record_error(type(e).__name__)
         return None
 
 def get_robots_parser(base_url):
@@ -91,12 +165,21 @@ def allowed_by_robots(rp, url):
     except Exception:
         return True
 
-def crawl(start_url):
+def write_page(f, i, url, title, text):
+    f.write("=" * 100 + "\n")
+    f.write(f"PAGE {i}: {url}\n")
+    f.write(f"TITLE: {title}\n")
+    f.write("-" * 100 + "\n")
+    f.write(text + "\n\n")
+
+def crawl(start_url, text_file, corpus, http_cache):
+    """Crawl the domain, writing each page as soon as it is parsed; returns (page count, discovered URLs)"""
     rp = get_robots_parser(start_url)
+    parse = parse_lxml if PARSER == "lxml" else parse_bs4
     visited = set()
     discovered = set()
     queue = deque([start_url])
-    pages = []
+    page_count = 0
 
     while queue and len(visited) < MAX_PAGES:
         url = queue.popleft()
@@ -110,49 +193,50 @@ def crawl(start_url):
             continue
 
         print(f"[CRAWL] {len(visited)+1}: {url}")
-        html = fetch(url)
+        html = fetch(url, http_cache)
         if not html:
             visited.add(url)
             time.sleep(DELAY)
             continue
 
-        soup = BeautifulSoup(html, "html.parser")
-        title = soup.title.string.strip() if soup.title and soup.title.string else ""
-        text = visible_text(soup)
-        pages.append({"url": url, "title": title, "text": text})
+        with metrics.timed("parse"):
+            title, text, links = parse(html, url)
+        page_count += 1
+        metrics.record_page()
+        with metrics.timed("write"):
+            write_page(text_file, page_count, url, title, text)
+            corpus.write(url, title, text)
 
-        # extract and enqueue new links
-        links = extract_links(soup, url)
+        # enqueue new links
         for link in links:
             discovered.add(link)
             if same_domain(link) and link not in visited:
                 queue.append(link)
 
         visited.add(url)
+        metrics.gauge("frontier", len(queue))
         time.sleep(DELAY)
 
-    return pages, discovered
-
-def save_results(pages, urls):
-    with open(OUTPUT_TEXT_FILE, "w", encoding="utf-8") as f:
-        for i, p in enumerate(pages, 1):
-            f.write("=" * 100 + "\n")
-            f.write(f"PAGE {i}: {p['url']}\n")
-            f.write(f"TITLE: {p['title']}\n")
-            f.write("-" * 100 + "\n")
-            f.write(p['text'] + "\n\n")
+    return page_count, discovered
 
+def save_urls(urls):
     with open(OUTPUT_URLS_FILE, "w", encoding="utf-8") as f:
         for u in sorted(urls):
             f.write(u + "\n")
 
 def main():
-    print(f"[START] Crawling {START_URL} within domain {TARGET_DOMAIN}")
-    pages, urls = crawl(START_URL)
-    print(f"[DONE] Crawled {len(pages)} pages, found {len(urls)} URLs.")
-    save_results(pages, urls)
+    print(f"[START] Crawling {START_URL} within domain {TARGET_DOMAIN} (parser: {PARSER})")
+    metrics.start()
+    try:
+        with open(OUTPUT_TEXT_FILE, "w", encoding="utf-8") as text_file, CorpusWriter(crawler="crawl") as corpus:
+            page_count, urls = crawl(START_URL, text_file, corpus, HttpCache())
+    finally:
+        metrics.close()  # stops the snapshot thread and writes the summary even on errors / Ctrl-C
+    print(f"[DONE] Crawled {page_count} pages, found {len(urls)} URLs.")
+    save_urls(urls)
     print(f"[SAVED] Text -> {OUTPUT_TEXT_FILE}")
     print(f"[SAVED] URLs -> {OUTPUT_URLS_FILE}")
+    print(f"[SAVED] Corpus -> data/corpus/")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,239 @@
+"""
+crawl_metrics.py
+Shared crawl telemetry for scraper.py, async_crawler.py, crawl.py and the Scrapy spider.
+- Throughput: pages/s and bytes/s, overall and since the last snapshot
+- Fetch latency histograms per HTTP status ("error" for requests that raised)
+- Retry counts by reason (CountingRetry plugs into requests' urllib3 Retry) and error counts
+- Stage timings (parse, disk write) and gauges such as the frontier size
+- A JSON snapshot rewritten every SNAPSHOT_INTERVAL_S under data/crawl_metrics/,
+  plus a final summary when the crawl ends
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from urllib3.util.retry import Retry
+
+METRICS_DIR = "data/crawl_metrics"
+SNAPSHOT_INTERVAL_S = 30
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)  # also used for stage times
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (seconds) with count, mean, max and bucket-based percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_S):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last bucket: above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, capped at the observed max"""
+        target, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(self.buckets[i], round(self.max, 4)) if i < len(self.buckets) else round(self.max, 4)
+        return 0.0
+
+    def to_dict(self):
+        labels = [f"<={b}s" for b in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            "count": self.count,
+            "mean_s": round(self.total / self.count, 4) if self.count else None,
+            "p50_s": self.percentile(0.5),
+            "p95_s": self.percentile(0.95),
+            "max_s": round(self.max, 4),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class CrawlMetrics:
+    """Thread-safe counters for one crawl; start() begins periodic snapshots, close() writes the summary"""
+
+    def __init__(self, crawler, metrics_dir=METRICS_DIR, interval=SNAPSHOT_INTERVAL_S):
+        self.crawler = crawler
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.path = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.pages = 0
+        self.bytes = 0
+        self.latency = {}      # status -> Histogram
+        self.stages = {}       # stage -> Histogram
+        self.retries = {}      # reason -> count
+        self.errors = {}       # kind -> count
+        self.gauges = {}       # name -> {"value", "max"}
+        self.window = (self.started, 0, 0)  # (time, pages, bytes) at the last snapshot
+
+    # ---- recording ----
+
+    def record_fetch(self, status, latency, nbytes=0):
+        """One HTTP response (status None if the request raised); latency in seconds"""
+        key = str(status) if status is not None else "error"
+        with self.lock:
+            self.latency.setdefault(key, Histogram()).observe(latency)
+            self.bytes += nbytes
+            if status is not None and status >= 400:
+                kind = f"http_{status // 100}xx"
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_page(self):
+        with self.lock:
+            self.pages += 1
+
+    def record_retry(self, reason):
+        with self.lock:
+            self.retries[str(reason)] = self.retries.get(str(reason), 0) + 1
+
+    def record_error(self, kind):
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def mirror(self, counter, counts):
+        """Overwrite entries of retries/errors with totals kept elsewhere (e.g. Scrapy's stats)"""
+        with self.lock:
+            getattr(self, counter).update(counts)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def gauge(self, name, value):
+        with self.lock:
+            current = self.gauges.setdefault(name, {"value": value, "max": value})
+            current["value"] = value
+            current["max"] = max(current["max"], value)
+
+    # ---- reporting ----
+
+    def snapshot(self, final=False):
+        now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.started
+            last_time, last_pages, last_bytes = self.window
+            window = now - last_time
+            report = {
+                "crawler": self.crawler,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "final": final,
+                "elapsed_s": round(elapsed, 1),
+                "pages": self.pages,
+                "bytes": self.bytes,
+                "pages_per_s": round(self.pages / elapsed, 2) if elapsed > 0 else None,
+                "bytes_per_s": round(self.bytes / elapsed) if elapsed > 0 else None,
+                "recent": {
+                    "window_s": round(window, 1),
+                    "pages_per_s": round((self.pages - last_pages) / window, 2) if window > 0 else None,
+                    "bytes_per_s": round((self.bytes - last_bytes) / window) if window > 0 else None,
+                },
+                "fetches": sum(h.count for h in self.latency.values()),
+                "latency_by_status": {status: h.to_dict() for status, h in sorted(self.latency.items())},
+                "retries": dict(self.retries, total=sum(self.retries.values())),
+                "errors": dict(self.errors, total=sum(self.errors.values())),
+                "stages": {stage: h.to_dict() for stage, h in sorted(self.stages.items())},
+                "gauges": {name: dict(g) for name, g in self.gauges.items()},
+            }
+            self.window = (now, self.pages, self.bytes)
+        return report
+
+    def write(self, report):
+        if self.path is None:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            self.path = os.path.join(self.metrics_dir, f"{self.crawler}_{stamp}.json")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def start(self):
+        """Reset the clock and write a snapshot every interval until close()"""
+        with self.lock:
+            self.started = time.monotonic()
+            self.window = (self.started, self.pages, self.bytes)
+        self._thread = threading.Thread(target=self._run, name="crawl-metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            report = self.snapshot()
+            self.write(report)
+            recent = report["recent"]
+            frontier = report["gauges"].get("frontier", {}).get("value", "-")
+            print(f"📈 {recent['pages_per_s']} pages/s, {(recent['bytes_per_s'] or 0) / 1e3:.0f} kB/s, "
+                  f"{report['retries']['total']} retries, {report['errors']['total']} errors, frontier {frontier}")
+
+    def close(self):
+        """Stop the snapshots, write the final report and print a summary; returns the report"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        report = self.snapshot(final=True)
+        self.write(report)
+        self.print_summary(report)
+        return report
+
+    def print_summary(self, report):
+        print(f"\n📊 Crawl metrics ({self.crawler}): {report['pages']} pages in {report['elapsed_s']:.0f}s "
+              f"({report['pages_per_s']} pages/s, {(report['bytes_per_s'] or 0) / 1e3:.0f} kB/s)")
+        print(f"{'status':<10}{'fetches':>9}{'mean s':>9}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+        for status, h in report["latency_by_status"].items():
+            print(f"{status:<10}{h['count']:>9}{h['mean_s']:>9.3f}{h['p50_s']:>8}{h['p95_s']:>8}{h['max_s']:>8.2f}")
+        for stage, h in report["stages"].items():
+            print(f"⏱️  {stage}: {h['count']} x, mean {h['mean_s']:.4f}s, p95 {h['p95_s']}s")
+        print(f"🔁 Retries: {report['retries']}")
+        print(f"❌ Errors: {report['errors']}")
+        print(f"📝 Metrics saved to {self.path}")
+
+
+class CountingRetry(Retry):
+    """urllib3 Retry that reports every retry it grants to a CrawlMetrics, by status or exception"""
+
+    def __init__(self, *args, metrics=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def new(self, **kw):
+        kw.setdefault("metrics", self.metrics)
+        return super().new(**kw)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # Raises once retries are exhausted, so only granted retries are counted
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if self.metrics is not None:
+            if response is not None and response.status:
+                reason = response.status
+            else:
+                reason = type(error).__name__ if error is not None else "unknown"
+            self.metrics.record_retry(reason)
+        return retry
@@ -0,0 +1,156 @@
+"""
+downloader.py
+Background document downloader (PDF, DOCX, PPTX, XLS/XLSX) for the crawlers.
+- Worker pool separate from page crawling
+- Streams each response to disk in chunks (never buffers a whole file)
+- Content-hash addressed storage: doc_<sha256>.<ext>, identical files stored once
+- Per-URL dedup + conditional requests on recrawls, size limit per file
+- data/raw/downloads.json maps every source URL to its stored file; a file no URL
+  points to any more (the document changed) is deleted
+- close() ends a run; the next submit starts a fresh worker pool, so one downloader
+  serves any number of crawls
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DOCUMENT_EXTS = ('.pdf', '.docx', '.pptx', '.xls', '.xlsx')
+MAX_WORKERS = 4
+MAX_FILE_SIZE = 50 * 1024 * 1024   # 50 MB
+CHUNK_SIZE = 64 * 1024
+
+
+def is_document_url(url):
+    return urlparse(url).path.lower().endswith(DOCUMENT_EXTS)
+
+
+class DocumentDownloader:
+    def __init__(self, data_dir="data/raw", headers=None, http_cache=None,
+                 workers=MAX_WORKERS, max_file_size=MAX_FILE_SIZE):
+        self.data_dir = data_dir
+        self.headers = headers or {}
+        self.http_cache = http_cache
+        self.max_file_size = max_file_size
+        self.workers = workers
+        self.executor = None  # started by the first submit of each run
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.submitted = set()
+        self.futures = []
+        self.manifest_path = os.path.join(data_dir, "downloads.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        os.makedirs(data_dir, exist_ok=True)
+
+    def session(self):
+        """One pooled session per worker thread"""
+        if not hasattr(self.local, "session"):
+            session = requests.Session()
+            retries = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+            session.mount("https://", HTTPAdapter(max_retries=retries))
+            session.mount("http://", HTTPAdapter(max_retries=retries))
+            self.local.session = session
+        return self.local.session
+
+    def submit(self, url):
+        """Queue a document for download; each URL is fetched at most once per run"""
+        with self.lock:
+            if url in self.submitted:
+                return
+            self.submitted.add(url)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download")
+            self.futures.append(self.executor.submit(self._download, url))
+
+    def _download(self, url):
+        try:
+            entry = self.manifest.get(url)
+            headers = dict(self.headers)
+            if entry and self.http_cache and os.path.exists(os.path.join(self.data_dir, entry['file'])):
+                headers.update(self.http_cache.conditional_headers(url))
+
+            with self.session().get(url, headers=headers, stream=True, timeout=30, verify=False) as response:
+                if response.status_code == 304:
+                    self.http_cache.touch(url)
+                    print(f"✔️ Unchanged file: {entry['file']}")
+                    return
+                if response.status_code != 200:
+                    print(f"⚠️ {response.status_code} downloading {url}")
+                    return
+                length = int(response.headers.get("Content-Length") or 0)
+                if length > self.max_file_size:
+                    print(f"⚠️ Skipping {url}: {length / 1e6:.1f} MB exceeds limit")
+                    return
+
+                ext = os.path.splitext(urlparse(url).path)[1].lower()
+                digest = hashlib.sha256()
+                size = 0
+                tmp_path = os.path.join(self.data_dir, f".download_{threading.get_ident()}.part")
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_file_size:
+                            break
+                        digest.update(chunk)
+                        f.write(chunk)
+                if size > self.max_file_size:
+                    os.remove(tmp_path)
+                    print(f"⚠️ Skipping {url}: larger than {self.max_file_size / 1e6:.0f} MB")
+                    return
+
+                filename = f"doc_{digest.hexdigest()[:32]}{ext}"
+                path = os.path.join(self.data_dir, filename)
+                # Under the lock: another worker may be storing or deleting the same file
+                with self.lock:
+                    if os.path.exists(path):
+                        os.remove(tmp_path)  # same content already stored via another URL
+                    else:
+                        os.replace(tmp_path, path)
+                    previous = self.manifest.get(url)
+                    self.manifest[url] = {'file': filename, 'sha256': digest.hexdigest(), 'size': size}
+                    if previous and previous['file'] != filename:
+                        self.remove_orphan(previous['file'])
+                if self.http_cache:
+                    self.http_cache.store(url, response.headers, b"", keep_body=False)
+
+            print(f"📄 Downloaded file: {filename} <- {url}")
+        except Exception as e:
+            print(f"Error downloading {url}: {e}")
+
+    def remove_orphan(self, filename):
+        """Delete an outdated version of a document unless another URL still serves it (lock held)"""
+        if any(entry['file'] == filename for entry in self.manifest.values()):
+            return
+        path = os.path.join(self.data_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"🗑️ Removed outdated file: {filename}")
+
+    def save_manifest(self):
+        with self.lock:
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        """Wait for queued downloads and write downloads.json; safe to call more than once"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+            pending = [f for f in self.futures if not f.done()]
+            self.futures = []
+            self.submitted = set()
+        if pending:
+            print(f"⏳ Waiting for {len(pending)} document downloads...")
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.save_manifest()
+        print(f"📚 {len(self.manifest)} documents tracked in {self.manifest_path}")
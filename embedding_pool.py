@@ -0,0 +1,87 @@
+"""
+embedding_pool.py
+Multi-process embedding for index builds.
+- Each worker process loads its own copy of the sentence-transformers model
+- Chunks are sharded across the workers and the vectors merged back in input order
+- Batch size and torch threads per worker are tunable; throughput is reported
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 64      # texts per model.encode() batch inside a worker
+BATCHES_PER_SHARD = 4      # batches sent to a worker at once
+
+_model = None
+_batch_size = EMBED_BATCH_SIZE
+
+
+def default_torch_threads(workers):
+    """Split the cores evenly so workers don't oversubscribe the CPU"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(model_name, batch_size, torch_threads):
+    global _model, _batch_size
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(torch_threads)
+    _model = SentenceTransformer(model_name, device="cpu")
+    _batch_size = batch_size
+
+
+def _embed_shard(texts):
+    # Same preprocessing as HuggingFaceEmbeddings.embed_documents, so vectors match the in-process path
+    texts = [t.replace("\n", " ") for t in texts]
+    return _model.encode(texts, batch_size=_batch_size, convert_to_numpy=True).astype(np.float32)
+
+
+class EmbeddingPool:
+    """Pool of embedding worker processes; embed() returns one float32 row per text, in order"""
+
+    def __init__(self, workers, model_name=EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE, torch_threads=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.torch_threads = torch_threads or default_torch_threads(workers)
+        self.shard_size = batch_size * BATCHES_PER_SHARD
+        self.texts = 0
+        self.seconds = 0.0
+        print(f"🧵 Starting {workers} embedding workers "
+              f"(batch size {batch_size}, {self.torch_threads} torch threads each)...")
+        # spawn: torch and forked thread pools don't mix
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, batch_size, self.torch_threads),
+        )
+
+    def embed(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        started = time.time()
+        shards = [texts[i:i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        # map() yields results in submission order, so rows line up with texts
+        vectors = np.vstack(list(self.executor.map(_embed_shard, shards)))
+        self.texts += len(texts)
+        self.seconds += time.time() - started
+        return vectors
+
+    def throughput(self):
+        return self.texts / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
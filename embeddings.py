@@ -1,30 +1,112 @@
 import os
 import json
+import time
+import argparse
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.docstore.document import Document
 from langchain_community.document_loaders import PyPDFLoader, UnstructuredPowerPointLoader
 from PyPDF2.errors import PdfReadError
+from corpus import CORPUS_DIR, corpus_exists, iter_records
+from quantized_index import (QuantizedFAISS, VECTOR_DTYPES, VECTORS_FILE, load_vectorstore,
+                             quantize_vectorstore, read_meta, write_meta)
+from partitioned_index import section_for, write_partitions
+from embedding_pool import EMBED_BATCH_SIZE, EmbeddingPool
+from build_profile import BuildProfiler, document_kind
+from answer_cache import invalidate_answer_cache
+from precompute_answers import refresh_precomputed_answers
+
+DOCUMENT_BATCH_SIZE = 500  # documents loaded/split/embedded per step in build()
+
+
+def iter_batches(items, size):
+    """Group any iterable into lists of at most `size` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
 class VectorStoreBuilder:
-    def __init__(self, data_dir="data/raw", vectorstore_dir="data/vectorstore"):
+    def __init__(self, data_dir="data/raw", vectorstore_dir="data/vectorstore", corpus_dir=CORPUS_DIR,
+                 vector_dtype="float32", embedding_workers=0, embed_batch_size=EMBED_BATCH_SIZE, torch_threads=None,
+                 profile=False, flamegraph=False):
         self.data_dir = data_dir
+        self.corpus_dir = corpus_dir
+        self.vector_dtype = vector_dtype  # "float32", or "float16" / "int8" scalar-quantized
         self.vectorstore_dir = vectorstore_dir
         os.makedirs(vectorstore_dir, exist_ok=True)
+        # embedding_workers > 0 shards chunk embedding across a pool of processes
+        self.embedding_workers = embedding_workers
+        self.embed_batch_size = embed_batch_size
+        self.torch_threads = torch_threads
+        self.pool = None
+        self.embedded_chunks = 0
+        self.embed_seconds = 0.0
+        # Opt-in per-stage timing / memory report (see build_profile.py)
+        self.profiler = BuildProfiler("embeddings", enabled=profile, flamegraph=flamegraph)
         
         # Use local embeddings model (no API key needed)
         print("📦 Loading embedding model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        with self.profiler.stage("model_load"):
+            self.embeddings = HuggingFaceEmbeddings(
+                model_name="sentence-transformers/all-MiniLM-L6-v2",
+                model_kwargs={'device': 'cpu'}
+            )
         print("✅ Embedding model loaded!")
-    def load_documents(self):
-        documents = []
 
-        print(f"📁 Looking in: {self.data_dir}")
-        print("📂 Files found:", os.listdir(self.data_dir))
+    def start_pool(self):
+        if self.embedding_workers > 0 and self.pool is None:
+            self.pool = EmbeddingPool(self.embedding_workers, batch_size=self.embed_batch_size,
+                                      torch_threads=self.torch_threads)
+
+    def stop_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def add_chunks(self, vectorstore, chunks):
+        """Embed chunks (in-process or on the worker pool) and append them; creates the store if None"""
+        texts = [c.page_content for c in chunks]
+        metadatas = [c.metadata for c in chunks]
+        started = time.time()
+        with self.profiler.stage("embed") as counts:
+            vectors = self.pool.embed(texts) if self.pool is not None else self.embeddings.embed_documents(texts)
+            counts["items"] += len(texts)
+        self.embedded_chunks += len(chunks)
+        self.embed_seconds += time.time() - started
+        
+        with self.profiler.stage("index_add") as counts:
+            text_embeddings = list(zip(texts, vectors))
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas)
+            else:
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+            counts["items"] += len(texts)
+        return vectorstore
+
+    def embedding_throughput(self):
+        return self.embedded_chunks / self.embed_seconds if self.embed_seconds else 0.0
+
+    def iter_documents(self):
+        """Stream documents: corpus shards first, then legacy all_data.json / raw files"""
+        print(f"📁 Looking in: {self.corpus_dir} and {self.data_dir}")
+
+        if corpus_exists(self.corpus_dir):
+            print("✅ Found corpus shards, streaming records")
+            for record in iter_records(self.corpus_dir):
+                yield Document(
+                    page_content=record['content'],
+                    metadata={'source': record['url'], 'title': record.get('title', '')}
+                )
+            # Pages live in the corpus; only downloaded documents remain as files
+            yield from self.iter_file_documents(extensions=('.pdf', '.pptx'))
+            return
 
         json_file = os.path.join(self.data_dir, "all_data.json")
         if os.path.exists(json_file):
@@ -32,36 +114,56 @@ class VectorStoreBuilder:
             with open(json_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 for item in data:
-                    documents.append(Document(
+                    yield Document(
                         page_content=item['content'],
                         metadata={'source': item['url'], 'title': item['title']}
-                    ))
+                    )
         else:
-            for filename in os.listdir(self.data_dir):
-                filepath = os.path.join(self.data_dir, filename)
-                print("🔎 Checking:", filename)
-                if filename.endswith('.txt'):
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        documents.append(Document(page_content=f.read(), metadata={'source': filename}))
-                elif filename.endswith('.pdf'):
-                    print("📄 Loading PDF:", filename)
-                    from langchain_community.document_loaders import PyPDFLoader
-                    try:
-                        with open(filepath, "rb") as f:
-                            if not f.read(5).startswith(b"%PDF-"):
-                                print(f"⚠️ Skipping invalid PDF: {filename}")
-                                continue
-
-                        loader = PyPDFLoader(filepath)
-                        documents.extend(loader.load())
-                    except Exception as e:
-                        print(f"❌ Failed to read {filename}: {e}")
-                elif filename.endswith('.pptx'):
-                    print("📊 Loading PPTX:", filename)
-                    from langchain_community.document_loaders import UnstructuredPowerPointLoader
-                    loader = UnstructuredPowerPointLoader(filepath)
-                    documents.extend(loader.load())
+            yield from self.iter_file_documents(extensions=('.txt', '.pdf', '.pptx'))
+
+    def iter_file_documents(self, extensions):
+        """Load raw files (page .txt, downloaded PDFs and PPTX) from data_dir"""
+        if not os.path.isdir(self.data_dir):
+            return
+        # Downloaded documents are stored by content hash; map them back to their URL
+        file_sources = {}
+        manifest_file = os.path.join(self.data_dir, "downloads.json")
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                for url, entry in json.load(f).items():
+                    file_sources.setdefault(entry['file'], url)
+        
+        for filename in sorted(os.listdir(self.data_dir)):
+            if not filename.endswith(extensions):
+                continue
+            filepath = os.path.join(self.data_dir, filename)
+            print("🔎 Checking:", filename)
+            if filename.endswith('.txt'):
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    yield Document(page_content=f.read(), metadata={'source': filename})
+            elif filename.endswith('.pdf'):
+                print("📄 Loading PDF:", filename)
+                try:
+                    with open(filepath, "rb") as f:
+                        if not f.read(5).startswith(b"%PDF-"):
+                            print(f"⚠️ Skipping invalid PDF: {filename}")
+                            continue
 
+                    loader = PyPDFLoader(filepath)
+                    pages = loader.load()
+                    if filename in file_sources:
+                        for page in pages:
+                            page.metadata['source'] = file_sources[filename]
+                    yield from pages
+                except Exception as e:
+                    print(f"❌ Failed to read {filename}: {e}")
+            elif filename.endswith('.pptx'):
+                print("📊 Loading PPTX:", filename)
+                loader = UnstructuredPowerPointLoader(filepath)
+                yield from loader.load()
+
+    def load_documents(self):
+        documents = list(self.iter_documents())
         print(f"📚 Loaded {len(documents)} documents")
         return documents
     
@@ -74,7 +176,11 @@ class VectorStoreBuilder:
             separators=["\n\n", "\n", " ", ""]
         )
         
-        chunks = text_splitter.split_documents(documents)
+        with self.profiler.stage("split") as counts:
+            chunks = text_splitter.split_documents(documents)
+            for chunk in chunks:
+                chunk.metadata['section'] = section_for(chunk.metadata)
+            counts["items"] += len(chunks)
         print(f"✂️  Split into {len(chunks)} chunks")
         return chunks
     
@@ -82,32 +188,128 @@ class VectorStoreBuilder:
         """Create FAISS vector store from chunks"""
         print("🔮 Creating vector store (this may take a few minutes)...")
         
-        vectorstore = FAISS.from_documents(chunks, self.embeddings)
+        self.start_pool()
+        try:
+            vectorstore = self.add_chunks(None, chunks)
+        finally:
+            self.stop_pool()
         
         # Save to disk
-        vectorstore.save_local(self.vectorstore_dir)
+        return self.save_vectorstore(vectorstore)
+    
+    def save_vectorstore(self, vectorstore):
+        """Save to disk, converting to float16/int8 scalar-quantized storage if configured"""
+        with self.profiler.stage("save") as counts:
+            counts["items"] += vectorstore.index.ntotal
+            if self.vector_dtype != "float32" and not isinstance(vectorstore, QuantizedFAISS):
+                print(f"🗜️  Quantizing vectors to {self.vector_dtype}...")
+                vectorstore, report = quantize_vectorstore(vectorstore, self.vectorstore_dir, self.vector_dtype)
+                print(f"📉 Index RAM {report['index_ram_mb_float32']} MB -> {report['index_ram_mb']} MB "
+                      f"(saved {report['ram_saved_mb']} MB)")
+                if 'recall_reranked' in report:
+                    print(f"🎯 recall@8 vs exact: {report['recall_quantized']} quantized only, "
+                          f"{report['recall_reranked']} with exact rerank")
+            else:
+                vectorstore.save_local(self.vectorstore_dir)
+                meta = read_meta(self.vectorstore_dir) if isinstance(vectorstore, QuantizedFAISS) else {"vector_dtype": "float32"}
+                meta["vectors"] = vectorstore.index.ntotal
+                write_meta(self.vectorstore_dir, meta)
+                stale_vectors = os.path.join(self.vectorstore_dir, VECTORS_FILE)
+                if not isinstance(vectorstore, QuantizedFAISS) and os.path.exists(stale_vectors):
+                    os.remove(stale_vectors)
         print(f"💾 Vector store saved to {self.vectorstore_dir}/")
-        
+        # Per-section partitions for query routing (copies vectors, no re-embedding)
+        with self.profiler.stage("partitions") as counts:
+            counts["items"] += vectorstore.index.ntotal
+            write_partitions(vectorstore, self.vectorstore_dir, self.vector_dtype)
+        invalidate_answer_cache(self.vectorstore_dir)
         return vectorstore
     
     def build(self):
         """Complete pipeline to build vector store"""
         print("\n🚀 Starting vector store creation...\n")
+        print("🔮 Creating vector store (this may take a few minutes)...")
         
-        # Step 1: Load documents
-        documents = self.load_documents()
+        # Stream documents in batches so the corpus is never fully in memory
+        vectorstore = None
+        total = 0
+        self.start_pool()
+        try:
+            documents = self.profiler.iter_stage(self.iter_documents(), lambda doc: f"load:{document_kind(doc)}")
+            for batch in iter_batches(documents, DOCUMENT_BATCH_SIZE):
+                total += len(batch)
+                # Step 1: Split into chunks
+                chunks = self.split_documents(batch)
+                if not chunks:
+                    continue
+                # Step 2: Embed and add to the index
+                vectorstore = self.add_chunks(vectorstore, chunks)
+                print(f"📚 {total} documents indexed so far ({self.embedding_throughput():.0f} chunks/s)")
+        finally:
+            self.stop_pool()
         
-        if not documents:
+        if vectorstore is None:
             print("❌ No documents found! Please run scraper.py first.")
+            self.profiler.finish(documents=0)
             return None
         
-        # Step 2: Split into chunks
-        chunks = self.split_documents(documents)
+        workers = f"{self.embedding_workers} worker processes" if self.embedding_workers else "in-process"
+        print(f"📈 Embedded {self.embedded_chunks} chunks in {self.embed_seconds:.1f}s "
+              f"({self.embedding_throughput():.0f} chunks/s, {workers})")
         
-        # Step 3: Create vector store
-        vectorstore = self.create_vectorstore(chunks)
+        # Step 3: Save to disk
+        vectorstore = self.save_vectorstore(vectorstore)
         
         print("\n✨ Vector store creation complete!")
+        self.profiler.finish(mode="build", documents=total, chunks=self.embedded_chunks,
+                             embedding_workers=self.embedding_workers, vector_dtype=self.vector_dtype)
+        return vectorstore
+    
+    def update(self):
+        """Minimal update: re-embed the pages the last crawl reported as changed, drop the removed ones"""
+        changes_file = os.path.join(self.data_dir, "changes.json")
+        if not os.path.exists(os.path.join(self.vectorstore_dir, "index.faiss")) or not os.path.exists(changes_file):
+            print("ℹ️ No existing index or changes.json, running a full build instead.")
+            return self.build()
+        
+        with open(changes_file, 'r', encoding='utf-8') as f:
+            changes = json.load(f)
+        changed = set(changes.get("changed", []))
+        removed = set(changes.get("removed", [])) - changed
+        print(f"🔁 {len(changed)} changed pages, {len(removed)} removed, "
+              f"{len(changes.get('unchanged', []))} unchanged (skipped)")
+        
+        with self.profiler.stage("load_index"):
+            vectorstore = self.load_existing_vectorstore()
+        if not changed and not removed:
+            print("✨ Nothing to update.")
+            self.profiler.finish(mode="update", changed=0)
+            return vectorstore
+        
+        # Drop the old chunks of changed and removed pages before adding the new ones
+        stale_ids = [
+            doc_id for doc_id, doc in vectorstore.docstore._dict.items()
+            if doc.metadata.get('source') in changed or doc.metadata.get('source') in removed
+        ]
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+            print(f"🗑️  Removed {len(stale_ids)} outdated chunks")
+        
+        documents = [] if not changed else [
+            doc for doc in self.profiler.iter_stage(self.iter_documents(), lambda doc: f"load:{document_kind(doc)}")
+            if doc.metadata.get('source') in changed
+        ]
+        if documents:
+            chunks = self.split_documents(documents)
+            self.start_pool()
+            try:
+                vectorstore = self.add_chunks(vectorstore, chunks)
+            finally:
+                self.stop_pool()
+        
+        vectorstore = self.save_vectorstore(vectorstore)
+        self.profiler.finish(mode="update", changed=len(changed), removed=len(removed), documents=len(documents),
+                             chunks=self.embedded_chunks, embedding_workers=self.embedding_workers)
         return vectorstore
     
     def load_existing_vectorstore(self):
@@ -117,20 +319,36 @@ class VectorStoreBuilder:
             return None
         
         print("📂 Loading existing vector store...")
-        vectorstore = FAISS.load_local(
-            self.vectorstore_dir, 
-            self.embeddings,
-            allow_dangerous_deserialization=True
-        )
+        vectorstore = load_vectorstore(self.vectorstore_dir, self.embeddings)
         print("✅ Vector store loaded!")
         return vectorstore
 
 
 if __name__ == "__main__":
-    builder = VectorStoreBuilder()
+    parser = argparse.ArgumentParser(description="Build the FAISS vector store from scraped data.")
+    parser.add_argument("--update", action="store_true", help="Only re-embed pages listed as changed in data/raw/changes.json")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, default="float32",
+                        help="Vector storage: float32, or float16/int8 scalar-quantized with exact rerank")
+    parser.add_argument("--vectorstore-dir", default="data/vectorstore")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Embedding worker processes (0 = embed in this process)")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per encode batch in a worker")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="Torch threads per worker (default: cores / workers)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write a per-stage time/CPU/memory report to data/profiles/")
+    parser.add_argument("--flamegraph", action="store_true", help="With --profile, also record a py-spy flame graph")
+    parser.add_argument("--no-precompute", action="store_true",
+                        help="Don't refresh the precomputed answers for top questions after the build")
+    args = parser.parse_args()
+    
+    builder = VectorStoreBuilder(vectorstore_dir=args.vectorstore_dir, vector_dtype=args.vector_dtype,
+                                 embedding_workers=args.workers, embed_batch_size=args.embed_batch_size,
+                                 torch_threads=args.torch_threads, profile=args.profile,
+                                 flamegraph=args.flamegraph)
     
-    # Build vector store
-    vectorstore = builder.build()
+    # Build (or incrementally update) vector store
+    vectorstore = builder.update() if args.update else builder.build()
     
     # Test query
     if vectorstore:
@@ -145,3 +363,7 @@ if __name__ == "__main__":
             print(f"Source: {doc.metadata.get('source', 'Unknown')}")
 
             print(f"Content preview: {doc.page_content[:200]}...")
+        
+        # Answer the top questions offline against the new index
+        if not args.no_precompute:
+            refresh_precomputed_answers(args.vectorstore_dir)
@@ -0,0 +1,113 @@
+"""
+frontier.py
+Persistent crawl frontier shared by scraper.py and async_crawler.py.
+- Priority queue (heap): priority URLs first, then breadth-first by depth
+- URLs are normalized and deduplicated when they are enqueued
+- State lives in a small SQLite file so an interrupted crawl resumes
+"""
+
+import heapq
+import os
+import sqlite3
+from urllib.parse import urlparse, urlunparse, urldefrag
+
+QUEUED = "queued"
+DONE = "done"
+
+
+def normalize_url(url):
+    """Canonical form used for dedup: no fragment, lowercase host, no trailing slash"""
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if (parsed.scheme == "https" and netloc.endswith(":443")) or (parsed.scheme == "http" and netloc.endswith(":80")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((parsed.scheme.lower(), netloc, path, parsed.params, parsed.query, ""))
+
+
+class CrawlFrontier:
+    def __init__(self, state_path, resume=True):
+        self.state_path = state_path
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(state_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, depth INTEGER, priority INTEGER, seq INTEGER, state TEXT)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # A finished crawl is never resumed; the next run starts over
+        if not resume or self.get_meta("complete") == "1":
+            self.reset()
+
+        self.seen = set()
+        self.heap = []
+        self.seq = 0
+        for url, depth, priority, seq, state in self.db.execute("SELECT url, depth, priority, seq, state FROM urls"):
+            self.seen.add(url)
+            self.seq = max(self.seq, seq + 1)
+            if state == QUEUED:
+                self.heap.append((priority, seq, url, depth))
+        heapq.heapify(self.heap)
+        self.resumed = bool(self.seen)
+        if self.resumed:
+            print(f"♻️  Resuming crawl: {len(self.heap)} queued, {len(self.seen) - len(self.heap)} done")
+
+    def reset(self):
+        self.db.execute("DELETE FROM urls")
+        self.db.execute("DELETE FROM meta")
+        self.db.commit()
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def pages_scraped(self):
+        return int(self.get_meta("pages_scraped", 0))
+
+    def add(self, url, depth, priority=None):
+        """Enqueue a URL unless it was already seen; returns True if added"""
+        url = normalize_url(url)
+        if url in self.seen:
+            return False
+        if priority is None:
+            priority = depth + 1  # 0 is reserved for priority URLs
+        self.seen.add(url)
+        heapq.heappush(self.heap, (priority, self.seq, url, depth))
+        self.db.execute(
+            "INSERT OR IGNORE INTO urls (url, depth, priority, seq, state) VALUES (?, ?, ?, ?, ?)",
+            (url, depth, priority, self.seq, QUEUED)
+        )
+        self.seq += 1
+        return True
+
+    def pop(self):
+        """Return the next (url, depth) or None when the frontier is empty"""
+        if not self.heap:
+            return None
+        _, _, url, depth = heapq.heappop(self.heap)
+        return url, depth
+
+    def mark_done(self, url, pages_scraped=None):
+        """Record a finished URL (and the links it enqueued) durably"""
+        self.db.execute("UPDATE urls SET state = ? WHERE url = ?", (DONE, normalize_url(url)))
+        if pages_scraped is not None:
+            self.set_meta("pages_scraped", pages_scraped)
+        self.db.commit()
+
+    def finish(self):
+        """Mark the crawl as complete so the next run starts fresh"""
+        self.set_meta("complete", "1")
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __len__(self):
+        return len(self.heap)
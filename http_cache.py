@@ -0,0 +1,88 @@
+"""
+http_cache.py
+On-disk HTTP revalidation cache used by the crawlers.
+- Stores ETag / Last-Modified validators (and optionally the body) per URL
+- Builds If-None-Match / If-Modified-Since headers for recrawls
+- A 304 (or an identical body) means "unchanged", so the page can be skipped downstream
+"""
+
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = "data/http_cache"
+
+
+class HttpCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        folder = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(folder, f"{key}.json"), os.path.join(folder, f"{key}.body")
+
+    def _load_meta(self, url):
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, url):
+        """Validators to send with the next request for this URL"""
+        meta = self._load_meta(url)
+        if not meta:
+            return {}
+        # Without a cached body a 304 would leave us with nothing to parse
+        if meta.get("has_body") and not os.path.exists(self._paths(url)[1]):
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def cached_body(self, url):
+        """Body stored by the last 200 response, or None"""
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, url, headers, body, keep_body=True):
+        """Save validators (and body) from a 200 response; returns True if the content changed"""
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        previous = self._load_meta(url) or {}
+        digest = hashlib.sha256(body).hexdigest()
+
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "sha256": digest,
+            "has_body": keep_body,
+            "fetched_at": time.time(),
+        }
+        if keep_body:
+            with open(body_path, "wb") as f:
+                f.write(body)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return previous.get("sha256") != digest
+
+    def touch(self, url):
+        """Record a successful revalidation (304)"""
+        meta = self._load_meta(url)
+        if meta:
+            meta["fetched_at"] = time.time()
+            with open(self._paths(url)[0], "w", encoding="utf-8") as f:
+                json.dump(meta, f)
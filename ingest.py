@@ -0,0 +1,369 @@
+"""
+ingest.py
+Background ingestion for the running server (POST /admin/ingest in app.py).
+- Jobs: uploaded files (PDF, TXT, PPTX) or URLs (HTML page or document), queued in memory
+- One worker thread; jobs that arrive while it is busy (or within COALESCE_WINDOW_S)
+  are merged into a single index update
+- Parsing and the index update (load, add, save, partitions) run in a short-lived child
+  process, so the server never holds a second copy of the index and the GIL stays free
+- Embedding uses the server's already-loaded model, in small batches, pausing while
+  /chat is saturated
+- Re-ingesting a source replaces its previous chunks
+- Uploaded and downloaded files are deleted once their job is done or failed
+- Precomputed answers are refreshed in the background after each update; updates that land
+  while a refresh runs are covered by one more run
+- Each job targets one tenant's index (tenants.py); a batch publishes every index it touches
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from langchain_core.embeddings import Embeddings
+
+from precompute_answers import refresh_precomputed_answers
+
+UPLOAD_DIR = "data/uploads"
+INGEST_EXTS = (".pdf", ".txt", ".pptx")
+COALESCE_WINDOW_S = 5      # wait this long after the first job for more to batch
+MAX_JOBS_PER_UPDATE = 20
+MAX_PENDING = 50
+MAX_JOB_HISTORY = 200
+EMBED_BATCH = 32
+MAX_PAUSE_S = 30           # longest wait for /chat to calm down before each embedding batch
+CHUNK_SIZE = 800           # same splitting as embeddings.py
+CHUNK_OVERLAP = 150
+
+
+class QueueFull(Exception):
+    """Raised by IngestQueue.submit when MAX_PENDING jobs are already waiting"""
+
+
+class NoEmbeddings(Embeddings):
+    """Placeholder for the child process: vectors come from the server, the model is never loaded"""
+
+    def embed_documents(self, texts):
+        raise RuntimeError("Ingest vectors are computed by the server process")
+
+    def embed_query(self, text):
+        raise RuntimeError("Ingest vectors are computed by the server process")
+
+
+def discard_file(path, upload_dir):
+    """Delete a file the ingest queue owns (only ever inside upload_dir)"""
+    if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(upload_dir):
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ---- child process side (parse / publish) ----
+
+def fetch_url(url, upload_dir):
+    """Download a URL: documents are saved under upload_dir, pages are reduced to their text"""
+    import requests
+    import trafilatura
+    from trafilatura.utils import load_html
+    from downloader import is_document_url
+
+    response = requests.get(url, timeout=30, headers={"User-Agent": "NirmaChatbot-Ingest/1.0"})
+    response.raise_for_status()
+    content_type = response.headers.get("Content-Type", "").lower()
+    if is_document_url(url) or "pdf" in content_type:
+        ext = os.path.splitext(url.split("?")[0])[1].lower() or ".pdf"
+        path = os.path.join(upload_dir, f"url_{uuid.uuid4().hex[:12]}{ext}")
+        with open(path, "wb") as f:
+            f.write(response.content)
+        return path, None
+    tree = load_html(response.text)
+    if tree is None:
+        return None, None
+    title = (tree.findtext(".//title") or url).strip()
+    text = trafilatura.extract(tree, include_comments=False, include_tables=True)
+    return None, (title, text)
+
+
+def load_job_documents(job, upload_dir):
+    """Documents for one job; metadata source is the URL or the uploaded file's name"""
+    from langchain.docstore.document import Document
+
+    path = job.get("path")
+    if job["kind"] == "url":
+        path, page = fetch_url(job["source"], upload_dir)
+        if page is not None:
+            title, text = page
+            if not text or not text.strip():
+                return []
+            return [Document(page_content=text.strip(), metadata={"source": job["source"], "title": title})]
+        if path is None:
+            return []
+        try:
+            return load_file_documents(job, path)
+        finally:
+            discard_file(path, upload_dir)  # downloaded only for this parse
+    return load_file_documents(job, path)
+
+
+def load_file_documents(job, path):
+    """Documents of one uploaded or downloaded file"""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredPowerPointLoader
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        documents = PyPDFLoader(path).load()
+    elif ext == ".txt":
+        documents = TextLoader(path, encoding="utf-8").load()
+    elif ext == ".pptx":
+        documents = UnstructuredPowerPointLoader(path).load()
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+    for doc in documents:
+        doc.metadata["source"] = job["source"]
+        doc.metadata.setdefault("title", job["name"])
+    return documents
+
+
+def parse_jobs(jobs, upload_dir=UPLOAD_DIR):
+    """Child process: {job id: {"chunks": [(text, metadata)], "error": str or None}}"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from partitioned_index import section_for
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    os.makedirs(upload_dir, exist_ok=True)
+    results = {}
+    for job in jobs:
+        try:
+            chunks = splitter.split_documents(load_job_documents(job, upload_dir))
+            for chunk in chunks:
+                chunk.metadata["section"] = section_for(chunk.metadata)
+            results[job["id"]] = {"chunks": [(c.page_content, c.metadata) for c in chunks], "error": None}
+        except Exception as e:
+            results[job["id"]] = {"chunks": [], "error": str(e)}
+    return results
+
+
+def publish_chunks(vectorstore_dir, texts, vectors, metadatas, answer_cache_path=None):
+    """Child process: add the vectors to the saved index, replacing earlier chunks of the same sources"""
+    from answer_cache import CACHE_PATH, invalidate_answer_cache
+    from partitioned_index import write_partitions
+    from quantized_index import load_vectorstore, read_meta, write_meta
+
+    vectorstore = load_vectorstore(vectorstore_dir, NoEmbeddings())
+    sources = {m.get("source") for m in metadatas}
+    replaced = [doc_id for doc_id, doc in vectorstore.docstore._dict.items() if doc.metadata.get("source") in sources]
+    if replaced:
+        vectorstore.delete(replaced)
+    vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+    vectorstore.save_local(vectorstore_dir)
+    write_meta(vectorstore_dir, {**read_meta(vectorstore_dir), "vectors": vectorstore.index.ntotal})
+    write_partitions(vectorstore, vectorstore_dir)
+    invalidate_answer_cache(vectorstore_dir, answer_cache_path or CACHE_PATH)
+    return {"added": len(texts), "replaced": len(replaced), "total": vectorstore.index.ntotal}
+
+
+# ---- server side ----
+
+class IngestQueue:
+    """Job queue + worker thread; on_publish(tenant) is called after each index update and
+    on_precomputed(tenant) after its precomputed answers were refreshed"""
+
+    def __init__(self, embeddings, vectorstore_dir, on_publish=None, busy=None, on_precomputed=None,
+                 precompute=True, upload_dir=UPLOAD_DIR, coalesce_s=COALESCE_WINDOW_S):
+        self.embeddings = embeddings
+        self.vectorstore_dir = vectorstore_dir
+        self.on_publish = on_publish
+        self.on_precomputed = on_precomputed
+        self.precompute = precompute
+        self.precompute_pending = {}  # vectorstore dir -> tenant
+        self.precompute_running = False
+        self.busy = busy or (lambda: False)
+        self.upload_dir = upload_dir
+        self.coalesce_s = coalesce_s
+        self.jobs = OrderedDict()
+        self.pending = []
+        self.lock = threading.Condition()
+        self.thread = None
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "updates": 0, "chunks": 0, "paused_s": 0.0,
+                      "precompute_runs": 0}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="ingest", daemon=True)
+        self.thread.start()
+
+    def submit(self, kind, source, name=None, path=None, tenant=None, vectorstore_dir=None):
+        """Queue a job ("file" with a saved path, or "url"); a source already waiting is not queued twice"""
+        vectorstore_dir = vectorstore_dir or self.vectorstore_dir
+        with self.lock:
+            for job in self.pending:
+                if job["source"] == source and job["vectorstore_dir"] == vectorstore_dir:
+                    if path and path != job["path"]:  # the newest upload wins
+                        discard_file(job.get("path"), self.upload_dir)
+                        job["path"] = path
+                    return dict(job)
+            if len(self.pending) >= MAX_PENDING:
+                discard_file(path, self.upload_dir)
+                raise QueueFull()
+            job = {
+                "id": uuid.uuid4().hex[:12], "kind": kind, "source": source, "name": name or source,
+                "path": path, "tenant": tenant, "vectorstore_dir": vectorstore_dir,
+                "status": "queued", "chunks": 0, "error": None,
+                "created": time.time(), "finished": None, "batch_size": None,
+            }
+            self.jobs[job["id"]] = job
+            while len(self.jobs) > MAX_JOB_HISTORY:
+                self.jobs.popitem(last=False)
+            self.pending.append(job)
+            self.stats["submitted"] += 1
+            self.lock.notify()
+            return dict(job)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self.lock:
+            return [dict(job) for job in reversed(self.jobs.values())]
+
+    def snapshot(self):
+        with self.lock:
+            return {"pending": len(self.pending), **self.stats, "paused_s": round(self.stats["paused_s"], 1)}
+
+    def set_status(self, jobs, status, error=None):
+        with self.lock:
+            for job in jobs:
+                job["status"] = status
+                if error is not None:
+                    job["error"] = error
+                if status in ("done", "failed"):
+                    job["finished"] = time.time()
+                    self.stats[status] += 1
+                    discard_file(job.get("path"), self.upload_dir)
+
+    def next_batch(self):
+        """Block until there is work, then give late arrivals a moment to join the batch"""
+        with self.lock:
+            while not self.pending:
+                self.lock.wait()
+        time.sleep(self.coalesce_s)
+        with self.lock:
+            batch, self.pending = self.pending[:MAX_JOBS_PER_UPDATE], self.pending[MAX_JOBS_PER_UPDATE:]
+            for job in batch:
+                job["batch_size"] = len(batch)
+            return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            try:
+                self.process(batch)
+            except Exception as e:
+                print(f"❌ Ingest update failed: {e}")
+                self.set_status([j for j in batch if j["status"] not in ("done", "failed")], "failed", str(e))
+
+    def process(self, batch):
+        print(f"📥 Ingesting {len(batch)} job(s) in one index update")
+        self.set_status(batch, "parsing")
+        # Fresh child per update: its memory (parsers, the loaded index) is returned when it exits
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as child:
+            parsed = child.submit(parse_jobs, batch, self.upload_dir).result()
+
+            ready = []
+            for job in batch:
+                result = parsed[job["id"]]
+                if result["error"] or not result["chunks"]:
+                    self.set_status([job], "failed", result["error"] or "No text could be extracted")
+                    continue
+                with self.lock:
+                    job["chunks"] = len(result["chunks"])
+                ready.append(job)
+
+            # One update per target index
+            by_index = {}
+            for job in ready:
+                by_index.setdefault(job["vectorstore_dir"], []).append(job)
+            for vectorstore_dir, jobs in by_index.items():
+                self.publish(child, vectorstore_dir, jobs, parsed)
+
+    def publish(self, child, vectorstore_dir, jobs, parsed):
+        texts, metadatas = [], []
+        for job in jobs:
+            for text, metadata in parsed[job["id"]]["chunks"]:
+                texts.append(text)
+                metadatas.append(metadata)
+        try:
+            self.set_status(jobs, "embedding")
+            vectors = self.embed(texts)
+            self.set_status(jobs, "publishing")
+            report = child.submit(publish_chunks, vectorstore_dir, texts, vectors, metadatas).result()
+        except Exception as e:
+            print(f"❌ Ingest update of {vectorstore_dir} failed: {e}")
+            self.set_status(jobs, "failed", str(e))
+            return
+
+        with self.lock:
+            self.stats["updates"] += 1
+            self.stats["chunks"] += report["added"]
+        print(f"✅ Ingested {report['added']} chunks into {vectorstore_dir} (replaced {report['replaced']}), "
+              f"index now {report['total']}")
+        if self.on_publish:
+            try:
+                self.on_publish(jobs[0]["tenant"])
+            except Exception as e:
+                # The index on disk is updated; the jobs stay done and the next reload picks it up
+                print(f"⚠️ Reloading {vectorstore_dir} after ingest failed: {e}")
+        if self.precompute:
+            self.schedule_precompute(vectorstore_dir, jobs[0]["tenant"])
+        self.set_status(jobs, "done")
+
+    def schedule_precompute(self, vectorstore_dir, tenant):
+        """Refresh the precomputed answers of an updated index without holding up the next update"""
+        with self.lock:
+            self.precompute_pending[vectorstore_dir] = tenant
+            if self.precompute_running:
+                return  # the running refresher picks it up next
+            self.precompute_running = True
+        threading.Thread(target=self.run_precompute, name="precompute", daemon=True).start()
+
+    def run_precompute(self):
+        while True:
+            with self.lock:
+                if not self.precompute_pending:
+                    self.precompute_running = False
+                    return
+                vectorstore_dir, tenant = self.precompute_pending.popitem()
+            try:
+                # Separate process (precompute_answers.py), so the server's memory is not involved
+                refresh_precomputed_answers(vectorstore_dir)
+                with self.lock:
+                    self.stats["precompute_runs"] += 1
+                if self.on_precomputed:
+                    self.on_precomputed(tenant)
+            except Exception as e:
+                print(f"⚠️ Refreshing precomputed answers for {vectorstore_dir} failed: {e}")
+
+    def embed(self, texts):
+        """Embed with the server's model in small batches, yielding to /chat while it is saturated"""
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            waited = 0.0
+            while self.busy() and waited < MAX_PAUSE_S:
+                time.sleep(0.5)
+                waited += 0.5
+            with self.lock:
+                self.stats["paused_s"] += waited
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + EMBED_BATCH]))
+        return vectors
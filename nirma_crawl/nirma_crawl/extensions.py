@@ -0,0 +1,84 @@
+# Scrapy extensions for the nirma_crawl project
+#
+# See: https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import os
+import sys
+from contextlib import nullcontext
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+# crawl_metrics.py lives at the repository root, next to the other crawlers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from crawl_metrics import CrawlMetrics
+
+
+def timed(crawler, stage):
+    """Time a block into the crawl metrics when CrawlMetricsExtension is enabled"""
+    metrics = getattr(crawler, "crawl_metrics", None)
+    return metrics.timed(stage) if metrics is not None else nullcontext()
+
+
+class CrawlMetricsExtension:
+    """
+    Feeds the shared crawl metrics (crawl_metrics.py) from Scrapy signals:
+    response latency/status/size, scraped pages, scheduler size, and Scrapy's own
+    retry and downloader exception counters. Snapshots go to CRAWL_METRICS_DIR.
+    """
+
+    def __init__(self, crawler, metrics):
+        self.crawler = crawler
+        self.metrics = metrics
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CRAWL_METRICS_ENABLED", True):
+            raise NotConfigured
+        metrics = CrawlMetrics(
+            "scrapy",
+            metrics_dir=crawler.settings.get("CRAWL_METRICS_DIR", "../data/crawl_metrics"),
+            interval=crawler.settings.getfloat("CRAWL_METRICS_INTERVAL", 30),
+        )
+        crawler.crawl_metrics = metrics  # for timed() in the spider and pipelines
+        ext = cls(crawler, metrics)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.spider_error, signal=signals.spider_error)
+        return ext
+
+    def spider_opened(self, spider):
+        self.metrics.crawler = spider.name
+        self.metrics.start()
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get("download_latency", 0.0)
+        self.metrics.record_fetch(response.status, latency, len(response.body))
+        self.sync_scrapy_stats()
+
+    def item_scraped(self, item, response, spider):
+        self.metrics.record_page()
+
+    def spider_error(self, failure, response, spider):
+        self.metrics.record_error(f"callback:{failure.type.__name__}")
+
+    def sync_scrapy_stats(self):
+        """RetryMiddleware and the downloader keep their own counters; mirror them"""
+        stats = self.crawler.stats.get_stats()
+        retries = {k.rsplit("/", 1)[-1]: v for k, v in stats.items() if k.startswith("retry/reason_count/")}
+        errors = {k.rsplit("/", 1)[-1]: v for k, v in stats.items()
+                  if k.startswith("downloader/exception_type_count/")}
+        self.metrics.mirror("retries", retries)
+        self.metrics.mirror("errors", errors)
+        slot = getattr(self.crawler.engine, "_slot", None) or getattr(self.crawler.engine, "slot", None)
+        if slot is not None:
+            self.metrics.gauge("frontier", len(slot.scheduler))
+            self.metrics.gauge("in_flight", len(slot.inprogress))
+
+    def spider_closed(self, spider, reason):
+        self.sync_scrapy_stats()
+        report = self.metrics.close()
+        spider.logger.info(f"Crawl metrics: {report['pages']} pages, {report['pages_per_s']} pages/s "
+                           f"-> {self.metrics.path}")
@@ -10,3 +10,10 @@ class NirmaCrawlItem(scrapy.Item):
     # define the fields for your item here like:
     # name = scrapy.Field()
     pass
+
+
+class NirmaPageItem(scrapy.Item):
+    url = scrapy.Field()
+    title = scrapy.Field()
+    text = scrapy.Field()       # cleaned visible text, consumed by the pipelines
+    text_file = scrapy.Field()  # set by TextFilePipeline
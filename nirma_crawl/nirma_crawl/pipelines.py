@@ -7,7 +7,209 @@
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+import hashlib
+import os
+import re
+import sys
+import threading
+
+from scrapy.exceptions import DropItem
+from twisted.internet import threads
+from twisted.internet.defer import DeferredList
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain.docstore.document import Document
+
+# corpus.py lives at the repository root, next to the other crawlers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from corpus import CorpusWriter
+from partitioned_index import section_for, write_partitions
+from quantized_index import write_meta
+from answer_cache import invalidate_answer_cache
+from ingest import publish_chunks
+from precompute_answers import refresh_precomputed_answers
+from nirma_crawl.extensions import timed
+
 
 class NirmaCrawlPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class TextFilePipeline:
+    """Writes each page to texts/<host>/<path>.txt (moved out of the spider callback)"""
+
+    def __init__(self, texts_dir):
+        self.texts_dir = texts_dir
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get("TEXTS_DIR", "texts"))
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        path = adapter["url"].replace("https://", "").replace("http://", "")
+        if path.endswith("/"):
+            path += "index"
+        path = re.sub(r"[^\w\-_/\.]", "_", path)
+        txt_path = os.path.join(self.texts_dir, f"{path}.txt")
+
+        with timed(spider.crawler, "write"):
+            os.makedirs(os.path.dirname(txt_path), exist_ok=True)
+            with open(txt_path, "w", encoding="utf-8") as f:
+                f.write(f"URL: {adapter['url']}\n\n{adapter['text']}")
+        adapter["text_file"] = txt_path
+        return item
+
+
+class CorpusPipeline:
+    """Appends each page to the shared zstd JSONL corpus (see corpus.py)"""
+
+    def __init__(self, corpus_dir):
+        self.corpus_dir = corpus_dir
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get("CORPUS_DIR", "../data/corpus"))
+
+    def open_spider(self, spider):
+        self.corpus = CorpusWriter(self.corpus_dir, crawler=spider.name)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        with timed(spider.crawler, "write"):
+            self.corpus.write(adapter["url"], adapter.get("title", ""), adapter["text"])
+        return item
+
+    def close_spider(self, spider):
+        self.corpus.close()
+        spider.logger.info(f"Appended {self.corpus.records} pages to {self.corpus_dir}")
+
+
+class VectorStorePipeline:
+    """
+    Streams pages into the FAISS index while the crawl runs:
+    batch items -> clean -> chunk -> embed in a worker thread -> append to the shard.
+    The shard is checkpointed to disk as it grows and merged into the live index when the
+    spider closes: crawled pages replace their earlier chunks, everything else is kept.
+    """
+
+    def __init__(self, settings):
+        self.batch_size = settings.getint("VECTORSTORE_BATCH_SIZE", 32)
+        self.min_text_length = settings.getint("VECTORSTORE_MIN_TEXT_LENGTH", 100)
+        self.save_every = settings.getint("VECTORSTORE_SAVE_EVERY", 10)
+        self.model_name = settings.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        self.shard_dir = settings.get("VECTORSTORE_SHARD_DIR", "../data/vectorstore_shards")
+        self.vectorstore_dir = settings.get("VECTORSTORE_DIR", "../data/vectorstore")
+        self.answer_cache_path = settings.get("ANSWER_CACHE_PATH", "../data/answer_cache.sqlite")
+        self.precompute = settings.getbool("PRECOMPUTE_ANSWERS", True)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.getint("VECTORSTORE_CHUNK_SIZE", 800),
+            chunk_overlap=settings.getint("VECTORSTORE_CHUNK_OVERLAP", 150),
+            length_function=len,
+            separators=["\n\n", "\n", " ", ""]
+        )
+        self.buffer = []
+        self.seen_hashes = set()
+        self.pending = []
+        self.lock = threading.Lock()  # one embed/append at a time
+        self.vectorstore = None
+        self.batches = 0
+        self.chunks = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings)
+
+    def open_spider(self, spider):
+        spider.logger.info(f"Loading embedding model {self.model_name}")
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs={"device": "cpu"}
+        )
+        self.shard_path = os.path.join(self.shard_dir, spider.name)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        text = re.sub(r"\s+", " ", adapter.get("text") or "").strip()
+        if len(text) < self.min_text_length:
+            raise DropItem(f"Too little text on {adapter['url']}")
+
+        # Same boilerplate page under several URLs: embed it once
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if digest not in self.seen_hashes:
+            self.seen_hashes.add(digest)
+            self.buffer.append(Document(
+                page_content=text,
+                metadata={"source": adapter["url"], "title": adapter.get("title", "")}
+            ))
+        if len(self.buffer) >= self.batch_size:
+            self.flush(spider)
+
+        # Keep the CSV feed small: text already lives in the .txt file and the index
+        del adapter["text"]
+        return item
+
+    def flush(self, spider):
+        if not self.buffer:
+            return
+        documents, self.buffer = self.buffer, []
+        d = threads.deferToThread(self.embed_and_append, documents, spider)
+        d.addErrback(lambda failure: spider.logger.error(f"Embedding batch failed: {failure.value}"))
+        self.pending.append(d)
+        d.addBoth(self._forget, d)
+
+    def _forget(self, result, d):
+        if d in self.pending:
+            self.pending.remove(d)
+        return result
+
+    def embed_and_append(self, documents, spider):
+        """Runs off the reactor thread: chunk, embed and append one batch"""
+        chunks = self.text_splitter.split_documents(documents)
+        texts = [c.page_content for c in chunks]
+        vectors = self.embeddings.embed_documents(texts)
+        metadatas = [{**c.metadata, "section": section_for(c.metadata)} for c in chunks]
+
+        with self.lock:
+            if self.vectorstore is None:
+                self.vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), self.embeddings, metadatas=metadatas)
+            else:
+                self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+            self.batches += 1
+            self.chunks += len(chunks)
+            if self.batches % self.save_every == 0:
+                self.vectorstore.save_local(self.shard_path)
+        spider.logger.info(f"Indexed {len(documents)} pages ({len(chunks)} chunks), {self.chunks} chunks total")
+
+    def close_spider(self, spider):
+        self.flush(spider)
+        d = DeferredList(list(self.pending))
+        d.addCallback(lambda _: self.publish(spider))
+        return d
+
+    def publish(self, spider):
+        if self.vectorstore is None:
+            spider.logger.warning("No pages indexed, vector store left untouched")
+            return
+        self.vectorstore.save_local(self.shard_path)
+        if os.path.exists(os.path.join(self.vectorstore_dir, "index.faiss")):
+            # Merge like /admin/ingest: documents, add_pdf.py and uploaded chunks stay, and a
+            # quantized index stays quantized
+            rows = sorted(self.vectorstore.index_to_docstore_id.items())
+            docs = [self.vectorstore.docstore.search(doc_id) for _, doc_id in rows]
+            vectors = self.vectorstore.index.reconstruct_n(0, self.vectorstore.index.ntotal)
+            report = publish_chunks(self.vectorstore_dir, [d.page_content for d in docs], vectors,
+                                    [d.metadata for d in docs], self.answer_cache_path)
+            spider.logger.info(f"Merged {report['added']} chunks into {self.vectorstore_dir} "
+                               f"(replaced {report['replaced']}), index now {report['total']}")
+        else:
+            self.vectorstore.save_local(self.vectorstore_dir)
+            write_meta(self.vectorstore_dir, {"vector_dtype": "float32", "vectors": self.vectorstore.index.ntotal})
+            write_partitions(self.vectorstore, self.vectorstore_dir, "float32")
+            invalidate_answer_cache(self.vectorstore_dir, self.answer_cache_path)
+            spider.logger.info(f"Vector store with {self.chunks} chunks saved to {self.vectorstore_dir}")
+        if self.precompute:
+            # Answers the top questions through the LLM: keep it off the reactor thread
+            return threads.deferToThread(refresh_precomputed_answers, self.vectorstore_dir)
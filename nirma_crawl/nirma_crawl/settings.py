@@ -52,15 +52,34 @@ DOWNLOAD_DELAY = 1.5
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "nirma_crawl.extensions.CrawlMetricsExtension": 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "nirma_crawl.pipelines.NirmaCrawlPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "nirma_crawl.pipelines.TextFilePipeline": 100,
+    "nirma_crawl.pipelines.CorpusPipeline": 200,
+    "nirma_crawl.pipelines.VectorStorePipeline": 300,
+}
+
+# Streaming index build (VectorStorePipeline)
+TEXTS_DIR = "texts"
+CORPUS_DIR = "../data/corpus"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+VECTORSTORE_BATCH_SIZE = 32        # pages per embedding batch
+VECTORSTORE_CHUNK_SIZE = 800
+VECTORSTORE_CHUNK_OVERLAP = 150
+VECTORSTORE_SAVE_EVERY = 10        # checkpoint the shard every N batches
+VECTORSTORE_SHARD_DIR = "../data/vectorstore_shards"
+VECTORSTORE_DIR = "../data/vectorstore"
+ANSWER_CACHE_PATH = "../data/answer_cache.sqlite"  # purged of stale answers on publish
+PRECOMPUTE_ANSWERS = True          # refresh precompute_answers.py output after publishing (needs OPENAI_API_KEY)
+
+# Crawl telemetry (CrawlMetricsExtension, see crawl_metrics.py)
+CRAWL_METRICS_DIR = "../data/crawl_metrics"
+CRAWL_METRICS_INTERVAL = 30        # seconds between JSON snapshots
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -1,8 +1,10 @@
 import scrapy
 from urllib.parse import urljoin
-import os
 import re
 
+from nirma_crawl.extensions import timed
+from nirma_crawl.items import NirmaPageItem
+
 
 class NirmaTextSpider(scrapy.Spider):
     name = "nirma_txt"
@@ -19,29 +21,17 @@ class NirmaTextSpider(scrapy.Spider):
 
     def parse(self, response):
         # --- Extract visible text ---
-        text_parts = response.css("body *::text").getall()
-        text = " ".join(text_parts)
-        text = re.sub(r"\s+", " ", text).strip()
-
-        # --- Determine file path ---
-        path = response.url.replace("https://", "").replace("http://", "")
-        if path.endswith("/"):
-            path += "index"
-        path = re.sub(r"[^\w\-_/\.]", "_", path)
-        txt_path = os.path.join("texts", f"{path}.txt")
-
-        # --- Save as .txt file ---
-        os.makedirs(os.path.dirname(txt_path), exist_ok=True)
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(f"URL: {response.url}\n\n{text}")
-        self.log(f"Saved text file {txt_path}")
-
-        # --- YIELD data for CSV export ---
-        yield {
-            "url": response.url,
-            "title": response.css("title::text").get(default="").strip(),
-            "text_file": txt_path,
-        }
+        with timed(self.crawler, "parse"):
+            text_parts = response.css("body *::text").getall()
+            text = " ".join(text_parts)
+            text = re.sub(r"\s+", " ", text).strip()
+
+        # --- Hand the page to the item pipelines (txt file, vector store) ---
+        yield NirmaPageItem(
+            url=response.url,
+            title=response.css("title::text").get(default="").strip(),
+            text=text,
+        )
 
         # --- Follow internal links ---
         for link in response.css("a::attr(href)").getall():
@@ -0,0 +1,282 @@
+"""
+partitioned_index.py
+Section partitions of the vector store with query-side routing.
+- Every chunk gets a "section" (admissions, academics, placements, hostel, circulars,
+  documents, general) from its source URL path or title
+- write_partitions() splits the global index into one small FAISS index per section
+  under data/vectorstore/partitions/ (vectors are copied, nothing is re-embedded)
+- PartitionedVectorStore routes each query to the matching partitions by keyword and
+  falls back to all partitions (= the global index) when routing finds nothing good
+- Writes through the VectorStore API go to the matching partition in memory; to persist,
+  add to the global index and re-run write_partitions()
+"""
+
+import json
+import os
+import re
+import shutil
+import uuid
+from urllib.parse import urlparse
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.vectorstores import VectorStore
+
+from downloader import DOCUMENT_EXTS
+from quantized_index import QuantizedFAISS, load_vectorstore, quantize_vectorstore, read_meta, write_meta
+
+PARTITIONS_DIR = "partitions"
+MANIFEST_FILE = "partitions.json"
+ROUTE_MAX_DISTANCE = 1.1  # squared L2 on normalized MiniLM vectors (~cosine 0.45); worse -> fall back
+
+# Build side: URL path / title words per section, checked in order; matched like the
+# query side (keyword_matches), so "fee" is not "/feedback" and "news" is not "newsletter"
+SECTION_PATTERNS = [
+    ("circulars", ("circular", "notice", "notification", "announcement", "news")),
+    ("admissions", ("admission", "apply", "eligibility", "fee", "scholarship", "prospectus")),
+    ("placements", ("placement", "career", "recruit*", "internship", "alumni")),
+    ("hostel", ("hostel", "accommodation", "residential", "mess")),
+    ("academics", ("academic", "programme", "program", "course", "syllabus", "curriculum",
+                   "department", "faculty", "faculties", "exam", "examination", "calendar")),
+]
+
+# Query side: words that send a question to a section. Whole words (plural -s/-es included);
+# entries ending in "*" are stems and match any word starting with them
+QUERY_KEYWORDS = {
+    "admissions": ("admission", "admit*", "apply", "applica*", "eligib*", "fee", "scholarship", "entrance",
+                   "cutoff", "cut-off", "seat", "intake", "prospectus", "jee", "cat", "gujcet"),
+    "academics": ("course", "programme", "program", "syllabus", "curriculum", "semester", "exam", "examination",
+                  "credit", "department", "faculty", "faculties", "professor", "b.tech", "btech", "m.tech", "mba",
+                  "phd", "degree", "academic", "calendar", "timetable"),
+    "placements": ("placement", "placed", "package", "salary", "salaries", "ctc", "recruit*", "compan*",
+                   "internship", "job", "career"),
+    "hostel": ("hostel", "room", "mess", "accommodation", "warden", "dorm*", "stay"),
+    "circulars": ("circular", "notice", "notification", "announcement", "news", "latest"),
+    "documents": ("pdf", "brochure", "document", "form", "download*"),
+}
+
+
+def section_for(metadata):
+    """Section of a chunk from its source URL (host + path) or title"""
+    source = metadata.get("source", "") or ""
+    if "://" in source:
+        parsed = urlparse(source)
+        location = (parsed.netloc + parsed.path).lower()
+    else:
+        location = source.lower()
+    title = (metadata.get("title") or "").lower()
+    for text in (location, title):
+        tokens = re.findall(r"[a-z0-9]+", text)
+        for section, keywords in SECTION_PATTERNS:
+            if any(keyword_matches(t, keywords) for t in tokens):
+                return section
+    if location.endswith(DOCUMENT_EXTS) or "page" in metadata:
+        return "documents"
+    return "general"
+
+
+def keyword_matches(token, keywords):
+    """Whole-word match (so "cat" is not "category"), except for "stem*" keywords"""
+    for keyword in keywords:
+        if keyword.endswith("*"):
+            if token.startswith(keyword[:-1]):
+                return True
+        elif token in (keyword, keyword + "s", keyword + "es"):
+            return True
+    return False
+
+
+def route_query(query):
+    """Sections a question is about, most keyword hits first; [] when nothing matches"""
+    tokens = [t.strip(".-") for t in re.findall(r"[a-z0-9.\-]+", query.lower())]
+    hits = {}
+    for section, keywords in QUERY_KEYWORDS.items():
+        count = sum(1 for t in tokens if keyword_matches(t, keywords))
+        if count:
+            hits[section] = count
+    return sorted(hits, key=lambda s: -hits[s])
+
+
+def store_vectors(vectorstore):
+    """Exact float32 vectors of a (possibly quantized) FAISS store, in index order"""
+    if isinstance(vectorstore, QuantizedFAISS) and vectorstore.exact_vectors is not None:
+        return np.asarray(vectorstore.exact_vectors, dtype=np.float32)
+    return vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+
+
+def write_partitions(vectorstore, folder_path, vector_dtype=None):
+    """Split a saved global index into per-section indexes under folder_path/partitions/"""
+    vector_dtype = vector_dtype or read_meta(folder_path).get("vector_dtype", "float32")
+    vectors = store_vectors(vectorstore)
+
+    rows_by_section = {}
+    for row, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+        doc = vectorstore.docstore.search(doc_id)
+        section = section_for(doc.metadata)  # not the stored one: it may predate the current rules
+        doc.metadata["section"] = section
+        rows_by_section.setdefault(section, []).append(row)
+
+    tmp_dir = os.path.join(folder_path, f".{PARTITIONS_DIR}.new")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    manifest = {"vector_dtype": vector_dtype, "sections": {}}
+    for section, rows in sorted(rows_by_section.items()):
+        ids = [vectorstore.index_to_docstore_id[r] for r in rows]
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors[rows])
+        part = FAISS(
+            vectorstore.embeddings, index,
+            InMemoryDocstore({i: vectorstore.docstore.search(i) for i in ids}),
+            dict(enumerate(ids)), normalize_L2=vectorstore._normalize_L2
+        )
+        path = os.path.join(tmp_dir, section)
+        if vector_dtype != "float32":
+            quantize_vectorstore(part, path, vector_dtype)
+        else:
+            part.save_local(path)
+            write_meta(path, {"vector_dtype": "float32", "vectors": len(rows)})
+        manifest["sections"][section] = len(rows)
+
+    # Tie the partitions to the global index they were cut from
+    manifest["source"] = index_signature(folder_path)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    final_dir = os.path.join(folder_path, PARTITIONS_DIR)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+
+    sizes = ", ".join(f"{s} {n}" for s, n in sorted(manifest["sections"].items(), key=lambda x: -x[1]))
+    print(f"🗂️  Partitioned {len(vectors)} chunks: {sizes}")
+    return manifest
+
+
+def index_signature(folder_path):
+    path = os.path.join(folder_path, "index.faiss")
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_partitioned(folder_path, embeddings):
+    """PartitionedVectorStore for folder_path, or None if it has no up-to-date partitions"""
+    parts_dir = os.path.join(folder_path, PARTITIONS_DIR)
+    manifest_path = os.path.join(parts_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("source") != index_signature(folder_path):
+        print("⚠️ Partitions are older than the global index, using the global index")
+        return None
+    partitions = {
+        section: load_vectorstore(os.path.join(parts_dir, section), embeddings)
+        for section in manifest["sections"]
+    }
+    return PartitionedVectorStore(partitions, embeddings)
+
+
+class PartitionedVectorStore(VectorStore):
+    """Searches only the partitions a query routes to; all partitions together are the global index"""
+
+    def __init__(self, partitions, embedding, max_distance=ROUTE_MAX_DISTANCE):
+        self.partitions = partitions
+        self.embedding = embedding
+        self.max_distance = max_distance
+        self.stats = {"routed": 0, "fallback": 0, "global": 0}
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def pick_sections(self, query, filter):
+        """Explicit filter={"section": ...} wins over routing; returns (sections, rest of filter, explicit)"""
+        filter = dict(filter) if filter else None
+        if filter and "section" in filter:
+            wanted = filter.pop("section")
+            sections = [wanted] if isinstance(wanted, str) else list(wanted)
+            return [s for s in sections if s in self.partitions], filter or None, True
+        return [s for s in route_query(query) if s in self.partitions], filter, False
+
+    def search(self, sections, search_fn, k):
+        results = []
+        for section in sections:
+            results.extend(search_fn(self.partitions[section]))
+        return sorted(results, key=lambda pair: pair[1])[:k]
+
+    def routed_search(self, query, k, filter, search_fn):
+        sections, filter, explicit = self.pick_sections(query, filter)
+        if explicit:
+            return self.search(sections, lambda store: search_fn(store, filter), k)
+        if sections:
+            results = self.search(sections, lambda store: search_fn(store, filter), k)
+            if len(results) >= k and results[0][1] <= self.max_distance:
+                self.stats["routed"] += 1
+                return results
+            self.stats["fallback"] += 1
+        else:
+            self.stats["global"] += 1
+        return self.search(list(self.partitions), lambda store: search_fn(store, filter), k)
+
+    def similarity_search_with_score(self, query, k=4, filter=None, fetch_k=20, **kwargs):
+        embedding = self.embedding.embed_query(query)
+        return self.routed_search(query, k, filter, lambda store, f: store.similarity_search_with_score_by_vector(
+            embedding, k, filter=f, fetch_k=fetch_k, **kwargs))
+
+    def similarity_search(self, query, k=4, filter=None, fetch_k=20, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, fetch_k, **kwargs)]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        embedding = self.embedding.embed_query(query)
+        results = self.routed_search(query, k, filter, lambda store, f: (
+            store.max_marginal_relevance_search_with_score_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=f)))
+        return [doc for doc, _ in results]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self.embedding.embed_documents(texts)), metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        """Add each chunk to its section's partition in memory (a new section gets a new partition)"""
+        text_embeddings = list(text_embeddings)
+        metadatas = [dict(m) for m in metadatas] if metadatas else [{} for _ in text_embeddings]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in text_embeddings]
+        by_section = {}
+        for pair, metadata, doc_id in zip(text_embeddings, metadatas, ids):
+            metadata["section"] = metadata.get("section") or section_for(metadata)
+            pairs, metas, section_ids = by_section.setdefault(metadata["section"], ([], [], []))
+            pairs.append(pair)
+            metas.append(metadata)
+            section_ids.append(doc_id)
+        normalize_L2 = next((store._normalize_L2 for store in self.partitions.values()), False)
+        for section, (pairs, metas, section_ids) in by_section.items():
+            store = self.partitions.get(section)
+            if store is None:
+                self.partitions[section] = FAISS.from_embeddings(pairs, self.embedding, metadatas=metas,
+                                                                 ids=section_ids, normalize_L2=normalize_L2)
+            else:
+                store.add_embeddings(pairs, metadatas=metas, ids=section_ids)
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        """Delete chunks from whichever partitions hold them"""
+        if not ids:
+            return False
+        for store in self.partitions.values():
+            found = [doc_id for doc_id in ids if doc_id in store.docstore._dict]
+            if found:
+                store.delete(found)
+        return True
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        """In-memory partitioned store; saved indexes are built with embeddings.py + write_partitions()"""
+        store = cls({}, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,304 @@
+"""
+precompute_answers.py
+Offline answers for the most frequent questions, served by app.py without retrieval or the LLM.
+- Questions come from the query log app.py writes (data/query_log.jsonl) and/or the
+  curated list in top_questions.json
+- Near-duplicate phrasings are clustered with the embedding model; the top clusters are
+  answered once through the same RetrievalQA chain app.py uses
+- Phrasings only merge (and incoming questions only match) when they also have the same
+  content words, so "B.Tech fee" never gets the "M.Tech fee" or "hostel fee 2024" answer
+- Output: data/precomputed_answers.json (+ .npy with the phrasing embeddings), stamped
+  with the index/prompt version so app.py ignores it after the index changes
+- embeddings.py, add_pdf.py, the Scrapy pipeline and /admin/ingest re-run this job after
+  publishing a new index
+- With tenants.json (tenants.py), each tenant gets its own run: --tenant picks the index,
+  the tenant's logged questions and its "precomputed" output file
+
+Usage:
+    python precompute_answers.py                        # query log + curated list
+    python precompute_answers.py --top 300 --no-log     # curated list only
+    python precompute_answers.py --tenant nirma-law     # another tenant from tenants.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from admission import normalize_question
+from answer_cache import index_version
+
+QUERY_LOG = "data/query_log.jsonl"
+CURATED_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "top_questions.json")
+PRECOMPUTED_FILE = "data/precomputed_answers.json"
+TOP_N = 300
+CLUSTER_SIMILARITY = 0.88   # cosine: phrasings merged into one question cluster
+MATCH_SIMILARITY = 0.92     # cosine: incoming question served from a precomputed answer
+MAX_LOGGED_QUESTIONS = 20000
+MIN_ASKS = 2                # logged clusters asked fewer times are not worth precomputing
+# Words that don't change what is asked; everything else (numbers, programme codes...) must match
+FILLER_WORDS = frozenset((
+    "a", "an", "the", "of", "for", "to", "in", "at", "on", "and", "or", "is", "are", "was", "be",
+    "what", "whats", "how", "much", "many", "do", "does", "did", "can", "could", "i", "we", "me",
+    "my", "you", "your", "its", "it", "please", "tell", "about", "there", "any", "s",
+    "nirma", "university", "nu",
+))
+
+
+def vectors_path(path):
+    return os.path.splitext(path)[0] + ".npy"
+
+
+def unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def content_words(question):
+    """Words that decide what a question asks: filler dropped, "B.Tech" -> "btech", plural -s folded"""
+    words = set()
+    for token in re.findall(r"[a-z0-9]+(?:\.[a-z0-9]+)*", question.lower()):
+        token = token.replace(".", "")
+        if token in FILLER_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token[0].isdigit():
+            token = token[:-1]
+        words.add(token)
+    return frozenset(words)
+
+
+def log_files(log_path):
+    """The query log and the file app.py rotated it to, oldest first"""
+    return [path for path in (log_path + ".1", log_path) if os.path.exists(path)]
+
+
+def load_question_counts(log_path=QUERY_LOG, curated_path=CURATED_QUESTIONS, use_log=True, tenant=None,
+                         default_tenant=None):
+    """Counter of normalized question -> asks, most common original wording of each, curated keys"""
+    counts, wordings, curated_keys = Counter(), {}, set()
+    paths = log_files(log_path) if use_log else []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    question = entry["question"]
+                except (ValueError, KeyError):
+                    continue
+                # Lines logged before tenants existed belong to the default tenant
+                if tenant is not None and entry.get("tenant", default_tenant) != tenant:
+                    continue
+                key = normalize_question(question)
+                if key:
+                    counts[key] += 1
+                    wordings.setdefault(key, Counter())[question.strip()] += 1
+    if paths:
+        print(f"📜 {sum(counts.values())} logged queries, {len(counts)} distinct")
+    if curated_path and os.path.exists(curated_path):
+        with open(curated_path, "r", encoding="utf-8") as f:
+            curated = json.load(f)
+        for question in curated:
+            key = normalize_question(question)
+            counts[key] += 1
+            wordings.setdefault(key, Counter())[question] += 1
+            curated_keys.add(key)
+        print(f"📋 {len(curated)} curated questions")
+    return counts, {key: c.most_common(1)[0][0] for key, c in wordings.items()}, curated_keys
+
+
+def cluster_questions(counts, wordings, embeddings, curated_keys=(), threshold=CLUSTER_SIMILARITY):
+    """Greedy clustering, most asked first: a question joins the closest cluster with the same
+    content words, if close enough"""
+    keys = [key for key, _ in counts.most_common(MAX_LOGGED_QUESTIONS)]
+    if not keys:
+        return []
+    vectors = unit_rows(embeddings.embed_documents([wordings[k] for k in keys]))
+    clusters, heads = [], {}  # content words -> [(cluster number, head vector)]
+    for key, vector in zip(keys, vectors):
+        candidates = heads.setdefault(content_words(wordings[key]), [])
+        if candidates:
+            similarity = np.asarray([head for _, head in candidates]) @ vector
+            best = int(np.argmax(similarity))
+            if similarity[best] >= threshold:
+                cluster = clusters[candidates[best][0]]
+                cluster["variants"].append(wordings[key])
+                cluster["count"] += counts[key]
+                cluster["curated"] = cluster["curated"] or key in curated_keys
+                continue
+        candidates.append((len(clusters), vector))
+        clusters.append({"question": wordings[key], "variants": [wordings[key]], "count": counts[key],
+                         "curated": key in curated_keys})
+    clusters = [c for c in clusters if c["curated"] or c["count"] >= MIN_ASKS]
+    return sorted(clusters, key=lambda c: -c["count"])
+
+
+def answer_clusters(clusters, chain, workers=4):
+    """Run each cluster's representative question through the QA chain"""
+    def answer(cluster):
+        result = chain.invoke({"query": cluster["question"]})
+        sources = [doc.metadata.get("source", "Unknown") for doc in result.get("source_documents", [])]
+        return {**cluster, "response": result["result"], "sources": sources[:3]}
+
+    entries = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, entry in enumerate(executor.map(answer, clusters), 1):
+            entries.append(entry)
+            print(f"💬 [{i}/{len(clusters)}] {entry['question']} ({entry['count']} asks)")
+    return entries
+
+
+def save_store(entries, embeddings, version, path=PRECOMPUTED_FILE):
+    """JSON entries + embeddings of every phrasing (row i of the .npy -> variant_rows[i])"""
+    variant_rows = [(i, v) for i, e in enumerate(entries) for v in e["variants"]]
+    vectors = unit_rows(embeddings.embed_documents([v for _, v in variant_rows])) if variant_rows else np.zeros((0, 0))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_vectors = vectors_path(path) + ".tmp"
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, vectors.astype(np.float32))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "entries": entries,
+            "variant_rows": [i for i, _ in variant_rows],
+        }, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_vectors, vectors_path(path))
+    os.replace(tmp_path, path)
+    print(f"💾 {len(entries)} precomputed answers ({len(variant_rows)} phrasings) saved to {path}")
+
+
+class PrecomputedAnswers:
+    """Read-only lookup app.py consults before the answer cache and retrieval"""
+
+    def __init__(self, entries, variant_rows, vectors, embeddings, threshold=MATCH_SIMILARITY):
+        self.entries = entries
+        self.variant_rows = np.asarray(variant_rows, dtype=np.int64)
+        self.vectors = vectors
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.exact = {}
+        self.rows_by_words = {}  # content words -> .npy rows of the phrasings that have them
+        row = 0
+        for i, entry in enumerate(entries):
+            for variant in entry["variants"]:
+                self.exact.setdefault(normalize_question(variant), i)
+                self.rows_by_words.setdefault(content_words(variant), []).append(row)
+                row += 1
+        self.stats = {"exact": 0, "similar": 0, "misses": 0}
+
+    @classmethod
+    def load(cls, version, embeddings, path=PRECOMPUTED_FILE):
+        """None when missing or computed for another index/prompt version"""
+        if not os.path.exists(path) or not os.path.exists(vectors_path(path)):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            store = json.load(f)
+        if store.get("version") != version:
+            print("ℹ️ Precomputed answers are for another index version, ignoring them")
+            return None
+        vectors = np.load(vectors_path(path))
+        print(f"📌 Loaded {len(store['entries'])} precomputed answers")
+        return cls(store["entries"], store["variant_rows"], vectors, embeddings)
+
+    def lookup(self, question):
+        """{"response", "sources"} for a known question (same words, or a close paraphrase with the
+        same content words)"""
+        index = self.exact.get(normalize_question(question))
+        rows = self.rows_by_words.get(content_words(question))
+        if index is not None:
+            self.stats["exact"] += 1
+        elif rows and len(self.vectors):
+            query = unit_rows([self.embeddings.embed_query(question)])[0]
+            similarity = self.vectors[rows] @ query
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                index = int(self.variant_rows[rows[best]])
+                self.stats["similar"] += 1
+        if index is None:
+            self.stats["misses"] += 1
+            return None
+        entry = self.entries[index]
+        return {"response": entry["response"], "sources": entry["sources"]}
+
+    def snapshot(self):
+        return {"entries": len(self.entries), **self.stats}
+
+
+def refresh_precomputed_answers(vectorstore_dir):
+    """Re-run this job after an index was published (separate process: needs app.py and the LLM)"""
+    if not os.environ.get("OPENAI_API_KEY"):
+        print("ℹ️ OPENAI_API_KEY not set, skipping answer precomputation (run precompute_answers.py later)")
+        return
+    print("\n🧮 Refreshing precomputed answers for the new index...")
+    # From the repository root, where app.py's data/ paths resolve (Scrapy runs from nirma_crawl/)
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--vectorstore-dir",
+                             os.path.abspath(vectorstore_dir)], cwd=root)
+    if result.returncode != 0:
+        print("⚠️ Precomputing answers failed; app.py will answer these questions live")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for the most frequent questions.")
+    parser.add_argument("--top", type=int, default=TOP_N, help="Number of question clusters to answer")
+    parser.add_argument("--log", default=QUERY_LOG, help="Query log written by app.py")
+    parser.add_argument("--no-log", action="store_true", help="Only use the curated list")
+    parser.add_argument("--questions", default=None,
+                        help="Curated questions (JSON list; default top_questions.json for the default tenant)")
+    parser.add_argument("--tenant", default=None, help="Tenant id from tenants.json (default: matched by index folder)")
+    parser.add_argument("--vectorstore-dir", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--workers", type=int, default=4, help="Questions answered in parallel")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    import app  # the same embeddings, prompt and chain as the server
+    from tenants import load_tenant_config, tenant_for_folder
+    load_dotenv()
+
+    tenant_config, default_tenant = load_tenant_config(default_dir=app.VECTORSTORE_PATH)
+    if args.tenant:
+        tenant_id = args.tenant
+    elif args.vectorstore_dir:
+        tenant_id = tenant_for_folder(tenant_config, args.vectorstore_dir)
+    else:
+        tenant_id = default_tenant
+    if tenant_id is not None and tenant_id not in tenant_config:
+        print(f"❌ Unknown tenant: {tenant_id}")
+        sys.exit(1)
+    tenant = tenant_config.get(tenant_id, {})
+    vectorstore_dir = args.vectorstore_dir or tenant["vectorstore"]
+    # An index no tenant serves keeps its answers next to it
+    output = args.output or tenant.get("precomputed") or os.path.join(vectorstore_dir, "precomputed_answers.json")
+    questions = args.questions or tenant.get("questions") or (CURATED_QUESTIONS if tenant_id == default_tenant else None)
+    print(f"🏫 Tenant {tenant_id or '-'}: index {vectorstore_dir}, output {output}")
+    counts, wordings, curated_keys = load_question_counts(args.log, questions, use_log=not args.no_log,
+                                                          tenant=tenant_id, default_tenant=default_tenant)
+    if not counts:
+        print("❌ No questions found in the query log or curated list.")
+        sys.exit(1)
+
+    embeddings = app.load_embeddings()
+    clusters = cluster_questions(counts, wordings, embeddings, curated_keys)[:args.top]
+    print(f"🧩 {len(clusters)} question clusters to answer")
+
+    version = app.answer_cache_version(index_version(vectorstore_dir))
+    vectorstore = app.load_vectorstore(vectorstore_dir, embeddings)
+    chain = app.build_qa_chain(vectorstore, app.load_llm())
+    started = time.time()
+    entries = answer_clusters(clusters, chain, workers=args.workers)
+    print(f"⏱️  Answered {len(entries)} questions in {time.time() - started:.0f}s")
+    save_store(entries, embeddings, version, output)
+
+
+if __name__ == "__main__":
+    main()
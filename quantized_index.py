@@ -0,0 +1,260 @@
+"""
+quantized_index.py
+Scalar-quantized FAISS storage for the vector store.
+- The in-RAM index keeps float16 (QT_fp16) or int8 (QT_8bit) codes: 2x / ~4x smaller
+- The exact float32 vectors stay on disk (vectors.npy) and are memory-mapped;
+  each search reranks only a small candidate set against them, preserving recall
+- Adding vectors appends them to vectors.npy in place; deleting streams the kept rows
+  to a new file; neither reads the whole array into RAM
+- index_meta.json records the storage type so every loader picks the right class
+"""
+
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+META_FILE = "index_meta.json"
+VECTORS_FILE = "vectors.npy"
+PENDING_VECTORS_FILE = ".vectors.pending.npy"  # vectors after a delete, until save_local
+COPY_BLOCK_ROWS = 65536
+RERANK_FACTOR = 4  # candidates fetched from the quantized index per requested result
+
+QTYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def read_meta(folder_path):
+    path = os.path.join(folder_path, META_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_meta(folder_path, meta):
+    with open(os.path.join(folder_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def npy_layout(f):
+    """(shape, data offset, header offset) of an open .npy file"""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        header_at = f.tell() + 2
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    else:
+        header_at = f.tell() + 4
+        shape, _, _ = np.lib.format.read_array_header_2_0(f)
+    return shape, f.tell(), header_at
+
+
+def append_vectors(path, vectors, keep):
+    """Write vectors after the first keep rows of a float32 .npy in place; False if its header has no room"""
+    with open(path, "r+b") as f:
+        shape, offset, header_at = npy_layout(f)
+        header = repr({"descr": "<f4", "fortran_order": False, "shape": (keep + len(vectors), shape[1])})
+        room = offset - header_at - 1
+        if len(header) > room:
+            return False
+        # Rows first, header last: a reader of the old shape never sees a half-written row
+        f.seek(offset + keep * shape[1] * 4)
+        f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        f.truncate()
+        f.flush()
+        f.seek(header_at)
+        f.write(header.ljust(room).encode("latin1") + b"\n")
+    return True
+
+
+def write_vectors(path, parts, dim):
+    """Stream float32 row blocks into a new .npy (atomically replacing path); returns it memory-mapped"""
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}")
+    with open(tmp_path, "wb") as f:
+        np.lib.format.write_array_header_1_0(
+            f, {"descr": "<f4", "fortran_order": False, "shape": (sum(len(p) for p in parts), dim)})
+        for part in parts:
+            for start in range(0, len(part), COPY_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(part[start:start + COPY_BLOCK_ROWS], dtype="<f4").tobytes())
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+class QuantizedFAISS(FAISS):
+    """FAISS store searching SQ codes, then reranking candidates on exact float32 vectors"""
+
+    exact_vectors = None
+    rerank_factor = RERANK_FACTOR
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        if self.exact_vectors is None:
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+
+        query = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(query)
+        n_candidates = (k if filter is None else fetch_k) * self.rerank_factor
+        _, indices = self.index.search(query, n_candidates)
+        candidates = indices[0][indices[0] >= 0]
+        if not len(candidates):
+            return []
+
+        # Exact L2 on the few candidate rows only (reads a handful of pages from the memmap)
+        exact = np.asarray(self.exact_vectors[np.sort(candidates)], dtype=np.float32)
+        distances = ((exact - query) ** 2).sum(axis=1)
+        rows = np.sort(candidates)
+
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+        score_threshold = kwargs.get("score_threshold")
+        docs = []
+        for j in np.argsort(distances):
+            if score_threshold is not None and distances[j] > score_threshold:
+                break
+            _id = self.index_to_docstore_id[int(rows[j])]
+            doc = self.docstore.search(_id)
+            if filter_func is not None and not filter_func(doc.metadata):
+                continue
+            docs.append((doc, float(distances[j])))
+            if len(docs) >= k:
+                break
+        return docs
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self._embed_documents(texts)), metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        text_embeddings = list(text_embeddings)
+        vectors = np.array([e for _, e in text_embeddings], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        added = super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)
+        path = getattr(self.exact_vectors, "filename", None)
+        if path is None:
+            if self.exact_vectors is not None:
+                self.exact_vectors = np.vstack([self.exact_vectors, vectors])  # not saved yet, already in RAM
+        elif append_vectors(path, vectors, len(self.exact_vectors)):
+            self.exact_vectors = np.load(path, mmap_mode="r")
+        else:
+            self.exact_vectors = write_vectors(path, [self.exact_vectors, vectors], vectors.shape[1])
+        return added
+
+    def delete(self, ids=None, **kwargs):
+        if self.exact_vectors is not None and ids:
+            reversed_index = {id_: idx for idx, id_ in self.index_to_docstore_id.items()}
+            rows = sorted(reversed_index[id_] for id_ in ids if id_ in reversed_index)
+            path = getattr(self.exact_vectors, "filename", None)
+            if path is None:
+                self.exact_vectors = np.delete(self.exact_vectors, rows, axis=0)
+            elif rows:
+                # A new file: the server may still be reading the rows of the published one
+                starts, ends = [0] + [r + 1 for r in rows], rows + [len(self.exact_vectors)]
+                kept = [self.exact_vectors[s:e] for s, e in zip(starts, ends) if e > s]
+                self.exact_vectors = write_vectors(os.path.join(os.path.dirname(path), PENDING_VECTORS_FILE),
+                                                   kept, self.exact_vectors.shape[1])
+        return super().delete(ids, **kwargs)
+
+    def save_local(self, folder_path, index_name="index"):
+        super().save_local(folder_path, index_name)
+        if self.exact_vectors is None:
+            return
+        target = os.path.abspath(os.path.join(folder_path, VECTORS_FILE))
+        source = getattr(self.exact_vectors, "filename", None)
+        if source == target:
+            return  # additions were already appended to this file
+        if source == os.path.join(os.path.dirname(target), PENDING_VECTORS_FILE):
+            os.replace(source, target)
+            self.exact_vectors = np.load(target, mmap_mode="r")
+        else:
+            self.exact_vectors = write_vectors(target, [self.exact_vectors], self.exact_vectors.shape[1])
+
+    @classmethod
+    def load_local(cls, folder_path, embeddings, index_name="index", **kwargs):
+        store = super().load_local(folder_path, embeddings, index_name, **kwargs)
+        meta = read_meta(folder_path)
+        vectors_path = os.path.join(folder_path, VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            # Rows past ntotal are left by an update that never saved its index; they are overwritten
+            store.exact_vectors = np.load(vectors_path, mmap_mode="r")[:store.index.ntotal]
+        store.rerank_factor = meta.get("rerank_factor", RERANK_FACTOR)
+        return store
+
+
+def load_vectorstore(folder_path, embeddings):
+    """Load a vector store saved by VectorStoreBuilder, whatever its vector storage"""
+    cls = QuantizedFAISS if read_meta(folder_path).get("vector_dtype", "float32") != "float32" else FAISS
+    return cls.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+
+
+def top_k_ids(index, queries, k):
+    _, ids = index.search(queries, k)
+    return ids
+
+
+def measure_recall(flat_index, store, vectors, k=8, sample=200):
+    """recall@k of the quantized index vs exact search, with and without reranking"""
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)]
+    # Perturb so queries are not exact copies of stored vectors
+    queries = queries + rng.normal(0, 0.01, size=queries.shape).astype(np.float32)
+    truth = top_k_ids(flat_index, queries, k)
+
+    raw = top_k_ids(store.index, queries, k)
+    reranked = []
+    for q in queries:
+        _, ids = store.index.search(q[None, :], k * store.rerank_factor)
+        ids = ids[0][ids[0] >= 0]
+        d = ((vectors[ids] - q) ** 2).sum(axis=1)
+        reranked.append(ids[np.argsort(d)[:k]])
+
+    def recall(found):
+        return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+    return {"recall_quantized": round(recall(raw), 4), "recall_reranked": round(recall(reranked), 4)}
+
+
+def quantize_vectorstore(vectorstore, folder_path, vector_dtype, rerank_factor=RERANK_FACTOR):
+    """Convert a float32 FAISS store into a QuantizedFAISS saved in folder_path; returns the report"""
+    if vector_dtype not in QTYPES:
+        raise ValueError(f"vector_dtype must be one of {VECTOR_DTYPES}")
+    flat = vectorstore.index
+    n, d = flat.ntotal, flat.d
+    vectors = flat.reconstruct_n(0, n)
+
+    started = time.time()
+    sq_index = faiss.IndexScalarQuantizer(d, QTYPES[vector_dtype], faiss.METRIC_L2)
+    sq_index.train(vectors)
+    sq_index.add(vectors)
+
+    store = QuantizedFAISS(
+        vectorstore.embeddings, sq_index, vectorstore.docstore, vectorstore.index_to_docstore_id,
+        normalize_L2=vectorstore._normalize_L2
+    )
+    store.exact_vectors = vectors
+    store.rerank_factor = rerank_factor
+
+    float_bytes = n * d * 4
+    quantized_bytes = n * sq_index.sa_code_size()
+    report = {
+        "vector_dtype": vector_dtype,
+        "vectors": n,
+        "dim": d,
+        "rerank_factor": rerank_factor,
+        "index_ram_mb_float32": round(float_bytes / 1e6, 2),
+        "index_ram_mb": round(quantized_bytes / 1e6, 2),
+        "ram_saved_mb": round((float_bytes - quantized_bytes) / 1e6, 2),
+        "quantize_s": round(time.time() - started, 2),
+    }
+    if n:
+        report.update(measure_recall(flat, store, vectors))
+
+    store.save_local(folder_path)
+    write_meta(folder_path, report)
+    store.exact_vectors = np.load(os.path.join(folder_path, VECTORS_FILE), mmap_mode="r")
+    return store, report
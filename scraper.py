@@ -152,209 +152,401 @@ if __name__ == "__main__":
     print(f"\n✨ Scraping complete! Check the 'data/raw/' directory for results.")"""
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
 import trafilatura
+from trafilatura.utils import load_html
 import os
 import time
 from urllib.parse import urljoin, urlparse
 import json
+import gzip
+import random
+import argparse
 from xml.etree import ElementTree
+from frontier import CrawlFrontier, normalize_url
+from http_cache import HttpCache
+from downloader import DocumentDownloader, is_document_url
+from corpus import CorpusWriter, corpus_urls, iter_records
+from crawl_metrics import CountingRetry, CrawlMetrics
+
+# Throughput, latency, retry and error telemetry (see crawl_metrics.py)
+crawl_metrics = CrawlMetrics("scraper")
+
+def retry_session(metrics):
+    """Session with retries; each retry is counted in metrics"""
+    http = requests.Session()
+    retries = CountingRetry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], metrics=metrics)
+    http.mount("https://", HTTPAdapter(max_retries=retries))
+    http.mount("http://", HTTPAdapter(max_retries=retries))
+    return http
 
 # Session with retry + headers
-session = requests.Session()
-retries = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-session.mount("https://", HTTPAdapter(max_retries=retries))
-session.mount("http://", HTTPAdapter(max_retries=retries))
+session = retry_session(crawl_metrics)
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                   "AppleWebKit/537.36 (KHTML, like Gecko) "
                   "Chrome/120.0.0.0 Safari/537.36"
 }
 
-def safe_get(url, timeout=20):
+# Responses meaning the page is gone; changes.json lists these as "removed"
+GONE_STATUSES = (404, 410)
+
+# Pages every crawl should visit first
+PRIORITY_URLS = [
+    "https://www.nirmauni.ac.in/admissions",
+    "https://www.nirmauni.ac.in/academics",
+    "https://www.nirmauni.ac.in/placements",
+    "https://www.nirmauni.ac.in/campus-life",
+    "https://www.nirmauni.ac.in/about-us",
+    "https://www.nirmauni.ac.in/contact-us"
+]
+
+def safe_get(url, timeout=20, headers=None, metrics=None, http=None):
+    """GET with retries (on http, default the module session); records status, latency (retries
+    included) and bytes when metrics is given"""
+    started = time.monotonic()
     try:
-        return session.get(url, timeout=timeout, verify=False, headers=HEADERS)
+        response = (http or session).get(url, timeout=timeout, verify=False, headers={**HEADERS, **(headers or {})})
     except Exception as e:
         print(f"❌ Error requesting {url}: {e}")
+        if metrics is not None:
+            metrics.record_fetch(None, time.monotonic() - started)
+            metrics.record_error(type(e).__name__)
         return None
+    if metrics is not None:
+        metrics.record_fetch(response.status_code, time.monotonic() - started, len(response.content))
+    return response
 
 class NirmaWebsiteScraper:
-    def __init__(self, base_url="https://www.nirmauni.ac.in"):
+    def __init__(self, base_url="https://www.nirmauni.ac.in", metrics=None):
         self.base_url = base_url
+        self.metrics = metrics or crawl_metrics
+        # Own retry adapter for own metrics, so retries are counted where the fetches are
+        self.session = session if self.metrics is crawl_metrics else retry_session(self.metrics)
         self.visited_urls = set()
         self.scraped_data = []
         self.data_dir = "data/raw"
         os.makedirs(self.data_dir, exist_ok=True)
+        self.http_cache = HttpCache()
+        self.unchanged_urls = set()  # pages the server confirmed unchanged (304 / same body)
+        self.gone_urls = set()       # pages that now answer 404 / 410 or left the sitemap
+        self.sitemap_entries = {}    # {url: lastmod} from the last sitemap read
+        self.downloader = DocumentDownloader(self.data_dir, headers=HEADERS, http_cache=self.http_cache)
+        self.corpus = CorpusWriter(crawler="scraper")
+        self._corpus_urls = None
         
     def is_valid_url(self, url):
         parsed = urlparse(url)
         return parsed.netloc == "www.nirmauni.ac.in"
     
     def download_file(self, url):
-        """Download and save non-HTML files like PDFs, DOCX, PPTX, etc."""
-        try:
-            file_exts = ('.pdf', '.docx', '.pptx', '.xls', '.xlsx')
-            if url.lower().endswith(file_exts):
-                response = safe_get(url)
-                if response:
-                    filename = os.path.join(self.data_dir, os.path.basename(urlparse(url).path))
-                    with open(filename, 'wb') as f:
-                        f.write(response.content)
-                    print(f"📄 Downloaded file: {filename}")
-        except Exception as e:
-            print(f"Error downloading {url}: {e}")
+        """Queue a non-HTML file (PDF, DOCX, PPTX, ...) for the background downloader"""
+        if is_document_url(url):
+            self.downloader.submit(url)
 
-    def get_page_links(self, url):
-        """Extract all links from a page"""
+    def fetch_page(self, url):
+        """Download a page once (conditionally, via the HTTP cache) and return its raw HTML bytes"""
+        response = safe_get(url, headers=self.http_cache.conditional_headers(url), metrics=self.metrics,
+                            http=self.session)
+        if response is None:
+            return None
+        if response.status_code == 304:
+            self.http_cache.touch(url)
+            self.unchanged_urls.add(url)
+            return self.http_cache.cached_body(url)
+        if response.status_code in GONE_STATUSES:
+            self.gone_urls.add(url)
+            return None
+        if response.status_code != 200:
+            return None
+        if "html" not in response.headers.get("Content-Type", "text/html").lower():
+            return None
+        if not self.http_cache.store(url, response.headers, response.content):
+            self.unchanged_urls.add(url)
+        return response.content
+
+    def get_page_links(self, url, tree):
+        """Extract all links from an already parsed page"""
+        links = []
         try:
-            response = safe_get(url)
-            if not response:
-                return []
-            soup = BeautifulSoup(response.content, 'html.parser')
-            links = []
-            
-            for link in soup.find_all('a', href=True):
-                full_url = urljoin(url, link['href'])
+            for href in tree.xpath('//a/@href'):
+                full_url = urljoin(url, href.strip())
                 
                 # Download documents if found
-                if any(full_url.lower().endswith(ext) for ext in ['.pdf', '.docx', '.pptx', '.xls', '.xlsx']):
+                if is_document_url(full_url):
                     self.download_file(full_url)
                     continue
                 
                 if self.is_valid_url(full_url) and full_url not in self.visited_urls:
                     links.append(full_url)
-            
-            return links
         except Exception as e:
             print(f"Error getting links from {url}: {e}")
-            return []
+        return links
     
     def scrape_page(self, url):
-        """Scrape content from a single page"""
+        """Fetch a page once and extract its content, title and links"""
         try:
             print(f"Scraping: {url}")
             
-            downloaded = trafilatura.fetch_url(url)
-            if downloaded:
-                text = trafilatura.extract(downloaded, include_comments=False, include_tables=True)
-                
-                if text and len(text.strip()) > 100:  # Only save meaningful content
-                    return {
-                        'url': url,
-                        'content': text.strip(),
-                        'title': self.get_page_title(url)
-                    }
-            return None
+            html = self.fetch_page(url)
+            if not html:
+                return None, []
+            return self.parse_page(url, html)
             
         except Exception as e:
             print(f"Error scraping {url}: {e}")
-            return None
+            return None, []
     
-    def get_page_title(self, url):
-        """Extract page title"""
+    def parse_page(self, url, html):
+        """Extract a page, timing the parse for the crawl metrics"""
+        with self.metrics.timed("parse"):
+            data, links = self.extract_page(url, html)
+        if data:
+            self.metrics.record_page()
+        return data, links
+    
+    def extract_page(self, url, html):
+        """Parse downloaded HTML once and reuse the tree for title, links and text"""
+        tree = load_html(html)
+        if tree is None:
+            return None, []
+        
+        # Title and links first: trafilatura prunes the tree while extracting
+        title = self.get_page_title(url, tree)
+        links = self.get_page_links(url, tree)
+        
+        data = None
+        text = trafilatura.extract(tree, include_comments=False, include_tables=True)
+        if text and len(text.strip()) > 100:  # Only save meaningful content
+            data = {
+                'url': url,
+                'content': text.strip(),
+                'title': title
+            }
+        return data, links
+    
+    def get_page_title(self, url, tree):
+        """Extract page title from an already parsed page"""
         try:
-            response = safe_get(url)
-            if not response:
-                return url.split('/')[-1]
-            soup = BeautifulSoup(response.content, 'html.parser')
-            title = soup.find('title')
-            return title.text.strip() if title else url.split('/')[-1]
-        except:
+            title = tree.findtext('.//title')
+            return title.strip() if title and title.strip() else url.split('/')[-1]
+        except Exception:
             return url.split('/')[-1]
     
-    def load_sitemap_urls(self):
-        """Fetch URLs from sitemap.xml if available"""
-        sitemap_url = urljoin(self.base_url, '/sitemap.xml')
-        urls = []
+    def load_sitemap_entries(self, sitemap_url=None, entries=None, seen=None):
+        """Fetch {url: lastmod} from sitemap.xml, following sitemap indexes recursively"""
+        sitemap_url = sitemap_url or urljoin(self.base_url, '/sitemap.xml')
+        entries = {} if entries is None else entries
+        seen = set() if seen is None else seen
+        if sitemap_url in seen:
+            return entries
+        seen.add(sitemap_url)
         try:
             print(f"🔍 Checking for sitemap: {sitemap_url}")
-            sitemap = safe_get(sitemap_url)
-            if sitemap and sitemap.status_code == 200:
-                tree = ElementTree.fromstring(sitemap.content)
-                for loc in tree.findall(".//{*}loc"):
-                    url = loc.text.strip()
-                    if self.is_valid_url(url):
-                        urls.append((url, 0))
-                print(f"🗺️ Found {len(urls)} URLs in sitemap.")
+            sitemap = safe_get(sitemap_url, http=self.session)
+            if sitemap is None or sitemap.status_code != 200:
+                return entries
+            content = sitemap.content
+            if sitemap_url.endswith('.gz') and content[:2] == b'\x1f\x8b':
+                content = gzip.decompress(content)
+            tree = ElementTree.fromstring(content)
+            
+            if tree.tag.endswith('sitemapindex'):
+                for child in tree.findall("{*}sitemap"):
+                    loc = child.findtext("{*}loc")
+                    if loc:
+                        self.load_sitemap_entries(loc.strip(), entries, seen)
+            else:
+                for child in tree.findall("{*}url"):
+                    loc = child.findtext("{*}loc")
+                    if loc and self.is_valid_url(loc.strip()):
+                        lastmod = child.findtext("{*}lastmod")
+                        entries[normalize_url(loc)] = lastmod.strip() if lastmod else None
+                print(f"🗺️ Found {len(entries)} URLs in sitemap so far.")
         except Exception as e:
             print(f"No sitemap found or error: {e}")
-        return urls
+        return entries
     
-    def crawl(self, start_url, max_pages=1000, max_depth=5):
-        """Crawl website starting from start_url"""
-        urls_to_visit = [(start_url, 0)]
-        pages_scraped = 0
+    def load_sitemap_urls(self):
+        """Fetch URLs from sitemap.xml if available"""
+        self.sitemap_entries = self.load_sitemap_entries()
+        return [(url, 0) for url in self.sitemap_entries]
+    
+    def load_sitemap_state(self):
+        state_file = os.path.join(self.data_dir, "sitemap_state.json")
+        if not os.path.exists(state_file):
+            return {}
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def record_sitemap_state(self):
+        """After a full crawl, store lastmod for every sitemap URL we visited"""
+        if self.sitemap_entries:
+            state = self.load_sitemap_state()
+            state.update({url: lastmod for url, lastmod in self.sitemap_entries.items() if url in self.visited_urls})
+            self.save_sitemap_state(state)
+    
+    def save_sitemap_state(self, state):
+        """Remember the lastmod we last fetched for each URL (removed pages are forgotten)"""
+        state = {url: lastmod for url, lastmod in state.items() if url not in self.gone_urls}
+        with open(os.path.join(self.data_dir, "sitemap_state.json"), 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+    
+    def recrawl_changed(self, sample_rate=0.02):
+        """Fetch only URLs whose sitemap <lastmod> moved since the last run, plus a random sample"""
+        previous = self.load_sitemap_state()
+        entries = self.load_sitemap_entries()
+        moved = [url for url, lastmod in entries.items() if url not in previous or previous[url] != lastmod]
+        moved_set = set(moved)
+        rest = [url for url in entries if url not in moved_set]
         
-        # Load sitemap URLs for deep coverage
-        sitemap_urls = self.load_sitemap_urls()
-        urls_to_visit = sitemap_urls + urls_to_visit
+        # Revalidate a few "unchanged" pages too: lastmod is not always maintained
+        sample_size = min(len(rest), max(1, round(len(rest) * sample_rate))) if rest else 0
+        sample = random.sample(rest, sample_size)
+        print(f"🗓️  {len(moved)} URLs with new lastmod, revalidating {len(sample)} of {len(rest)} others")
+        
+        # URLs dropped from the sitemap are removed from the index (unless the sitemap couldn't be read)
+        dropped = [url for url in previous if url not in entries] if entries else []
+        if dropped:
+            print(f"🗑️  {len(dropped)} URLs left the sitemap")
+        self.gone_urls.update(dropped)
+        state = dict(previous)
+        self.metrics.start()
+        try:
+            for idx, url in enumerate(moved + sample, 1):
+                self.visited_urls.add(url)
+                data, _ = self.scrape_page(url)
+                if data:
+                    self.scraped_data.append(data)
+                    self.save_page(data, idx)
+                    state[url] = entries[url]
+                self.metrics.gauge("frontier", len(moved) + len(sample) - idx)
+                time.sleep(1)
+                print(f"Progress: {idx}/{len(moved) + len(sample)} URLs revalidated")
+        
+            # New versions are appended to the corpus; changes.json lists what to re-embed
+            self.downloader.close()
+            self.save_data()
+            self.save_sitemap_state(state)
+        finally:
+            self.metrics.close()  # summary + final snapshot even on errors / Ctrl-C
+        return self.scraped_data
+    
+    def open_frontier(self, start_url, resume=True):
+        """Open the persistent frontier and seed it (seeding is a no-op for seen URLs)"""
+        frontier = CrawlFrontier(os.path.join(self.data_dir, "frontier.db"), resume=resume)
+        if frontier.resumed:
+            self.scraped_data = self.load_saved_pages(float(frontier.get_meta("started_at", 0)))
+        else:
+            frontier.set_meta("started_at", time.time())
         
         # Priority URLs
-        priority_urls = [
-            "https://www.nirmauni.ac.in/admissions",
-            "https://www.nirmauni.ac.in/academics",
-            "https://www.nirmauni.ac.in/placements",
-            "https://www.nirmauni.ac.in/campus-life",
-            "https://www.nirmauni.ac.in/about-us",
-            "https://www.nirmauni.ac.in/contact-us"
-        ]
+        for url in PRIORITY_URLS:
+            frontier.add(url, 0, priority=0)
         
-        for url in priority_urls:
-            urls_to_visit.insert(0, (url, 0))
+        # Load sitemap URLs for deep coverage
+        if not frontier.resumed:
+            for url, depth in self.load_sitemap_urls():
+                frontier.add(url, depth)
+        frontier.add(start_url, 0)
+        return frontier
+    
+    def crawl(self, start_url, max_pages=1000, max_depth=5, resume=True):
+        """Crawl website starting from start_url"""
+        frontier = self.open_frontier(start_url, resume=resume)
+        pages_scraped = frontier.pages_scraped
+        self.metrics.start()
+        try:
         
-        while urls_to_visit and pages_scraped < max_pages:
-            url, depth = urls_to_visit.pop(0)
-            
-            if url in self.visited_urls or depth > max_depth:
-                continue
-            
-            self.visited_urls.add(url)
+            while len(frontier) and pages_scraped < max_pages:
+                url, depth = frontier.pop()
+                self.visited_urls.add(url)
             
-            data = self.scrape_page(url)
-            if data:
-                self.scraped_data.append(data)
-                pages_scraped += 1
-                self.save_page(data, pages_scraped)
+                data, new_links = self.scrape_page(url)
+                if data:
+                    self.scraped_data.append(data)
+                    pages_scraped += 1
+                    self.save_page(data, pages_scraped)
             
-            if depth < max_depth:
-                new_links = self.get_page_links(url)
-                for link in new_links:
-                    if link not in self.visited_urls:
-                        urls_to_visit.append((link, depth + 1))
+                if depth < max_depth:
+                    for link in new_links:
+                        frontier.add(link, depth + 1)
+                frontier.mark_done(url, pages_scraped)
+                self.metrics.gauge("frontier", len(frontier))
             
-            time.sleep(1)
-            print(f"Progress: {pages_scraped}/{max_pages} pages scraped")
+                time.sleep(1)
+                print(f"Progress: {pages_scraped}/{max_pages} pages scraped ({len(frontier)} queued)")
         
-        print(f"\n✅ Deep scraping complete! Total pages: {pages_scraped}")
-        self.save_data()
+            print(f"\n✅ Deep scraping complete! Total pages: {pages_scraped}")
+            self.downloader.close()
+            self.save_data()
+            self.record_sitemap_state()
+            frontier.finish()
+            frontier.close()
+        finally:
+            self.metrics.close()  # summary + final snapshot even on errors / Ctrl-C
         return self.scraped_data
     
+    def load_saved_pages(self, since):
+        """Read back this crawl's pages from the corpus (used when resuming)"""
+        return [
+            {'url': r['url'], 'title': r['title'], 'content': r['content']}
+            for r in iter_records(self.corpus.corpus_dir)
+            if r.get('crawler') == self.corpus.crawler and r.get('fetched_at', 0) >= since
+        ]
+    
     def save_page(self, item, idx):
-        """Save individual page incrementally"""
-        filename = f"{self.data_dir}/page_{idx}.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"URL: {item['url']}\n")
-            f.write(f"Title: {item['title']}\n")
-            f.write(f"\n{item['content']}\n")
-        print(f"💾 Saved: {filename}")
+        """Append one page to the compressed corpus"""
+        # A 304 re-crawl of a page the corpus already holds adds nothing new
+        if item['url'] in self.unchanged_urls and item['url'] in self.corpus_urls():
+            return
+        with self.metrics.timed("write"):
+            self.corpus.write(item['url'], item['title'], item['content'])
+        print(f"💾 Saved page {idx}: {item['url']}")
+    
+    def corpus_urls(self):
+        if self._corpus_urls is None:
+            self._corpus_urls = corpus_urls(self.corpus.corpus_dir)
+        return self._corpus_urls
     
     def save_data(self):
-        """Save all scraped data as JSON for reference"""
-        with open(f"{self.data_dir}/all_data.json", 'w', encoding='utf-8') as f:
-            json.dump(self.scraped_data, f, indent=2, ensure_ascii=False)
-        print(f"📘 JSON data saved: {self.data_dir}/all_data.json")
+        """Finish the corpus shard and write changes.json"""
+        # Tombstones keep full rebuilds from bringing removed pages back
+        for url in sorted(self.gone_urls & self.corpus_urls()):
+            self.corpus.remove(url)
+        self.corpus.close()
+        print(f"📘 {self.corpus.records} pages appended to {self.corpus.corpus_dir}/")
+        self.save_changes()
+    
+    def save_changes(self):
+        """Write changes.json so embeddings.py --update re-embeds only changed pages"""
+        changes = {"changed": [], "unchanged": [], "removed": sorted(self.gone_urls)}
+        for item in self.scraped_data:
+            fetched = item['url'] in self.visited_urls and item['url'] not in self.unchanged_urls
+            key = "changed" if fetched else "unchanged"
+            changes[key].append(item['url'])
+        with open(f"{self.data_dir}/changes.json", 'w', encoding='utf-8') as f:
+            json.dump(changes, f, indent=2, ensure_ascii=False)
+        print(f"🔁 {len(changes['changed'])} changed, {len(changes['unchanged'])} unchanged, "
+              f"{len(changes['removed'])} removed pages")
 
 
 if __name__ == "__main__":
-    print("🕷️  Starting Nirma University Website Deep Scraper...\n")
+    parser = argparse.ArgumentParser(description="Crawl the Nirma University website.")
+    parser.add_argument("--changed-only", action="store_true", help="Only refetch URLs whose sitemap lastmod changed since the last run")
+    parser.add_argument("--sample-rate", type=float, default=0.02, help="Share of unchanged sitemap URLs to revalidate in --changed-only mode")
+    args = parser.parse_args()
     
     scraper = NirmaWebsiteScraper()
     
-    data = scraper.crawl(
-        start_url="https://www.nirmauni.ac.in",
-        max_pages=5000,  # Deep crawl limit
-        max_depth=5      # Deep recursive scan
-    )
+    if args.changed_only:
+        print("🕷️  Starting Nirma University sitemap recrawl...\n")
+        data = scraper.recrawl_changed(sample_rate=args.sample_rate)
+    else:
+        print("🕷️  Starting Nirma University Website Deep Scraper...\n")
+        data = scraper.crawl(
+            start_url="https://www.nirmauni.ac.in",
+            max_pages=5000,  # Deep crawl limit
+            max_depth=5      # Deep recursive scan
+        )
     
     print(f"\n✨ Deep scraping complete! Check 'data/raw/' for results.")
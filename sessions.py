@@ -0,0 +1,191 @@
+"""
+sessions.py
+Server-side chat sessions for multi-turn conversations.
+- Each session keeps the chunk ids of its last retrieval and a condensed history
+  (last few turns, answers trimmed)
+- Cheap follow-up detection: anaphora / "what about ..." openers / very short questions
+- Follow-ups reuse the cached chunks, topped up by a search on the condensed question,
+  instead of a context-free search on the follow-up alone
+- LRU store with idle TTL and caps on session count and approximate memory
+"""
+
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL_S = 30 * 60
+MAX_SESSIONS = 2000
+MAX_SESSION_BYTES = 8 * 1024 * 1024   # approximate, all sessions together
+HISTORY_TURNS = 3
+ANSWER_CHARS = 300                    # of each answer kept in the condensed history
+
+FOLLOW_UP_OPENERS = ("and ", "what about", "how about", "also", "then ", "so ", "but ", "same ", "tell me more",
+                     "more about", "explain", "why", "what else")
+FOLLOW_UP_WORDS = {"it", "its", "that", "this", "those", "these", "they", "them", "their", "there", "same",
+                   "above", "mentioned", "he", "she", "his", "her"}
+STOPWORDS = {"a", "an", "the", "is", "are", "was", "were", "what", "which", "how", "for", "of", "to", "in", "on",
+             "and", "or", "about", "me", "tell", "more", "please", "do", "does", "can", "i", "you", "it", "that",
+             "this", "those", "these", "they", "them", "there", "same", "also", "then", "so", "but", "with", "be",
+             "explain", "why", "else", "details", "detail"}
+
+
+def words(text):
+    return re.findall(r"[a-z0-9.\-]+", text.lower())
+
+
+def is_follow_up(question, session):
+    """Heuristic, no model call: does this question lean on the previous turn?"""
+    if session is None or not session.history:
+        return False
+    text = question.lower().strip()
+    tokens = words(text)
+    return (
+        text.startswith(FOLLOW_UP_OPENERS)
+        or bool(FOLLOW_UP_WORDS.intersection(tokens))
+        or len(tokens) <= 3
+    )
+
+
+def new_terms(question, session):
+    """Content words of the follow-up that the conversation hasn't covered yet"""
+    seen = set()
+    for asked, _ in session.history:
+        seen.update(words(asked))
+    return [t for t in words(question) if t not in STOPWORDS and t not in seen]
+
+
+class Session:
+    __slots__ = ("id", "tenant", "chunk_ids", "history", "last_seen", "size")
+
+    def __init__(self, session_id, tenant=None):
+        self.id = session_id
+        self.tenant = tenant  # chunk ids only make sense within one tenant's index
+        self.chunk_ids = []
+        self.history = []  # [(question, trimmed answer)]
+        self.last_seen = time.time()
+        self.size = 0
+
+    def condensed_question(self, question):
+        """The follow-up with the recent turns it refers to, for retrieval and the prompt"""
+        turns = "\n".join(f"Q: {q}\nA: {a}" for q, a in self.history)
+        return f"Earlier in this conversation:\n{turns}\n\nFollow-up question: {question}"
+
+    def search_query(self, question):
+        """Retrieval query: last question + follow-up (answers would drown the new terms)"""
+        return f"{self.history[-1][0]} {question}"
+
+    def record(self, question, answer, chunk_ids):
+        self.history = (self.history + [(question, answer[:ANSWER_CHARS])])[-HISTORY_TURNS:]
+        self.chunk_ids = list(chunk_ids)
+        self.last_seen = time.time()
+        self.size = sum(len(q) + len(a) for q, a in self.history) + 40 * len(self.chunk_ids) + 200
+
+
+class SessionStore:
+    """In-process LRU of sessions; idle ones expire after ttl, oldest go first past the caps"""
+
+    def __init__(self, ttl=SESSION_TTL_S, max_sessions=MAX_SESSIONS, max_bytes=MAX_SESSION_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0, "follow_ups": 0, "reused": 0}
+
+    def get_or_create(self, session_id, tenant=None):
+        with self.lock:
+            self._expire()
+            session = self.sessions.get(session_id) if session_id else None
+            if session is not None and session.tenant != tenant:
+                session = None
+            if session is None:
+                session = Session(secrets.token_urlsafe(16), tenant)
+                self.sessions[session.id] = session
+                self.stats["created"] += 1
+            self.sessions.move_to_end(session.id)
+            session.last_seen = time.time()
+            return session
+
+    def record(self, session, question, answer, chunk_ids):
+        with self.lock:
+            # A session dropped while its request ran is no longer counted in self.bytes
+            tracked = self.sessions.get(session.id) is session
+            if tracked:
+                self.bytes -= session.size
+            session.record(question, answer, chunk_ids)
+            if tracked:
+                self.bytes += session.size
+                self.sessions.move_to_end(session.id)
+            self._evict()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if oldest.last_seen >= cutoff:
+                break
+            self._drop(oldest)
+            self.stats["expired"] += 1
+
+    def _evict(self):
+        while self.sessions and (len(self.sessions) > self.max_sessions or self.bytes > self.max_bytes):
+            self._drop(next(iter(self.sessions.values())))
+            self.stats["evicted"] += 1
+
+    def _drop(self, session):
+        del self.sessions[session.id]
+        self.bytes -= session.size
+
+    def note_follow_up(self, reused):
+        with self.lock:
+            self.stats["follow_ups"] += 1
+            if reused:
+                self.stats["reused"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"active": len(self.sessions), "approx_bytes": self.bytes, **self.stats}
+
+
+# ---- chunk ids on top of FAISS / PartitionedVectorStore ----
+
+def docstores(vectorstore):
+    if hasattr(vectorstore, "partitions"):
+        return [store.docstore for store in vectorstore.partitions.values()]
+    return [vectorstore.docstore]
+
+
+def tag_chunk_ids(vectorstore):
+    """Set Document.id to the docstore id, so retrieved chunks can be referenced later"""
+    for docstore in docstores(vectorstore):
+        for doc_id, doc in docstore._dict.items():
+            doc.id = doc_id
+
+
+def chunks_by_ids(vectorstore, ids):
+    """Chunks still in the index, in the given order (ids deleted by an update are skipped)"""
+    found = {}
+    for docstore in docstores(vectorstore):
+        for doc_id in ids:
+            doc = docstore._dict.get(doc_id)
+            if doc is not None:
+                found[doc_id] = doc
+    return [found[i] for i in ids if i in found]
+
+
+def follow_up_context(vectorstore, session, question, k):
+    """Reuse the session's chunks; top them up with a search only if the follow-up adds new terms"""
+    cached = chunks_by_ids(vectorstore, session.chunk_ids)
+    if cached and not new_terms(question, session):
+        return cached[:k], True
+    fresh = vectorstore.similarity_search(session.search_query(question), k=k)
+    # New hits first, then the previous context the follow-up refers to
+    merged, seen = [], set()
+    for doc in fresh[:max(1, k // 2)] + cached + fresh[k // 2:]:
+        if doc.id not in seen:
+            seen.add(doc.id)
+            merged.append(doc)
+    return merged[:k], False
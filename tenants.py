@@ -0,0 +1,238 @@
+"""
+tenants.py
+Several institute indexes served from one app.py process.
+- tenants.json maps a tenant id to its vector store folder; without the file there is a
+  single "nirma" tenant on data/vectorstore
+- A tenant's index is loaded on its first request; the embedding model and LLM are shared
+- Loaded indexes are kept within a memory budget: least recently used idle tenants are
+  evicted (pinned tenants stay loaded)
+- Per-tenant stats: requests, resident hits vs cold loads, evictions, load time and
+  answer latency
+"""
+
+import gc
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from partitioned_index import MANIFEST_FILE, PARTITIONS_DIR, index_signature
+from precompute_answers import PRECOMPUTED_FILE
+
+TENANTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenants.json")
+DEFAULT_TENANT = "nirma"
+MEMORY_BUDGET_MB = float(os.environ.get("TENANT_MEMORY_BUDGET_MB", 1024))
+LATENCY_WINDOW = 500  # recent answers per tenant kept for the percentiles
+
+
+class UnknownTenant(KeyError):
+    """Raised by TenantManager for a tenant id that is not configured"""
+
+
+class TenantUnavailable(Exception):
+    """Raised by TenantManager.use when a tenant's index can't be loaded"""
+
+
+def load_tenant_config(path=TENANTS_FILE, default_dir="data/vectorstore"):
+    """{tenant id: {"name", "vectorstore", "precomputed", "pinned", ...}} and the default tenant id"""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        tenants, default = config["tenants"], config.get("default", DEFAULT_TENANT)
+    else:
+        tenants = {DEFAULT_TENANT: {"name": "Nirma University", "vectorstore": default_dir, "pinned": True}}
+        default = DEFAULT_TENANT
+    # The default tenant keeps the single-index location; the others store answers next to their index
+    for tenant_id, tenant in tenants.items():
+        tenant.setdefault("precomputed", PRECOMPUTED_FILE if tenant_id == default
+                          else os.path.join(tenant["vectorstore"], "precomputed_answers.json"))
+    return tenants, default
+
+
+def tenant_for_folder(config, folder):
+    """Id of the tenant served from this index folder, or None"""
+    for tenant_id, tenant in config.items():
+        if os.path.realpath(tenant["vectorstore"]) == os.path.realpath(folder):
+            return tenant_id
+    return None
+
+
+def index_footprint_mb(folder):
+    """Approximate RAM of a loaded index: the files it is read from (memory-mapped vectors.npy excluded)"""
+    parts_dir = os.path.join(folder, PARTITIONS_DIR)
+    manifest = os.path.join(parts_dir, MANIFEST_FILE)
+    uses_partitions = False
+    if os.path.exists(manifest):
+        with open(manifest, "r", encoding="utf-8") as f:
+            uses_partitions = json.load(f).get("source") == index_signature(folder)
+    roots = [os.path.join(parts_dir, d) for d in os.listdir(parts_dir)] if uses_partitions else [folder]
+    total = 0
+    for root in roots:
+        for name in ("index.faiss", "index.pkl"):
+            path = os.path.join(root, name)
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+    return total / 1e6
+
+
+class Tenant:
+    """One index and what hangs off it; the loaded fields are None while evicted"""
+
+    LOADED_FIELDS = ("vectorstore", "qa_chain", "index_version", "cache_version", "precomputed")
+
+    def __init__(self, tenant_id, config):
+        self.id = tenant_id
+        self.name = config.get("name", tenant_id)
+        self.path = config["vectorstore"]
+        self.precomputed_path = config.get("precomputed")
+        self.pinned = config.get("pinned", False)
+        for field in self.LOADED_FIELDS:
+            setattr(self, field, None)
+        self.ram_mb = 0.0
+        self.in_flight = 0
+        self.last_used = 0.0
+        self.load_lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"requests": 0, "resident_hits": 0, "cold_loads": 0, "evictions": 0, "load_s": 0.0,
+                      "answers": {}}
+
+    @property
+    def loaded(self):
+        return self.vectorstore is not None
+
+    def unload(self):
+        for field in self.LOADED_FIELDS:
+            setattr(self, field, None)
+        self.ram_mb = 0.0
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+        return {
+            "name": self.name,
+            "loaded": self.loaded,
+            "pinned": self.pinned,
+            "ram_mb": round(self.ram_mb, 1),
+            "in_flight": self.in_flight,
+            **self.stats,
+            "load_s": round(self.stats["load_s"], 2),
+            "answers": dict(self.stats["answers"]),
+            "latency_p50_s": pick(0.5),
+            "latency_p95_s": pick(0.95),
+            "routing": getattr(self.vectorstore, "stats", None),
+        }
+
+
+class TenantManager:
+    """Lazily loads tenants with load_fn(tenant) -> {field: value} and evicts LRU idle ones past budget_mb"""
+
+    def __init__(self, config, default_tenant, load_fn, budget_mb=MEMORY_BUDGET_MB):
+        self.tenants = {tenant_id: Tenant(tenant_id, c) for tenant_id, c in config.items()}
+        if default_tenant not in self.tenants:
+            raise ValueError(f"Default tenant {default_tenant!r} is not configured")
+        self.default = default_tenant
+        self.load_fn = load_fn
+        self.budget_mb = budget_mb
+        self.lock = threading.Lock()
+
+    def get(self, tenant_id=None):
+        tenant = self.tenants.get(tenant_id or self.default)
+        if tenant is None:
+            raise UnknownTenant(tenant_id)
+        return tenant
+
+    @contextmanager
+    def use(self, tenant_id=None):
+        """Loaded tenant for one request; it can't be evicted until the block exits"""
+        tenant = self.get(tenant_id)
+        with self.lock:
+            tenant.in_flight += 1
+            tenant.stats["requests"] += 1
+        try:
+            self.ensure_loaded(tenant)
+            yield tenant
+        finally:
+            with self.lock:
+                tenant.in_flight -= 1
+                tenant.last_used = time.time()
+
+    def ensure_loaded(self, tenant):
+        if tenant.loaded:
+            with self.lock:
+                tenant.stats["resident_hits"] += 1
+            return
+        with tenant.load_lock:
+            if tenant.loaded:  # loaded by a concurrent request while we waited
+                with self.lock:
+                    tenant.stats["resident_hits"] += 1
+                return
+            print(f"📂 Loading index for tenant {tenant.id} ({tenant.path})...")
+            started = time.time()
+            try:
+                state = self.load_fn(tenant)
+            except Exception as e:
+                print(f"❌ Could not load tenant {tenant.id}: {e}")
+                raise TenantUnavailable(tenant.id) from e
+            with self.lock:
+                for field, value in state.items():
+                    setattr(tenant, field, value)
+                tenant.ram_mb = index_footprint_mb(tenant.path)
+                tenant.last_used = time.time()
+                tenant.stats["cold_loads"] += 1
+                tenant.stats["load_s"] += time.time() - started
+            print(f"✅ Tenant {tenant.id} loaded in {time.time() - started:.1f}s (~{tenant.ram_mb:.0f} MB)")
+        self.evict(keep=tenant)
+
+    def reload(self, tenant_id):
+        """Swap in a freshly published index for a loaded tenant (an evicted one loads it next time)"""
+        tenant = self.get(tenant_id)
+        if not tenant.loaded:
+            return
+        # Requests keep using the old index while the new one loads
+        state = self.load_fn(tenant)
+        with self.lock:
+            if not tenant.loaded:  # evicted meanwhile
+                return
+            for field, value in state.items():
+                setattr(tenant, field, value)
+            tenant.ram_mb = index_footprint_mb(tenant.path)
+        print(f"🔄 Reloaded index for tenant {tenant.id} ({tenant.index_version})")
+        self.evict(keep=tenant)
+
+    def ram_mb(self):
+        return sum(t.ram_mb for t in self.tenants.values() if t.loaded)
+
+    def evict(self, keep=None):
+        """Unload least recently used idle tenants until the loaded indexes fit the budget"""
+        evicted = []
+        with self.lock:
+            while self.ram_mb() > self.budget_mb:
+                idle = [t for t in self.tenants.values()
+                        if t.loaded and t is not keep and not t.pinned and t.in_flight == 0]
+                if not idle:
+                    break
+                victim = min(idle, key=lambda t: t.last_used)
+                victim.unload()
+                victim.stats["evictions"] += 1
+                evicted.append(victim.id)
+        if evicted:
+            gc.collect()  # LangChain objects hold reference cycles; free the FAISS indexes now
+            print(f"♻️  Evicted tenants {', '.join(evicted)} (budget {self.budget_mb:.0f} MB)")
+
+    def record(self, tenant, answer_kind, latency):
+        with self.lock:
+            answers = tenant.stats["answers"]
+            answers[answer_kind] = answers.get(answer_kind, 0) + 1
+            tenant.latencies.append(latency)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "default": self.default,
+                "budget_mb": self.budget_mb,
+                "ram_mb": round(self.ram_mb(), 1),
+                "loaded": sum(1 for t in self.tenants.values() if t.loaded),
+                "tenants": {tenant_id: t.snapshot() for tenant_id, t in self.tenants.items()},
+            }
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+import crawl
+
+BASE = "https://nirmauni.ac.in/page"
+PARSERS = [crawl.parse_lxml, crawl.parse_bs4]
+
+
+@pytest.mark.parametrize("parse", PARSERS)
+@pytest.mark.parametrize("html", ["", "   ", "\n\t", "<!-- x -->", '<?xml version="1.0" encoding="utf-8"?> '])
+def test_empty_documents_give_an_empty_page(parse, html):
+    assert parse(html, BASE) == ("", "", set())
+
+
+@pytest.mark.parametrize("parse", PARSERS)
+def test_title_text_and_links(parse):
+    html = """<html><head><title> Admissions </title><script>var x = 1;</script></head>
+    <body><header>Menu</header><p>Apply <b>now</b></p><!-- hidden -->tail
+    <a href="/fees#top">Fees</a><a href="https://example.com/">Out</a><footer>Footer</footer></body></html>"""
+    title, text, links = parse(html, BASE)
+    assert title == "Admissions"
+    assert text.splitlines() == ["Admissions", "Apply", "now", "tail", "Fees", "Out"]
+    assert links == {"https://nirmauni.ac.in/fees", "https://example.com"}
+
+
+@pytest.mark.parametrize("parser", ["lxml", "bs4"])
+def test_crawl_continues_past_an_empty_page(monkeypatch, parser):
+    pages = {
+        "https://nirmauni.ac.in": '<a href="/empty">e</a><a href="/next">n</a>',
+        "https://nirmauni.ac.in/empty": "<!-- x -->",
+        "https://nirmauni.ac.in/next": "<title>Next</title><p>Still crawling</p>",
+    }
+
+    class Corpus:
+        def __init__(self):
+            self.urls = []
+
+        def write(self, url, title, text):
+            self.urls.append(url)
+
+    monkeypatch.setattr(crawl, "PARSER", parser)
+    monkeypatch.setattr(crawl, "DELAY", 0)
+    monkeypatch.setattr(crawl, "get_robots_parser", lambda url: None)
+    monkeypatch.setattr(crawl, "fetch", lambda url, http_cache: pages.get(url))
+    corpus = Corpus()
+    page_count, _ = crawl.crawl("https://nirmauni.ac.in", io.StringIO(), corpus, http_cache=None)
+    assert page_count == 3
+    assert "https://nirmauni.ac.in/next" in corpus.urls
@@ -0,0 +1,16 @@
+from downloader import DocumentDownloader
+
+
+def test_downloader_can_be_reused_after_close(tmp_path, monkeypatch):
+    downloaded = []
+    monkeypatch.setattr(DocumentDownloader, "_download", lambda self, url: downloaded.append(url))
+    downloader = DocumentDownloader(str(tmp_path))
+
+    downloader.submit("https://www.nirmauni.ac.in/a.pdf")
+    downloader.close()
+    downloader.close()
+    downloader.submit("https://www.nirmauni.ac.in/a.pdf")
+    downloader.close()
+
+    assert downloaded == ["https://www.nirmauni.ac.in/a.pdf"] * 2
+    assert (tmp_path / "downloads.json").exists()
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import Future
+
+from langchain_community.vectorstores import FAISS
+
+from ingest import IngestQueue, publish_chunks
+from quantized_index import read_meta, write_meta
+from tests.fakes import HashEmbeddings
+
+
+def make_queue(tmp_path):
+    return IngestQueue(HashEmbeddings(), str(tmp_path / "vectorstore"), precompute=False,
+                       upload_dir=str(tmp_path / "uploads"), coalesce_s=0)
+
+
+def upload(queue, name):
+    path = os.path.join(queue.upload_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("text")
+    return path
+
+
+def test_requeued_upload_replaces_and_deletes_the_earlier_file(tmp_path):
+    queue = make_queue(tmp_path)
+    first = upload(queue, "a_notes.txt")
+    second = upload(queue, "b_notes.txt")
+    job = queue.submit("file", "notes.txt", path=first)
+    assert queue.submit("file", "notes.txt", path=second)["id"] == job["id"]
+    assert not os.path.exists(first)
+    assert queue.get(job["id"])["path"] == second
+
+
+def test_finished_jobs_delete_their_upload(tmp_path):
+    queue = make_queue(tmp_path)
+    done = queue.submit("file", "a.txt", path=upload(queue, "a.txt"))
+    failed = queue.submit("file", "b.txt", path=upload(queue, "b.txt"))
+    queue.set_status([queue.jobs[done["id"]]], "done")
+    queue.set_status([queue.jobs[failed["id"]]], "failed", "boom")
+    assert os.listdir(queue.upload_dir) == []
+
+
+def test_files_outside_the_upload_dir_are_kept(tmp_path):
+    queue = make_queue(tmp_path)
+    outside = tmp_path / "keep.txt"
+    outside.write_text("text")
+    job = queue.submit("file", "keep.txt", path=str(outside))
+    queue.set_status([queue.jobs[job["id"]]], "done")
+    assert outside.exists()
+
+
+def test_publish_chunks_updates_the_vector_count(tmp_path):
+    folder = str(tmp_path / "vectorstore")
+    embeddings = HashEmbeddings()
+    FAISS.from_texts(["Fee structure", "Hostel rooms"], embeddings,
+                     metadatas=[{"source": "fees"}, {"source": "hostel"}]).save_local(folder)
+    write_meta(folder, {"vectors": 2, "vector_dtype": "float32"})
+
+    texts = ["New hostel rooms", "Mess menu"]
+    result = publish_chunks(folder, texts, embeddings.embed_documents(texts),
+                            [{"source": "hostel"}, {"source": "mess"}])
+    assert result == {"added": 2, "replaced": 1, "total": 3}
+    assert read_meta(folder) == {"vectors": 3, "vector_dtype": "float32"}
+
+
+def test_failed_reload_keeps_published_jobs_done(tmp_path):
+    def reload(tenant):
+        raise RuntimeError("reload failed")
+
+    queue = make_queue(tmp_path)
+    queue.on_publish = reload
+    job = queue.jobs[queue.submit("file", "a.txt", path=upload(queue, "a.txt"))["id"]]
+
+    class Child:
+        """Stands in for the child process; the index update itself succeeds"""
+
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result({"added": 1, "replaced": 0, "total": 1})
+            return future
+
+    queue.publish(Child(), queue.vectorstore_dir, [job], {job["id"]: {"chunks": [("text", {"source": "a.txt"})]}})
+    assert job["status"] == "done" and job["error"] is None
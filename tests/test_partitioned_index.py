@@ -0,0 +1,58 @@
+import pytest
+
+from partitioned_index import PartitionedVectorStore, route_query, section_for
+from tests.fakes import HashEmbeddings
+
+
+@pytest.mark.parametrize("query, sections", [
+    ("What is the fee for B.Tech?", ["admissions", "academics"]),
+    ("hostel mess fees", ["hostel", "admissions"]),
+    ("Which companies came for placements?", ["placements"]),
+    ("Who is eligible and how do I fill the application form?", ["admissions", "documents"]),
+    ("CAT cutoff for MBA", ["admissions", "academics"]),
+])
+def test_route_query(query, sections):
+    assert sorted(route_query(query)) == sorted(sections)
+
+
+@pytest.mark.parametrize("query", [
+    "Which category of information is in the catalog?",
+    "What format is the feedback in?",
+    "Give me an example",
+])
+def test_route_query_ignores_words_that_only_share_a_prefix(query):
+    assert route_query(query) == []
+
+
+@pytest.mark.parametrize("metadata, section", [
+    ({"source": "https://www.nirmauni.ac.in/admission/fee-structure"}, "admissions"),
+    ({"source": "https://www.nirmauni.ac.in/feedback"}, "general"),
+    ({"source": "https://www.nirmauni.ac.in/director-message"}, "general"),
+    ({"source": "https://www.nirmauni.ac.in/newsletter"}, "general"),
+    ({"source": "https://www.nirmauni.ac.in/news"}, "circulars"),
+    ({"source": "https://www.nirmauni.ac.in/hostel/mess-menu"}, "hostel"),
+    ({"source": "https://www.nirmauni.ac.in/recruitment-2025"}, "placements"),
+    ({"source": "https://www.nirmauni.ac.in/about", "title": "Institute of Technology"}, "general"),
+    ({"source": "https://www.nirmauni.ac.in/about", "title": "Departments of the Institute"}, "academics"),
+    ({"source": "data/raw/doc_abc.pdf", "page": 3}, "documents"),
+])
+def test_section_for_matches_whole_words(metadata, section):
+    assert section_for(metadata) == section
+
+
+def test_add_texts_and_delete_go_to_section_partitions():
+    store = PartitionedVectorStore.from_texts(
+        ["Fee structure", "Hostel rooms"],
+        HashEmbeddings(),
+        metadatas=[{"source": "https://www.nirmauni.ac.in/admission/fees"},
+                   {"source": "https://www.nirmauni.ac.in/hostel"}],
+    )
+    assert sorted(store.partitions) == ["admissions", "hostel"]
+
+    ids = store.add_texts(["Mess menu"], metadatas=[{"source": "https://www.nirmauni.ac.in/hostel/mess"}])
+    assert len(store.partitions["hostel"].docstore._dict) == 2
+    doc = store.similarity_search("Mess menu", k=1, filter={"section": "hostel"})[0]
+    assert doc.page_content == "Mess menu" and doc.metadata["section"] == "hostel"
+
+    store.delete(ids)
+    assert len(store.partitions["hostel"].docstore._dict) == 1
@@ -0,0 +1,59 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from admission import normalize_question
+from precompute_answers import PrecomputedAnswers, cluster_questions, content_words
+
+
+class SameVector(Embeddings):
+    """Every text gets the same vector: similarity alone would merge everything"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize("a, b", [
+    ("What is the fee for B.Tech?", "btech fees"),
+    ("How much is the hostel fee?", "hostel fees"),
+])
+def test_content_words_ignore_filler(a, b):
+    assert content_words(a) == content_words(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("B.Tech fee", "M.Tech fee"),
+    ("hostel fee 2024", "hostel fee 2025"),
+    ("When is the exam?", "Where is the exam?"),
+])
+def test_content_words_keep_what_changes_the_question(a, b):
+    assert content_words(a) != content_words(b)
+
+
+def clusters_for(questions):
+    counts = Counter({normalize_question(q): 5 for q in questions})
+    wordings = {normalize_question(q): q for q in questions}
+    return cluster_questions(counts, wordings, SameVector())
+
+
+def test_clusters_only_merge_the_same_content_words():
+    clusters = clusters_for(["B.Tech fee", "What is the B.Tech fee?", "M.Tech fee", "hostel fee 2025"])
+    assert sorted(sorted(c["variants"]) for c in clusters) == [
+        ["B.Tech fee", "What is the B.Tech fee?"], ["M.Tech fee"], ["hostel fee 2025"]]
+
+
+def test_lookup_needs_the_same_content_words():
+    entries = [{"question": "B.Tech fee", "variants": ["B.Tech fee"], "response": "B.Tech answer", "sources": []},
+               {"question": "hostel fee 2024", "variants": ["hostel fee 2024"], "response": "2024 answer",
+                "sources": []}]
+    store = PrecomputedAnswers(entries, [0, 1], np.array([[1.0, 0, 0], [1.0, 0, 0]], dtype=np.float32), SameVector())
+
+    assert store.lookup("what is the fee for btech")["response"] == "B.Tech answer"
+    assert store.lookup("M.Tech fee") is None
+    assert store.lookup("hostel fee 2025") is None
+    assert store.snapshot() == {"entries": 2, "exact": 0, "similar": 1, "misses": 2}
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from quantized_index import VECTORS_FILE, load_vectorstore, quantize_vectorstore
+from tests.fakes import HashEmbeddings
+
+TEXTS = [f"page {i}" for i in range(40)]
+
+
+def build(tmp_path):
+    folder = str(tmp_path / "vectorstore")
+    flat = FAISS.from_texts(TEXTS, HashEmbeddings(), metadatas=[{"source": t} for t in TEXTS])
+    quantize_vectorstore(flat, folder, "int8")
+    return folder
+
+
+def saved_vectors(folder):
+    return np.load(os.path.join(folder, VECTORS_FILE))
+
+
+def test_add_appends_to_the_mapped_file(tmp_path):
+    folder = build(tmp_path)
+    store = load_vectorstore(folder, HashEmbeddings())
+    store.add_texts(["hostel fees", "mess menu"])
+
+    assert isinstance(store.exact_vectors, np.memmap)
+    assert store.exact_vectors.shape == (42, 16)
+    store.save_local(folder)
+
+    reloaded = load_vectorstore(folder, HashEmbeddings())
+    assert np.allclose(saved_vectors(folder)[-1], HashEmbeddings().embed_query("mess menu"))
+    assert reloaded.similarity_search("mess menu", k=1)[0].page_content == "mess menu"
+
+
+def test_delete_keeps_the_published_file_until_save(tmp_path):
+    folder = build(tmp_path)
+    before = saved_vectors(folder)
+    store = load_vectorstore(folder, HashEmbeddings())
+    ids = [doc_id for doc_id, doc in store.docstore._dict.items() if doc.page_content in ("page 0", "page 7")]
+    store.delete(ids)
+    store.add_texts(["page 7 v2"])
+
+    assert np.array_equal(saved_vectors(folder), before)
+    store.save_local(folder)
+    assert saved_vectors(folder).shape == (39, 16)
+    assert not [f for f in os.listdir(folder) if f.startswith(".")]
+
+    reloaded = load_vectorstore(folder, HashEmbeddings())
+    assert reloaded.similarity_search("page 7 v2", k=1)[0].page_content == "page 7 v2"
+    assert reloaded.similarity_search("page 12", k=1)[0].page_content == "page 12"
+
+
+def test_unsaved_additions_are_ignored_on_load(tmp_path):
+    folder = build(tmp_path)
+    load_vectorstore(folder, HashEmbeddings()).add_texts(["never saved"])
+
+    store = load_vectorstore(folder, HashEmbeddings())
+    assert len(store.exact_vectors) == store.index.ntotal == 40
+    store.add_texts(["saved"])
+    store.save_local(folder)
+    assert saved_vectors(folder).shape == (41, 16)
@@ -0,0 +1,133 @@
+import pytest
+from langchain_community.vectorstores import FAISS
+
+import sessions
+from sessions import Session, SessionStore, follow_up_context, is_follow_up, tag_chunk_ids
+from tests.fakes import HashEmbeddings
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    return now
+
+
+def session_with(*turns):
+    session = Session("s")
+    for question in turns:
+        session.record(question, "answer", [])
+    return session
+
+
+@pytest.mark.parametrize("question", [
+    "What about the hostel?",
+    "And for MBA?",
+    "How much does it cost?",
+    "Is that refundable?",
+    "Last date?",
+    "tell me more",
+])
+def test_follow_ups(question):
+    assert is_follow_up(question, session_with("What is the B.Tech fee?"))
+
+
+@pytest.mark.parametrize("question", [
+    "Where is the university located?",
+    "What are the placement statistics for MBA students?",
+])
+def test_standalone_questions(question):
+    assert not is_follow_up(question, session_with("What is the B.Tech fee?"))
+
+
+def test_nothing_is_a_follow_up_without_history():
+    assert not is_follow_up("What about it?", Session("s"))
+    assert not is_follow_up("What about it?", None)
+
+
+@pytest.fixture
+def store():
+    vectorstore = FAISS.from_texts(
+        ["B.Tech fee is 2 lakh", "Fee can be paid in two installments", "Hostel has AC rooms",
+         "MBA placements average 12 LPA", "Library opens at 8"],
+        HashEmbeddings(),
+    )
+    tag_chunk_ids(vectorstore)
+    return vectorstore
+
+
+def test_follow_up_reuses_cached_chunks(store):
+    first = store.similarity_search("What is the B.Tech fee?", k=2)
+    session = Session("s")
+    session.record("What is the B.Tech fee?", "2 lakh", [doc.id for doc in first])
+
+    docs, reused = follow_up_context(store, session, "Is it for the B.Tech fee?", k=2)
+    assert reused
+    assert [doc.id for doc in docs] == [doc.id for doc in first]
+
+
+def test_follow_up_with_new_terms_tops_up_with_a_search(store):
+    first = store.similarity_search("What is the B.Tech fee?", k=2)
+    session = Session("s")
+    session.record("What is the B.Tech fee?", "2 lakh", [doc.id for doc in first])
+
+    docs, reused = follow_up_context(store, session, "What about hostel rooms?", k=4)
+    assert not reused
+    ids = [doc.id for doc in docs]
+    assert len(ids) == len(set(ids)) <= 4
+    assert set(doc.id for doc in first) <= set(ids)
+
+
+def test_follow_up_skips_chunks_deleted_from_the_index(store):
+    first = store.similarity_search("What is the B.Tech fee?", k=2)
+    session = Session("s")
+    session.record("What is the B.Tech fee?", "2 lakh", [doc.id for doc in first])
+    store.delete([first[0].id])
+
+    docs, _ = follow_up_context(store, session, "And it?", k=2)
+    assert first[0].id not in [doc.id for doc in docs]
+
+
+def test_idle_sessions_expire(clock):
+    store = SessionStore(ttl=60)
+    old = store.get_or_create(None)
+    clock[0] += 61
+    assert store.get_or_create(old.id).id != old.id
+    assert store.snapshot()["expired"] == 1
+
+
+def test_least_recently_used_session_is_evicted_past_max_sessions(clock):
+    store = SessionStore(max_sessions=2)
+    a, b = store.get_or_create(None), store.get_or_create(None)
+    store.get_or_create(a.id)  # a is now the most recent
+    c = store.get_or_create(None)
+    store.record(c, "q", "answer", [])
+    assert set(store.sessions) == {a.id, c.id}
+    assert store.snapshot()["evicted"] == 1
+
+
+def test_sessions_are_evicted_past_max_bytes(clock):
+    store = SessionStore(max_bytes=1000)
+    a = store.get_or_create(None)
+    store.record(a, "q" * 400, "a" * 200, [])
+    b = store.get_or_create(None)
+    store.record(b, "q" * 400, "a" * 200, [])
+    assert list(store.sessions) == [b.id]
+    assert store.bytes == b.size
+
+
+def test_byte_count_survives_a_session_dropped_mid_request(clock):
+    store = SessionStore(max_sessions=1)
+    a = store.get_or_create(None)
+    store.record(a, "first question", "answer", ["x"])
+    b = store.get_or_create(None)  # evicts a while its next request is still running
+    store.record(b, "other question", "answer", ["y"])
+    store.record(a, "second question", "answer", ["z"])
+    assert store.bytes == sum(s.size for s in store.sessions.values()) >= 0
+
+
+def test_a_session_id_from_another_tenant_starts_a_new_session(clock):
+    store = SessionStore()
+    a = store.get_or_create(None, "nirma")
+    assert store.get_or_create(a.id, "imnu").id != a.id
+    assert store.get_or_create(a.id, "nirma").id == a.id